@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+"""
+Measure the time taken by the protein description functions.
+
+The cases are the doctest examples of the protein description functions and
+a number of variants on large synthetic proteins, comparable in size to
+titin. For every case, the time per call is reported in microseconds.
+
+Usage:
+
+    python extras/benchmarks/protein-description.py [REPEAT]
+"""
+
+
+from __future__ import unicode_literals
+
+import random
+import sys
+import timeit
+
+from mutalyzer import util
+
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def doctest_cases():
+    return [
+        ('in-frame del', 33, 'MTAPQQMT*', 'MTAQQMT*'),
+        ('in-frame del 2', 33, 'MTAPQQMT*', 'MTAQMT*'),
+        ('in-frame delins', 33, 'MTAPQQT*', 'MTAQQMT*'),
+        ('in-frame ext', 33, 'MTAPQQMT*', 'MTAPQQMTMQ*'),
+        ('in-frame ext no stop', 33, 'MTAPQQMT*', 'MTAPQQMTMQ'),
+        ('frameshift', 34, 'MTAPQQMT*', 'MTAQQMT*'),
+        ('frameshift no stop', 34, 'MTAPQQT*', 'MTAQQMT'),
+        ('start lost', 33, 'MTAPQQMT*', 'TTAQQMT*')]
+
+
+def large_cases(length=35000):
+    """
+    Variants on a random protein of the given length.
+    """
+    generator = random.Random(3)
+    protein = 'M' + ''.join(generator.choice(AMINO_ACIDS)
+                            for _ in range(length - 1))
+    middle = length // 2
+    other = ''.join(generator.choice(AMINO_ACIDS) for _ in range(200))
+
+    return [
+        ('large =', 3 * length, protein + '*', protein + '*'),
+        ('large subst', 3 * length, protein + '*',
+         protein[:middle] + 'W' + protein[middle + 1:] + '*'),
+        ('large del', 3 * length, protein + '*',
+         protein[:middle] + protein[middle + 3:] + '*'),
+        ('large dup', 3 * length, protein + '*',
+         protein[:middle] + protein[middle - 5:] + '*'),
+        ('large stop', 3 * length, protein + '*', protein[:middle] + '*'),
+        ('large delins', 3 * length, protein + '*',
+         protein[:middle] + other + protein[middle + 100:] + '*'),
+        ('large frameshift', 3 * length + 1, protein + '*',
+         protein[:middle] + other + '*'),
+        ('large frameshift end', 3 * length + 1, protein + '*',
+         protein[:-10] + other + '*')]
+
+
+def main(repeat=100):
+    for name, cds_stop, s1, s2 in doctest_cases() + large_cases():
+        seconds = min(timeit.repeat(
+            lambda: util.protein_description(cds_stop, s1, s2),
+            number=repeat, repeat=3))
+        print '%-24s %12.1f' % (name, seconds / repeat * 1e6)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
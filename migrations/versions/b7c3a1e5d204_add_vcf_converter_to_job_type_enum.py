@@ -0,0 +1,62 @@
+"""Add VCF converter to job type enum
+
+Revision ID: b7c3a1e5d204
+Revises: 91add8ff6b2b
+Create Date: 2017-03-14 11:02:17.382645
+
+"""
+
+from __future__ import unicode_literals
+
+# revision identifiers, used by Alembic.
+revision = 'b7c3a1e5d204'
+down_revision = u'91add8ff6b2b'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    context = op.get_context()
+
+    if context.bind.dialect.name == 'postgresql':
+        # See the comments in migration 56ddeb75114e.
+        if context.bind.dialect.server_version_info >= (9, 3):
+            op.execute('COMMIT')
+            op.execute("ALTER TYPE job_type ADD VALUE IF NOT EXISTS 'vcf-converter'")
+            return
+        if context.bind.dialect.server_version_info >= (9, 1):
+            op.execute('COMMIT')
+            op.execute("ALTER TYPE job_type ADD VALUE 'vcf-converter'")
+            return
+
+    elif context.bind.dialect.name == 'sqlite':
+        # SQLite doesn't support altering columns, so we have to wrap this in
+        # a batch operation.
+        with op.batch_alter_table('batch_jobs') as batch_op:
+            batch_op.alter_column(
+                'job_type', nullable=False,
+                type_=sa.Enum('name-checker', 'syntax-checker',
+                              'position-converter', 'snp-converter',
+                              'vcf-converter', name='job_type')
+            )
+        return
+
+    elif context.bind.dialect.name == 'mysql':
+        # In MySQL we can simply alter the column.
+        op.alter_column(
+            'batch_jobs', 'job_type', nullable=False,
+            type_=sa.Enum('name-checker', 'syntax-checker',
+                          'position-converter', 'snp-converter',
+                          'vcf-converter', name='job_type'),
+            existing_type=sa.Enum('name-checker', 'syntax-checker',
+                                  'position-converter', 'snp-converter',
+                                  name='job_type')
+        )
+        return
+
+    raise Exception('Sorry, only PostgreSQL >= 9.1, SQLite, and MySQL are supported by this migration')
+
+
+def downgrade():
+    raise Exception('Downgrade not supported by this migration')
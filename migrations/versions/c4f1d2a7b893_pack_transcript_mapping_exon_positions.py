@@ -0,0 +1,94 @@
+"""Pack transcript mapping exon positions
+
+Revision ID: c4f1d2a7b893
+Revises: b7c3a1e5d204
+Create Date: 2017-03-20 14:26:51.093472
+
+"""
+
+from __future__ import unicode_literals
+
+# revision identifiers, used by Alembic.
+revision = 'c4f1d2a7b893'
+down_revision = u'b7c3a1e5d204'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import sql
+import struct
+
+
+def pack(value):
+    """
+    Pack comma-separated integers as signed 32-bit little-endian integers.
+    """
+    positions = [int(s) for s in value.split(',') if s]
+    return struct.pack(b'<%di' % len(positions), *positions)
+
+
+def unpack(value):
+    """
+    Unpack signed 32-bit little-endian integers to comma-separated integers.
+    """
+    value = bytes(value)
+    positions = struct.unpack(b'<%di' % (len(value) // 4), value)
+    return ','.join(unicode(i) for i in positions)
+
+
+def convert(old_type, new_type, convert_value):
+    # We add new columns, populate them from the existing columns, drop the
+    # existing columns and rename the new columns. On SQLite, the last two
+    # steps are done in a batch operation.
+    connection = op.get_bind()
+
+    op.add_column('transcript_mappings',
+                  sa.Column('exon_starts_new', new_type, nullable=True))
+    op.add_column('transcript_mappings',
+                  sa.Column('exon_stops_new', new_type, nullable=True))
+
+    transcript_mappings = sql.table('transcript_mappings',
+                                    sql.column('id', sa.Integer()),
+                                    sql.column('exon_starts', old_type),
+                                    sql.column('exon_stops', old_type),
+                                    sql.column('exon_starts_new', new_type),
+                                    sql.column('exon_stops_new', new_type))
+
+    result = connection.execute(
+        transcript_mappings.select().with_only_columns([
+            transcript_mappings.c.id,
+            transcript_mappings.c.exon_starts,
+            transcript_mappings.c.exon_stops]))
+
+    while True:
+        chunk = result.fetchmany(1000)
+        if not chunk:
+            break
+
+        statement = transcript_mappings.update().where(
+            transcript_mappings.c.id == sql.bindparam('m_id')
+        ).values({'exon_starts_new': sql.bindparam('m_exon_starts'),
+                  'exon_stops_new': sql.bindparam('m_exon_stops')})
+
+        connection.execute(statement, [
+            {'m_id': m.id,
+             'm_exon_starts': convert_value(m.exon_starts),
+             'm_exon_stops': convert_value(m.exon_stops)}
+            for m in chunk])
+
+    with op.batch_alter_table('transcript_mappings') as batch_op:
+        batch_op.drop_column('exon_starts')
+        batch_op.drop_column('exon_stops')
+        batch_op.alter_column('exon_starts_new',
+                              new_column_name='exon_starts', nullable=False,
+                              existing_type=new_type)
+        batch_op.alter_column('exon_stops_new',
+                              new_column_name='exon_stops', nullable=False,
+                              existing_type=new_type)
+
+
+def upgrade():
+    convert(sa.Text(), sa.LargeBinary(), pack)
+
+
+def downgrade():
+    convert(sa.LargeBinary(), sa.Text(), unpack)
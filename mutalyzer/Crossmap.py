@@ -12,6 +12,10 @@ and stop and the orientation of a transcript.
 
 from __future__ import unicode_literals
 
+import bisect
+
+import numpy
+
 class Crossmap() :
     """
     Convert from I{g.} to I{c.} or I{n.} notation or vice versa.
@@ -39,12 +43,18 @@ class Crossmap() :
         - __minusr(a, b)            ; A protected '-' that skips 0 if
                                       a > 0 and b < 0.
         - __crossmap_splice_sites() ; Calculate the __crossmapping list.
+        - __arrays()                ; The RNA and __crossmapping lists as
+                                      arrays.
 
     Public methods:
         - int2main(a) ; Translate from __STOP to '*' notation.
         - main2int(s) ; Translate from '*' to __STOP notation.
         - g2x(a) ; Translate from I{g.} notation to I{c.} or I{n.} notation.
         - x2g(a, b) ; Translate I{c.} or I{n.} notation to I{g.} notation.
+        - g2x_many(a) ; Translate an array of I{g.} positions to I{c.} or
+            I{n.} notation.
+        - x2g_many(a, b) ; Translate arrays of I{c.} or I{n.} positions to
+            I{g.} notation.
         - int2offset(t) ; Convert a tuple of integers to offset-notation.
         - offset2int(s) ; Convert an offset in HGVS notation to an integer.
         - tuple2string(t) ; Convert a tuple (main, offset) in __STOP notation
@@ -92,6 +102,14 @@ class Crossmap() :
 
         self.__crossmap_splice_sites()
 
+        # The I{c.} or I{n.} notation of the exon boundaries, multiplied by
+        # the orientation such that they are ascending.
+        self.__exon_starts = [orientation * x
+                              for x in self.__crossmapping[0::2]]
+        self.__exon_ends = [orientation * x
+                            for x in self.__crossmapping[1::2]]
+        self.__rna_array = self.__crossmapping_array = None
+
         start = (orientation - 1) / 2
         self.__trans_start = self.__crossmapping[start]
         self.__trans_end = self.__crossmapping[start - self.orientation]
@@ -315,23 +333,23 @@ class Crossmap() :
             return (self.__crossmapping[RNAlen - y - 1],
                     d * (a - self.RNA[RNAlen - y - 1]))
 
-        for i in xrange(RNAlen) : # A "normal" position.
-            if i % 2 :            # We're checking the intron positions.
-                if self.RNA[i] < a and a < self.RNA[i + 1] : # Intron.
-                    if d * (a - self.RNA[i]) > d * (self.RNA[i + 1] - a) :
-                        # The position was closer to the next exon.
-                        return (self.__crossmapping[i + 1 - c],
-                                -d * (self.RNA[i + 1 - c] - a))
-                    # The position was closer to the previous exon.
-                    return (self.__crossmapping[i + c],
-                            d * (a - self.RNA[i + c]))
-                #if
-            else :                # We're checking the exon positions.
-                if self.RNA[i] <= a and a <= self.RNA[i + 1] :
-                    return (self.__plus(self.__crossmapping[i + c],
-                                        d * (a - self.RNA[i + c])), 0)
-                #if
-        #for
+        # A "normal" position, find the first splice site not before it.
+        i = bisect.bisect_left(self.RNA, a)
+        if self.RNA[i] == a : # A splice site, so in an exon.
+            i -= i % 2
+        else :
+            i -= 1
+
+        if i % 2 :            # An intron.
+            if d * (a - self.RNA[i]) > d * (self.RNA[i + 1] - a) :
+                # The position was closer to the next exon.
+                return (self.__crossmapping[i + 1 - c],
+                        -d * (self.RNA[i + 1 - c] - a))
+            # The position was closer to the previous exon.
+            return (self.__crossmapping[i + c], d * (a - self.RNA[i + c]))
+        #if
+        return (self.__plus(self.__crossmapping[i + c],
+                            d * (a - self.RNA[i + c])), 0)
     #g2x
 
     def x2g(self, a, b) :
@@ -384,11 +402,12 @@ class Crossmap() :
             # It is after the last exon.
             ret = self.RNA[RNAlen - 1] + \
                   d * (a - self.__crossmapping[RNAlen - 1])
-        for i in range(0, RNAlen, 2) : # Is it in an exon?
-            if d * self.__crossmapping[i] <= d * a and \
-               d * a <= d * self.__crossmapping[i + 1] :
-                ret = self.RNA[i + c] - d * \
-                      self.__minusr(self.__crossmapping[i + c], a)
+        # Is it in an exon? Find the last exon starting not after it.
+        i = bisect.bisect_right(self.__exon_starts, d * a) - 1
+        if i >= 0 and d * a <= self.__exon_ends[i] :
+            i *= 2
+            ret = self.RNA[i + c] - d * \
+                  self.__minusr(self.__crossmapping[i + c], a)
         ret += d * b # Add the intron count.
 
         if a < 0 and self.__crossmapping[d - c] == 1 : # Patch for CDS start on
@@ -397,6 +416,113 @@ class Crossmap() :
         return ret
     #x2g
 
+    def __arrays(self) :
+        """
+        The RNA and __crossmapping lists as arrays, created on first use.
+
+        @return: The RNA and __crossmapping arrays
+        @rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        if self.__rna_array is None :
+            self.__rna_array = numpy.array(self.RNA, dtype=numpy.int64)
+            self.__crossmapping_array = numpy.array(self.__crossmapping,
+                                                    dtype=numpy.int64)
+        return self.__rna_array, self.__crossmapping_array
+    #__arrays
+
+    def g2x_many(self, a) :
+        """
+        Vectorized version of g2x(), calculating the I{c.} or I{n.} notation
+        for an array of I{g.} positions at once.
+
+        @arg a: The genomic positions that must be translated
+        @type a: numpy.ndarray
+
+        @return: The I{c.} or I{n.} notation of the positions in a, as arrays
+            of main values and offsets
+        @rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        RNA, crossmapping = self.__arrays()
+        a = numpy.asarray(a, dtype=numpy.int64)
+
+        RNAlen = len(RNA)
+        d = self.orientation
+        c = (d - 1) / -2
+        y = c * (RNAlen - 1)
+
+        # Index of the exon or intron (see g2x), clipped for positions
+        # outside the transcript which are handled at the end.
+        k = numpy.searchsorted(RNA, a, 'left')
+        splice_site = RNA[numpy.minimum(k, RNAlen - 1)] == a
+        i = numpy.clip(numpy.where(splice_site, k - k % 2, k - 1),
+                       0, RNAlen - 2)
+        intron = i % 2 == 1
+
+        # Positions in an exon.
+        main = crossmapping[i + c]
+        offset = d * (a - RNA[i + c])
+        main = numpy.where(intron, main,
+                           main + offset + ((main <= 0) &
+                                            (main + offset >= 0)))
+        offset = numpy.where(intron, offset, 0)
+
+        # Positions in an intron, closer to the next exon.
+        next_exon = intron & (d * (a - RNA[i]) > d * (RNA[i + 1] - a))
+        main = numpy.where(next_exon, crossmapping[i + 1 - c], main)
+        offset = numpy.where(next_exon, -d * (RNA[i + 1 - c] - a), offset)
+
+        # Positions before the first exon and after the last exon.
+        for outside, j in ((d * a < d * RNA[y], y),
+                           (d * a > d * RNA[RNAlen - y - 1], RNAlen - y - 1)) :
+            main = numpy.where(outside, crossmapping[j], main)
+            offset = numpy.where(outside, -d * (RNA[j] - a), offset)
+
+        return main, offset
+    #g2x_many
+
+    def x2g_many(self, a, b) :
+        """
+        Vectorized version of x2g(), calculating the I{g.} notation for
+        arrays of I{c.} or I{n.} positions and offsets at once.
+
+        @arg a: The I{n.} or I{c.} positions to be translated
+        @type a: numpy.ndarray
+        @arg b: The offsets of the positions in a
+        @type b: numpy.ndarray
+
+        @return: The I{g.} positions
+        @rtype: numpy.ndarray
+        """
+        RNA, crossmapping = self.__arrays()
+        a = numpy.asarray(a, dtype=numpy.int64)
+        b = numpy.asarray(b, dtype=numpy.int64)
+
+        d = self.orientation
+        c = (-d - 1) / -2
+        RNAlen = len(RNA)
+
+        # Positions before exon 1 and after the last exon.
+        ret = numpy.where(d * a > d * crossmapping[RNAlen - 1],
+                          RNA[RNAlen - 1] + d * (a - crossmapping[RNAlen - 1]),
+                          RNA[0] - d * (crossmapping[0] - a))
+
+        # Positions in an exon.
+        i = numpy.searchsorted(self.__exon_starts, d * a, 'right') - 1
+        exon = i >= 0
+        i = numpy.maximum(i, 0)
+        exon &= d * a <= numpy.asarray(self.__exon_ends)[i]
+        x = crossmapping[2 * i + c]
+        ret = numpy.where(exon,
+                          RNA[2 * i + c] - d * (x - a - ((x > 0) & (a < 0))),
+                          ret)
+        ret += d * b # Add the intron count.
+
+        if self.__crossmapping[d - c] == 1 : # Patch for CDS start on first
+            ret += d * (a < 0)               # nucleotide of exon 1.
+
+        return ret
+    #x2g_many
+
     def int2main(self, a) :
         """
         This method converts the __STOP notation to the '*' notation.
@@ -12,11 +12,19 @@ search for them each time.
 #     - Locus     ; Store data about the mRNA and CDS splice sites.
 #     - Gene      ; Store a list of Locus objects and the orientation.
 #     - Record    ; Store a geneList and other additional information.
+#     - LocusOverlay  ; Variant dependent state of a Locus.
+#     - GeneOverlay   ; A Gene with overlays for its transcripts.
+#     - RecordOverlay ; Variant dependent state of a Record.
 #     - GenRecord ; Convert a GenBank record to a nested dictionary.
 
 
 from __future__ import unicode_literals
 
+from array import array
+import bisect
+from operator import attrgetter
+
+from mutalyzer.config import settings
 from mutalyzer import util
 from mutalyzer import Crossmap
 
@@ -25,6 +33,55 @@ SPLICE_ALARM = 2
 SPLICE_WARN = 5
 
 
+def _positions(positions) :
+    """
+    Store a list of positions as an integer array, which takes much less
+    memory than a list.
+
+    @arg positions: list of positions (or None)
+    @type positions: list(integer)
+
+    @return: array of positions (or None)
+    @rtype: array(integer)
+    """
+
+    if positions is None or isinstance(positions, array) :
+        return positions
+    return array('l', positions)
+#_positions
+
+
+def _listIndex(index, items, key) :
+    """
+    Index a list by a key of its items.
+
+    The index is a tuple of the list, its length and a dictionary with the
+    position of the first item for every key. A given index is reused if the
+    list was not changed since it was created, otherwise a new index is
+    created.
+
+    @arg index: index created earlier (or None)
+    @type index: tuple
+    @arg items: list to index
+    @type items: list(object)
+    @arg key: function returning the key of an item (None is not indexed)
+    @type key: function
+
+    @return: index of the list
+    @rtype: tuple(list, integer, dict)
+    """
+
+    if index is not None and index[0] is items and index[1] == len(items) :
+        return index
+
+    positions = {}
+    for n, item in enumerate(items) :
+        k = key(item)
+        if k is not None and k not in positions :
+            positions[k] = n
+    return items, len(items), positions
+#_listIndex
+
 class PList(object) :
     """
     A position list object, to store a general location and a list of
@@ -35,6 +92,10 @@ class PList(object) :
     list element. The location element is a fallback in case the splice
     sites are not available.
 
+    Both are stored as integer arrays, any list assigned to them is
+    converted. Note that an array never equals a list, so compare with
+    list(positionList) instead.
+
     Special methods:
         - __init__() ; Initialise the class.
 
@@ -43,6 +104,8 @@ class PList(object) :
         - list     ; A list (with an even amount of entries) of splice sites.
     """
 
+    __slots__ = ('__location', '__positionList')
+
     def __init__(self) :
         """
         Initialise the class.
@@ -57,6 +120,22 @@ class PList(object) :
         self.location = []
         self.positionList = []
     #__init__
+
+    @property
+    def location(self) :
+        return self.__location
+
+    @location.setter
+    def location(self, location) :
+        self.__location = _positions(location)
+
+    @property
+    def positionList(self) :
+        return self.__positionList
+
+    @positionList.setter
+    def positionList(self, positionList) :
+        self.__positionList = _positions(positionList)
 #PList
 
 class Locus(object) :
@@ -72,6 +151,14 @@ class Locus(object) :
         - exon ; A position list object.
     """
 
+    __slots__ = ('name', 'current', 'mRNA', 'CDS', 'location', 'exon',
+                 'txTable', 'CM', 'transcriptID', 'proteinID', 'genomicID',
+                 'molType', 'description', 'proteinDescription',
+                 'proteinRange', 'locusTag', 'link', 'transcribe',
+                 'translate', 'linkMethod', 'transcriptProduct',
+                 'proteinProduct', 'affected', 'annotationWarnings',
+                 'parsedTranslate', 'parsedLinkMethod')
+
     def __init__(self, name) :
         """
         Initialise the class.
@@ -83,6 +170,10 @@ class Locus(object) :
             - exon     ; A position list object.
             - txTable  ; The translation table.
             - CM       ; A Crossmap object.
+            - annotationWarnings ; Problems found in the annotation (see
+                                   Record.annotate).
+            - parsedTranslate    ; The translate value before annotation.
+            - parsedLinkMethod   ; The linkMethod value before annotation.
 
         @arg name: identifier of the locus
         @type name: unicode
@@ -110,6 +201,10 @@ class Locus(object) :
         self.linkMethod = None
         self.transcriptProduct = None
         self.proteinProduct = None
+        self.affected = True
+        self.annotationWarnings = []
+        self.parsedTranslate = False
+        self.parsedLinkMethod = None
     #__init__
 
     def cancelDescription(self):
@@ -156,6 +251,9 @@ class Gene(object) :
         - transcriptslist; A list of Locus objects.
     """
 
+    __slots__ = ('name', 'orientation', 'transcriptList', 'location',
+                 'longName', '__locusTag', '__loci', '__links')
+
     def __init__(self, name) :
         """
         Initialise the class.
@@ -168,6 +266,8 @@ class Gene(object) :
             - longName ;
         Private variables (altered):
             - __locusTag ;
+            - __loci     ; Index of transcripts by name.
+            - __links    ; Index of transcripts by protein accession number.
 
         @arg name: gene name
         @type name: unicode
@@ -179,6 +279,8 @@ class Gene(object) :
         self.location = []
         self.longName = ""
         self.__locusTag = "000"
+        self.__loci = None
+        self.__links = None
     #__init__
 
     def newLocusTag(self) :
@@ -205,12 +307,35 @@ class Gene(object) :
         @rtype: object
         """
 
-        for i in self.transcriptList :
-            if i.name == name or i.name == "%03i" % int(name):
-                return i
-        return None
+        n = self._locusPosition(name)
+        if n is None :
+            return None
+        return self.transcriptList[n]
     #findLocus
 
+    def _locusPosition(self, name) :
+        """
+        Find the position of a transcript in transcriptList, given its
+        name.
+
+        @arg name: transcript variant number
+        @type name: unicode
+
+        @return: position of the transcript
+        @rtype: integer
+        """
+
+        self.__loci = _listIndex(self.__loci, self.transcriptList,
+                                 attrgetter('name'))
+        positions = self.__loci[2]
+
+        found = [positions[k] for k in (name, "%03i" % int(name))
+                 if k in positions]
+        if found :
+            return min(found)
+        return None
+    #_locusPosition
+
     def listLoci(self) :
         """
         Provides a list of transcript variant numbers
@@ -236,11 +361,28 @@ class Gene(object) :
         @rtype: object
         """
 
-        for i in self.transcriptList :
-            if i.link == protAcc :
-                return i
-        return None
+        n = self._linkPosition(protAcc)
+        if n is None :
+            return None
+        return self.transcriptList[n]
     #findLink
+
+    def _linkPosition(self, protAcc) :
+        """
+        Find the position of a transcript in transcriptList, given its
+        protein accession number.
+
+        @arg protAcc: protein accession number
+        @type protAcc: unicode
+
+        @return: position of the transcript
+        @rtype: integer
+        """
+
+        self.__links = _listIndex(self.__links, self.transcriptList,
+                                  attrgetter('link'))
+        return self.__links[2].get(protAcc)
+    #_linkPosition
 #Gene
 
 class Record(object) :
@@ -261,6 +403,13 @@ class Record(object) :
                       is present.
     """
 
+    __slots__ = ('geneList', 'molType', 'seq', 'mapping', 'organelle',
+                 'source', 'description', '_sourcetype', 'version',
+                 'chromOffset', 'chromDescription', 'orientation', 'recordId',
+                 'checksum', 'annotated', 'id', 'source_id',
+                 'source_accession', 'source_version', 'organism',
+                 '__genes', '__accessions', '__spans')
+
     def __init__(self) :
         """
         Initialise the class.
@@ -278,6 +427,21 @@ class Record(object) :
                           which one).
             - source    ; A fake gene that can be used when no gene
                           information is present.
+            - checksum  ; Checksum of the reference file (if known).
+            - id        ; Identifier of the record.
+            - source_id ; Identifier of the record it was retrieved from,
+                          also as accession and version in source_accession
+                          and source_version.
+            - organism  ; The organism of the record.
+            - annotated ; Whether the gene models are checked and completed
+                          (see annotate).
+
+        Private variables (altered):
+            - __genes      ; Index of genes by name.
+            - __accessions ; Index of transcripts by accession number,
+                             created by annotate.
+            - __spans      ; Index of transcripts by location, created by
+                             annotate.
         """
 
         self.geneList = []
@@ -293,123 +457,16 @@ class Record(object) :
         self.chromDescription = ""
         self.orientation = 1
         self.recordId = None
-    #__init__
-
-    def findGene(self, name) :
-        """
-        Returns a Gene object, given its name.
-
-        @arg name: Gene name
-        @type name: unicode
-
-        @return: Gene object
-        @rtype: object
-        """
-
-        for i in self.geneList :
-            if i.name == name :
-                return i
-        return None
-    #findGene
-
-    def get_transcript_selector(self, accession):
-        """
-        Returns a tuple with gene name and transcript name (i.e. its
-        `v-number') for a given transcript ID.
-
-        @param accession: unicode
-        @return: tuple(unicode, unicode)
-        """
-
-        for gene in self.geneList:
-            for transcript in gene.transcriptList:
-                if transcript.transcriptID == accession:
-                    return gene.name, transcript.name
-    #getInfoByTranscriptID
-
-    def listGenes(self) :
-        """
-        List the names of all genes found in this record.
-
-        @return: Genes list
-        @rtype: list
-
-        """
-
-        ret = []
-        for i in self.geneList :
-            ret.append(i.name)
-        return ret
-    #listGenes
-
-    def addToDescription(self, rawVariant) :
-        """
-        Expands the DNA description with a new raw variant.
-
-        @arg rawVariant: description of a single mutation
-        @type rawVariant: unicode
-        """
-
-        if self.description :
-            self.description = "%s;%s" % (self.description, rawVariant)
-        else :
-            self.description = rawVariant
-    #addToDescription
-
-    def toChromPos(self, i) :
-        """
-        Converts a g. position (relative to the start of the record) to a
-        chromosomal g. position
-
-        @arg i: g. position (relative to the start of the record)
-        @type i: integer
-
-        @return: chromosomal g. position
-        @rtype: integer
-        """
-        if not self.chromOffset:
-            return None
-
-        if self.orientation == 1 :
-            return self.chromOffset + i - 1
-        return self.chromOffset - i + 1
-    #toChromPos
-
-    def addToChromDescription(self, rawVariant) :
-        """
-        @todo document me
-        """
-
-        if not self.chromOffset :
-            return
-        if self.chromDescription :
-            self.chromDescription = "%s;%s" % (self.chromDescription,
-                rawVariant)
-        else :
-            self.chromDescription = rawVariant
-    #addToChromDescription
-#Record
-
-class GenRecord() :
-    """
-    Convert a GenBank record to a nested dictionary.
-
-    Public methods:
-        - checkRecord()   ;   Check and repair self.record.
-    """
-
-    def __init__(self, output) :
-        """
-        Initialise the class.
-
-        Public variable:
-            - record    ; A record object
-
-        @arg output: an output object
-        @type output: object
-        """
-        self.__output = output
-        self.record = None
+        self.checksum = None
+        self.annotated = False
+        self.id = None
+        self.source_id = None
+        self.source_accession = None
+        self.source_version = None
+        self.organism = None
+        self.__genes = None
+        self.__accessions = None
+        self.__spans = None
     #__init__
 
     def __checkExonList(self, exonList, CDSpos) :
@@ -476,41 +533,26 @@ class GenRecord() :
         return ret
     #__constructCDS
 
-    def __maybeInvert(self, gene, string, string_reverse=None) :
-        """
-        Return the reverse-complement of a DNA sequence if the gene is in
-        the reverse orientation.
-
-        @arg gene: Gene
-        @type gene: object
-        @arg string: DNA sequence
-        @type string: unicode
-        @kwarg string_reverse: DNA sequence to use (if not None) for the
-            reverse complement.
-
-        @return: reverse-complement (if applicable), otherwise return the
-            original.
-        @rtype: unicode
+    def annotate(self) :
         """
-        if gene.orientation == -1:
-            if string_reverse:
-                string = string_reverse
-            return util.reverse_complement(string)
-        return string
-    #__maybeInvert
+        Check if the gene models are compatible with mutalyzer and complete
+        them. Missing mRNA and CDS lists are constructed and every
+        transcript gets a Crossmap object.
 
-    def checkRecord(self) :
-        """
-        Check if the record in self.record is compatible with mutalyzer.
-        Update the mRNA PList with the exon and CDS data.
+        This does not depend on any variant, so it is only done once. The
+        problems found are stored on the transcripts and are reported for
+        every variant by GenRecord.checkRecord.
 
         @todo: This function should really check the record for minimal
         requirements
         """
 
+        if self.annotated :
+            return
+
         #TODO:  This function should really check
         #       the record for minimal requirements.
-        for i in self.record.geneList :
+        for i in self.geneList :
             """
             if len(i.transcriptList) == 2 :
                 if i.transcriptList[0].CDS and not i.transcriptList[1].CDS and \
@@ -525,35 +567,37 @@ class GenRecord() :
             #if
             """
             for j in i.transcriptList :
+                j.parsedTranslate = j.translate
+                j.parsedLinkMethod = j.linkMethod
                 if not j.mRNA :
                     usableExonList = self.__checkExonList(j.exon, j.CDS)
-                    if self.record.molType == 'n' and j.exon:
+                    if self.molType == 'n' and j.exon:
                         if not all(p1 + 1 == p2 for p1, p2 in
                                    util.grouper(j.exon.positionList[1:-1])):
-                            code = 'WEXON_ANNOTATION' if j.current else 'WEXON_ANNOTATION_OTHER'
-                            self.__output.addMessage(__file__, 2, code,
+                            j.annotationWarnings.append((
+                                'WEXON_ANNOTATION', 'WEXON_ANNOTATION_OTHER',
                                 "Exons for gene %s, transcript variant %s were "
                                 "found not to be adjacent. This signifies a "
                                 "possible problem in the annotation of the "
-                                "reference sequence." % (i.name, j.name))
+                                "reference sequence." % (i.name, j.name)))
                     if not j.exon or not usableExonList :
-                        if self.record.molType == 'g' :
-                            code = 'WNOMRNA' if j.current else 'WNOMRNA_OTHER'
-                            self.__output.addMessage(__file__, 2, code,
+                        if self.molType == 'g' :
+                            j.annotationWarnings.append((
+                                'WNOMRNA', 'WNOMRNA_OTHER',
                                 "No mRNA field found for gene %s, transcript " \
                                 "variant %s in record, constructing " \
                                 "it from CDS. Please note that descriptions "\
                                 "exceeding CDS boundaries are invalid." % (
-                                i.name, j.name))
+                                i.name, j.name)))
                         if j.exon and j.exon.positionList and \
                            not usableExonList :
-                            code = 'WNOMRNA' if j.current else 'WNOMRNA_OTHER'
-                            self.__output.addMessage(__file__, 2, code,
+                            j.annotationWarnings.append((
+                                'WNOMRNA', 'WNOMRNA_OTHER',
                                 "Exons were found for gene %s, transcript " \
                                 "variant %s but were not usable. " \
                                 "Please note that descriptions "\
                                 "exceeding CDS boundaries are invalid." % (
-                                i.name, j.name))
+                                i.name, j.name)))
                         if j.CDS :
                             if not j.CDS.positionList :
                                 #self.__output.addMessage(__file__, 2,
@@ -571,11 +615,12 @@ class GenRecord() :
                             j.translate = True
                         #if
                         else :
-                            self.__output.addMessage(__file__, 2, "WNOCDS",
+                            j.annotationWarnings.append((
+                                'WNOCDS', 'WNOCDS',
                                 "No CDS found for gene %s, transcript " \
                                 "variant %s in record, " \
                                 "constructing it from gene location." % (
-                                i.name, j.name))
+                                i.name, j.name)))
                             j.CDS = None #PList()
                             #j.CDS.location = i.location
                             j.mRNA = PList()
@@ -628,8 +673,485 @@ class GenRecord() :
                 #else
             #for
         #for
+
+        self.__indexTranscripts()
+        self.annotated = True
+    #annotate
+
+    def __indexTranscripts(self) :
+        """
+        Index the transcripts by accession number and by location. The
+        transcripts are stored by their position in geneList and
+        transcriptList, such that the indices can also be used for overlays
+        of this record.
+        """
+
+        accessions = {}
+        spans = []
+
+        for g, i in enumerate(self.geneList) :
+            for t, j in enumerate(i.transcriptList) :
+                if j.transcriptID is not None :
+                    accessions.setdefault(j.transcriptID, (g, t))
+                if j.CM :
+                    spans.append((j.CM.RNA[0], j.CM.RNA[-1], g, t))
+
+        spans.sort()
+        self.__accessions = accessions
+        self.__spans = (array('l', [span[0] for span in spans]), spans,
+                        max([stop - start for start, stop, g, t in spans]
+                            or [0]))
+    #__indexTranscripts
+
+    def countTranscripts(self) :
+        """
+        Returns the number of transcripts that have a Crossmap object.
+
+        @return: number of transcripts
+        @rtype: integer
+        """
+
+        self.annotate()
+        return len(self.__spans[1])
+    #countTranscripts
+
+    def findTranscripts(self, start, stop) :
+        """
+        Find the transcripts (with a Crossmap object) that overlap a range.
+
+        @arg start: first g. position of the range
+        @type start: integer
+        @arg stop: last g. position of the range
+        @type stop: integer
+
+        @return: positions of the transcripts in geneList and
+            transcriptList, in record order
+        @rtype: list(tuple(integer, integer))
+        """
+
+        self.annotate()
+        starts, spans, maxLength = self.__spans
+
+        # No transcript starting before this can reach the range.
+        first = bisect.bisect_left(starts, start - maxLength)
+        last = bisect.bisect_right(starts, stop)
+
+        return sorted((g, t) for _, spanStop, g, t in spans[first:last]
+                      if spanStop >= start)
+    #findTranscripts
+
+    def overlay(self) :
+        """
+        Returns an overlay of this record to check a variant against.
+
+        Checking a variant only alters the overlay, such that the record
+        itself can be shared by any number of variant checks.
+
+        @return: RecordOverlay object
+        @rtype: object
+        """
+
+        self.annotate()
+        return RecordOverlay(self)
+    #overlay
+
+    def findGene(self, name) :
+        """
+        Returns a Gene object, given its name.
+
+        @arg name: Gene name
+        @type name: unicode
+
+        @return: Gene object
+        @rtype: object
+        """
+
+        n = self._genePosition(name)
+        if n is None :
+            return None
+        return self.geneList[n]
+    #findGene
+
+    def _genePosition(self, name) :
+        """
+        Returns the position of a gene in geneList, given its name.
+
+        @arg name: Gene name
+        @type name: unicode
+
+        @return: position of the gene
+        @rtype: integer
+        """
+
+        self.__genes = _listIndex(self.__genes, self.geneList,
+                                  attrgetter('name'))
+        return self.__genes[2].get(name)
+    #_genePosition
+
+    def get_transcript_selector(self, accession):
+        """
+        Returns a tuple with gene name and transcript name (i.e. its
+        `v-number') for a given transcript ID.
+
+        @param accession: unicode
+        @return: tuple(unicode, unicode)
+        """
+
+        if self.__accessions is None:
+            # Not annotated yet, so the record might still be changing.
+            for gene in self.geneList:
+                for transcript in gene.transcriptList:
+                    if transcript.transcriptID == accession:
+                        return gene.name, transcript.name
+            return None
+
+        try:
+            g, t = self.__accessions[accession]
+        except KeyError:
+            return None
+        gene = self.geneList[g]
+        return gene.name, gene.transcriptList[t].name
+    #getInfoByTranscriptID
+
+    def listGenes(self) :
+        """
+        List the names of all genes found in this record.
+
+        @return: Genes list
+        @rtype: list
+
+        """
+
+        ret = []
+        for i in self.geneList :
+            ret.append(i.name)
+        return ret
+    #listGenes
+
+    def addToDescription(self, rawVariant) :
+        """
+        Expands the DNA description with a new raw variant.
+
+        @arg rawVariant: description of a single mutation
+        @type rawVariant: unicode
+        """
+
+        if self.description :
+            self.description = "%s;%s" % (self.description, rawVariant)
+        else :
+            self.description = rawVariant
+    #addToDescription
+
+    def toChromPos(self, i) :
+        """
+        Converts a g. position (relative to the start of the record) to a
+        chromosomal g. position
+
+        @arg i: g. position (relative to the start of the record)
+        @type i: integer
+
+        @return: chromosomal g. position
+        @rtype: integer
+        """
+        if not self.chromOffset:
+            return None
+
+        if self.orientation == 1 :
+            return self.chromOffset + i - 1
+        return self.chromOffset - i + 1
+    #toChromPos
+
+    def addToChromDescription(self, rawVariant) :
+        """
+        @todo document me
+        """
+
+        if not self.chromOffset :
+            return
+        if self.chromDescription :
+            self.chromDescription = "%s;%s" % (self.chromDescription,
+                rawVariant)
+        else :
+            self.chromDescription = rawVariant
+    #addToChromDescription
+#Record
+
+class LocusOverlay(Locus) :
+    """
+    The variant dependent state of a Locus object. All other attributes are
+    taken from the Locus object, which is not altered.
+
+    Special methods:
+        - __init__()    ; Initialise the class.
+        - __getattr__() ; Get an attribute from the Locus object.
+    """
+
+    __slots__ = ('annotation',)
+
+    def __init__(self, locus) :
+        """
+        Initialise the class.
+
+        Public variables (altered):
+            - annotation         ; The Locus object.
+            - current            ; Whether this is the selected transcript.
+            - description        ; The variant description.
+            - proteinDescription ; The protein variant description.
+            - affected           ; Whether a variant is near this transcript.
+
+        @arg locus: Locus object
+        @type locus: object
+        """
+
+        self.annotation = locus
+        self.current = False
+        self.description = locus.description
+        self.proteinDescription = locus.proteinDescription
+        self.affected = True
+    #__init__
+
+    def __getattr__(self, name) :
+        if name == 'annotation' :
+            raise AttributeError(name)
+        return getattr(self.annotation, name)
+    #__getattr__
+#LocusOverlay
+
+class GeneOverlay(Gene) :
+    """
+    A Gene object with overlays for its transcripts. All other attributes
+    are taken from the Gene object, which is not altered.
+
+    Special methods:
+        - __init__()    ; Initialise the class.
+        - __getattr__() ; Get an attribute from the Gene object.
+    """
+
+    __slots__ = ('annotation',)
+
+    def __init__(self, gene) :
+        """
+        Initialise the class.
+
+        Public variables (altered):
+            - annotation     ; The Gene object.
+            - transcriptList ; A list of LocusOverlay objects.
+
+        @arg gene: Gene object
+        @type gene: object
+        """
+
+        self.annotation = gene
+        self.transcriptList = [LocusOverlay(j) for j in gene.transcriptList]
+    #__init__
+
+    def __getattr__(self, name) :
+        if name == 'annotation' :
+            raise AttributeError(name)
+        return getattr(self.annotation, name)
+    #__getattr__
+
+    def _locusPosition(self, name) :
+        return self.annotation._locusPosition(name)
+    #_locusPosition
+
+    def _linkPosition(self, protAcc) :
+        return self.annotation._linkPosition(protAcc)
+    #_linkPosition
+#GeneOverlay
+
+class RecordOverlay(Record) :
+    """
+    The variant dependent state of a Record object, see Record.overlay. All
+    other attributes are taken from the Record object, which is not
+    altered.
+
+    Special methods:
+        - __init__()    ; Initialise the class.
+        - __getattr__() ; Get an attribute from the Record object.
+    """
+
+    __slots__ = ('annotation',)
+
+    def __init__(self, record) :
+        """
+        Initialise the class.
+
+        Public variables (altered):
+            - annotation       ; The Record object.
+            - geneList         ; A list of GeneOverlay objects.
+            - description      ; The genomic variant description.
+            - chromDescription ; The chromosomal variant description.
+
+        @arg record: Record object
+        @type record: object
+        """
+
+        self.annotation = record
+        self.geneList = [GeneOverlay(i) for i in record.geneList]
+        self.description = record.description
+        self.chromDescription = record.chromDescription
+    #__init__
+
+    def __getattr__(self, name) :
+        if name == 'annotation' :
+            raise AttributeError(name)
+        return getattr(self.annotation, name)
+    #__getattr__
+
+    def _genePosition(self, name) :
+        return self.annotation._genePosition(name)
+    #_genePosition
+
+    def annotate(self) :
+        """
+        Annotate the Record object, see Record.annotate.
+        """
+
+        self.annotation.annotate()
+    #annotate
+
+    def overlay(self) :
+        """
+        Returns a new overlay of the Record object, see Record.overlay.
+
+        @return: RecordOverlay object
+        @rtype: object
+        """
+
+        return self.annotation.overlay()
+    #overlay
+#RecordOverlay
+
+class GenRecord() :
+    """
+    Convert a GenBank record to a nested dictionary.
+
+    Public methods:
+        - checkRecord()   ;   Check and repair self.record.
+    """
+
+    def __init__(self, output) :
+        """
+        Initialise the class.
+
+        Public variable:
+            - record    ; A record object
+
+        @arg output: an output object
+        @type output: object
+        """
+        self.__output = output
+        self.record = None
+        self.__affectedOnly = False
+        self.__affected = set()
+        self.__current = None
+        self.__rawVariants = []
+    #__init__
+
+    def __maybeInvert(self, gene, string, string_reverse=None) :
+        """
+        Return the reverse-complement of a DNA sequence if the gene is in
+        the reverse orientation.
+
+        @arg gene: Gene
+        @type gene: object
+        @arg string: DNA sequence
+        @type string: unicode
+        @kwarg string_reverse: DNA sequence to use (if not None) for the
+            reverse complement.
+
+        @return: reverse-complement (if applicable), otherwise return the
+            original.
+        @rtype: unicode
+        """
+        if gene.orientation == -1:
+            if string_reverse:
+                string = string_reverse
+            return util.reverse_complement(string)
+        return string
+    #__maybeInvert
+
+    def checkRecord(self) :
+        """
+        Check if the record in self.record is compatible with mutalyzer (see
+        Record.annotate) and report the problems found in its gene models.
+        """
+
+        self.record.annotate()
+        self.__current = []
+
+        for g, i in enumerate(self.record.geneList) :
+            for t, j in enumerate(i.transcriptList) :
+                if j.current :
+                    self.__current.append((g, t))
+                for code, codeOther, message in j.annotationWarnings :
+                    self.__output.addMessage(__file__, 2,
+                        code if j.current else codeOther, message)
+
+        self.__limitTranscripts()
     #checkRecord
 
+    def isChecked(self) :
+        """
+        Tells if checkRecord was called for self.record.
+
+        @return: True if the record was checked, False otherwise
+        @rtype: bool
+        """
+
+        return self.__current is not None
+    #isChecked
+
+    def __limitTranscripts(self) :
+        """
+        If the record has at least AFFECTED_TRANSCRIPTS_THRESHOLD
+        transcripts, descriptions are only generated for the current
+        transcript and the transcripts near a variant (found with the index
+        in Record.findTranscripts). All other transcripts are marked as
+        unaffected.
+        """
+        self.__affectedOnly = False
+
+        threshold = settings.AFFECTED_TRANSCRIPTS_THRESHOLD
+        if threshold is None or self.record.countTranscripts() < threshold :
+            return
+
+        for i in self.record.geneList :
+            for j in i.transcriptList :
+                if j.CM :
+                    j.affected = j.current
+
+        self.__affected = set((g, t) for g, t in self.__current
+            if self.record.geneList[g].transcriptList[t].CM)
+        self.__affectedOnly = True
+    #__limitTranscripts
+
+    def __affectedTranscripts(self, start, stop) :
+        """
+        Find the transcripts within AFFECTED_TRANSCRIPTS_FLANK of a variant
+        and add them to the affected transcripts. Transcripts that are
+        affected (the current transcript and those near an earlier variant)
+        get a description of every variant, so they are always included.
+
+        @arg start: first g. position of the variant
+        @type start: integer
+        @arg stop: last g. position of the variant
+        @type stop: integer
+
+        @return: genes and transcripts in record order
+        @rtype: list(tuple(object, object))
+        """
+        geneList = self.record.geneList
+
+        self.__affected.update(self.record.findTranscripts(
+            start - settings.AFFECTED_TRANSCRIPTS_FLANK,
+            stop + settings.AFFECTED_TRANSCRIPTS_FLANK))
+
+        return [(geneList[g], geneList[g].transcriptList[t])
+                for g, t in sorted(self.__affected)]
+    #__affectedTranscripts
+
     def current_transcript(self):
         """
         Return the current transcript.
@@ -637,6 +1159,12 @@ class GenRecord() :
         @return: Current transcript if there is one, None otherwise.
         @rtype: GenRecord.Locus
         """
+        if self.__current is not None:
+            # The current transcript is known since checkRecord.
+            for g, t in self.__current:
+                return self.record.geneList[g].transcriptList[t]
+            return None
+
         for i in self.record.geneList:
             for j in i.transcriptList:
                 if j.current:
@@ -649,6 +1177,9 @@ class GenRecord() :
         """
         Generate variant descriptions for all genes, transcripts, etc.
 
+        On large records (see checkRecord), only transcripts near the variant
+        get a description.
+
         @arg start_g: start position
         @type start_g: integer
         @arg stop_g: stop position
@@ -758,82 +1289,118 @@ class GenRecord() :
                 self.record.addToChromDescription("%s%c>%c" % (
                     chromStart, chromArg1, chromArg2))
 
-        for i in self.record.geneList :
-            for j in i.transcriptList :
-                if j.CM :
-                    orientedStart = forwardStart
-                    orientedStop = forwardStop
-                    if i.orientation == -1 :
-                        orientedStart = reverseStart
-                        orientedStop = reverseStop
-                    #if
+        rawVariant = (forwardStart, forwardStop, reverseStart, reverseStop,
+                      varType, arg1, arg2, arg1_reverse, start_fuzzy,
+                      stop_fuzzy)
 
-                    # Turn of translation to protein if we hit splice sites.
-                    # For the current transcript, this is handled with more
-                    # care in variantchecker.py.
-                    if not j.current and \
-                           util.over_splice_site(orientedStart, orientedStop,
-                                                 j.CM.RNA):
-                        j.translate = False
-
-                    # And check whether the variant hits CDS start.
-                    if j.molType == 'c' and forwardStop >= j.CM.x2g(1, 0) \
-                       and forwardStart <= j.CM.x2g(3, 0) :
-                        self.__output.addMessage(__file__, 2, "WSTART",
-                            "Mutation in start codon of gene %s transcript " \
-                            "%s." % (i.name, j.name))
-                        if not j.current:
-                            j.translate = False
-
-                    # FIXME Check whether the variant hits a splice site.
-
-                    if varType != "subst" :
-                        if orientedStart != orientedStop :
-                            if (start_fuzzy or stop_fuzzy) and not j.current:
-                                # Don't generate descriptions on transcripts
-                                # other than the current in the case of fuzzy
-                                # positions.
-                                j.cancelDescription()
-                            else:
-                                j.addToDescription("%s_%s%s%s" % (
-                                    j.CM.g2c(orientedStart, start_fuzzy),
-                                    j.CM.g2c(orientedStop, stop_fuzzy),
-                                    varType, self.__maybeInvert(i, arg1, arg1_reverse)))
-                                self.checkIntron(i, j, orientedStart)
-                                self.checkIntron(i, j, orientedStop)
-                        #if
-                        else :
-                            if start_fuzzy and not j.current:
-                                # Don't generate descriptions on transcripts
-                                # other than the current in the case of fuzzy
-                                # positions.
-                                j.cancelDescription()
-                            else:
-                                j.addToDescription("%s%s%s" % (
-                                    j.CM.g2c(orientedStart, start_fuzzy),
-                                    varType,
-                                    self.__maybeInvert(i, arg1, arg1_reverse)))
-                                self.checkIntron(i, j, orientedStart)
-                        #else
-                    #if
-                    else :
-                        if start_fuzzy and not j.current:
-                            # Don't generate descriptions on transcripts
-                            # other than the current in the case of fuzzy
-                            # positions.
-                            j.cancelDescription()
-                        else:
-                            j.addToDescription("%s%c>%c" % (
-                                j.CM.g2c(orientedStart, start_fuzzy),
-                                self.__maybeInvert(i, arg1, arg1_reverse),
-                                self.__maybeInvert(i, arg2)))
-                            self.checkIntron(i, j, orientedStart)
-                    #else
-                #if
+        if not self.__affectedOnly :
+            for i in self.record.geneList :
+                for j in i.transcriptList :
+                    if j.CM :
+                        self.__nameTranscript(i, j, rawVariant)
             #for
+            return
+        #if
+
+        for i, j in self.__affectedTranscripts(
+                min(forwardStart, reverseStop), max(forwardStop, reverseStart)) :
+            if not j.affected :
+                # Catch up on the raw variants we skipped for this transcript.
+                j.affected = True
+                for previous in self.__rawVariants :
+                    self.__nameTranscript(i, j, previous)
+            self.__nameTranscript(i, j, rawVariant)
         #for
+        self.__rawVariants.append(rawVariant)
     #name
 
+    def __nameTranscript(self, gene, transcript, rawVariant) :
+        """
+        Generate the variant description for one transcript.
+
+        @arg gene: Gene
+        @type gene: object
+        @arg transcript: transcript
+        @type transcript: object
+        @arg rawVariant: forward and reverse start and stop positions, the
+            variant type, argument 1 and 2, argument 1 on the reverse strand
+            and whether the start and stop positions are fuzzy
+        @type rawVariant: tuple
+        """
+        (forwardStart, forwardStop, reverseStart, reverseStop, varType,
+         arg1, arg2, arg1_reverse, start_fuzzy, stop_fuzzy) = rawVariant
+
+        orientedStart = forwardStart
+        orientedStop = forwardStop
+        if gene.orientation == -1 :
+            orientedStart = reverseStart
+            orientedStop = reverseStop
+        #if
+
+        # Turn of translation to protein if we hit splice sites.
+        # For the current transcript, this is handled with more
+        # care in variantchecker.py.
+        if not transcript.current and \
+               util.over_splice_site(orientedStart, orientedStop,
+                                     transcript.CM.RNA):
+            transcript.translate = False
+
+        # And check whether the variant hits CDS start.
+        if transcript.molType == 'c' and \
+               forwardStop >= transcript.CM.x2g(1, 0) and \
+               forwardStart <= transcript.CM.x2g(3, 0) :
+            self.__output.addMessage(__file__, 2, "WSTART",
+                "Mutation in start codon of gene %s transcript " \
+                "%s." % (gene.name, transcript.name))
+            if not transcript.current:
+                transcript.translate = False
+
+        # FIXME Check whether the variant hits a splice site.
+
+        if varType != "subst" :
+            if orientedStart != orientedStop :
+                if (start_fuzzy or stop_fuzzy) and not transcript.current:
+                    # Don't generate descriptions on transcripts
+                    # other than the current in the case of fuzzy
+                    # positions.
+                    transcript.cancelDescription()
+                else:
+                    transcript.addToDescription("%s_%s%s%s" % (
+                        transcript.CM.g2c(orientedStart, start_fuzzy),
+                        transcript.CM.g2c(orientedStop, stop_fuzzy),
+                        varType, self.__maybeInvert(gene, arg1, arg1_reverse)))
+                    self.checkIntron(gene, transcript, orientedStart)
+                    self.checkIntron(gene, transcript, orientedStop)
+            #if
+            else :
+                if start_fuzzy and not transcript.current:
+                    # Don't generate descriptions on transcripts
+                    # other than the current in the case of fuzzy
+                    # positions.
+                    transcript.cancelDescription()
+                else:
+                    transcript.addToDescription("%s%s%s" % (
+                        transcript.CM.g2c(orientedStart, start_fuzzy),
+                        varType,
+                        self.__maybeInvert(gene, arg1, arg1_reverse)))
+                    self.checkIntron(gene, transcript, orientedStart)
+            #else
+        #if
+        else :
+            if start_fuzzy and not transcript.current:
+                # Don't generate descriptions on transcripts
+                # other than the current in the case of fuzzy
+                # positions.
+                transcript.cancelDescription()
+            else:
+                transcript.addToDescription("%s%c>%c" % (
+                    transcript.CM.g2c(orientedStart, start_fuzzy),
+                    self.__maybeInvert(gene, arg1, arg1_reverse),
+                    self.__maybeInvert(gene, arg2)))
+                self.checkIntron(gene, transcript, orientedStart)
+        #else
+    #__nameTranscript
+
     def checkIntron(self, gene, transcript, position):
         """
         Checks if a position is on or near a splice site
@@ -24,12 +24,15 @@ from httplib import HTTPException
 from sqlalchemy.orm.exc import NoResultFound
 from xml.dom import DOMException
 
+from mutalyzer import nc_db
+from mutalyzer import ncbi
 from mutalyzer import util
 from mutalyzer.config import settings
 from mutalyzer.db import session
 from mutalyzer.db.models import Reference
 from mutalyzer.parsers import genbank
 from mutalyzer.parsers import lrg
+from mutalyzer.redisclient import client as redis
 
 
 class Retriever(object):
@@ -217,23 +220,103 @@ class GenBankRetriever(Retriever):
         if extract:
             out_filename = unicode(record.id)
             if out_filename != filename:
-                # Add the reference (incl version) to the reference output
-                # This differs if the original reference lacks a version
-                self._output.addOutput('reference', unicode(record.id))
-                self._output.addOutput(
-                    'BatchFlags',
-                    ('A1', (filename, out_filename, filename+'.')))
-                self._output.addMessage(
-                    __file__, 2, 'WNOVER',
-                    'No version number is given, using {}. Please use this '
-                    'number to reduce downloading overhead.'.format(
-                        unicode(record.id)))
+                # The original reference lacks a version.
+                if out_filename.split('.')[0] == filename:
+                    ncbi.cache_accession_version(filename, out_filename)
+                self._report_version(filename, out_filename)
 
         if not self._write(raw_data, out_filename):
             return None
 
         return out_filename
 
+    def _report_version(self, accession, accession_version):
+        """
+        Report the version used for an accession number given without
+        version.
+
+        :arg unicode accession: The accession number (without version).
+        :arg unicode accession_version: The accession number with the version
+          that is used.
+        """
+        # Add the reference (incl version) to the reference output.
+        self._output.addOutput('reference', accession_version)
+        self._output.addOutput(
+            'BatchFlags',
+            ('A1', (accession, accession_version, accession+'.')))
+        self._output.addMessage(
+            __file__, 2, 'WNOVER',
+            'No version number is given, using {}. Please use this '
+            'number to reduce downloading overhead.'.format(
+                accession_version))
+
+    def _current_version_reference(self, accession):
+        """
+        Find the cached reference for the current version of an accession
+        number given without version.
+
+        The current version is resolved with :func:`ncbi.get_accession_version`
+        which avoids downloading the entire record only to learn its version.
+
+        :arg unicode accession: The accession number (without version).
+
+        :returns: The reference for the current version, or `None` if the
+          current version could not be resolved or is not in the cache.
+        :rtype: Reference
+        """
+        accession_version = ncbi.get_accession_version(accession)
+        if accession_version is None:
+            return None
+
+        reference = Reference.query.filter_by(
+            accession=accession_version).first()
+        if (reference is None or
+                not os.path.isfile(self._name_to_file(accession_version))):
+            return None
+
+        self._report_version(accession, accession_version)
+        return reference
+
+    def _fetch_with_negative_cache(self, accession):
+        """
+        Fetch a record from the NCBI, unless an earlier attempt failed
+        recently.
+
+        Failures are cached per accession number with the error code and
+        description that were reported, so they can be reported again. The
+        cache value expires after the number of seconds configured for the
+        error code in `NEGATIVE_REFERENCE_CACHE_EXPIRATION`. Errors with a
+        code that is not configured are not cached.
+
+        :arg unicode accession: The accession number.
+
+        :returns: See :meth:`fetch`.
+        :rtype: unicode
+        """
+        key = 'retriever:negative:%s' % accession
+
+        failure = redis.get(key)
+        if failure is not None:
+            code, description = failure.split(':', 1)
+            self._output.addMessage(__file__, 4, code, description)
+            return None
+
+        expirations = settings.NEGATIVE_REFERENCE_CACHE_EXPIRATION
+        counts = dict((code, len(self._output.getMessagesWithErrorCode(code)))
+                      for code in expirations)
+
+        filename = self.fetch(accession)
+
+        if filename is None:
+            for code in expirations:
+                messages = self._output.getMessagesWithErrorCode(code)
+                if len(messages) > counts[code]:
+                    redis.setex(key, expirations[code], '%s:%s' % (
+                        code, messages[-1].description))
+                    break
+
+        return filename
+
     def fetch(self, name):
         """
         Todo: Documentation.
@@ -325,6 +408,9 @@ class GenBankRetriever(Retriever):
         make a new UD number.
         The content of the slice is placed in the cache with the UD number
         as filename.
+        Instead of downloading, the slice is created locally if the
+        chromosome is available in the gbparser database and the local
+        sequence files.
 
         :arg unicode accno: The accession number of the chromosome.
         :arg int start: Start position of the slice (one-based, inclusive, in
@@ -366,23 +452,27 @@ class GenBankRetriever(Retriever):
             # It's still present.
             return reference.accession
 
-        # It's not present, so download it.
-        try:
-            # EFetch `seq_start` and `seq_stop` are one-based, inclusive, and
-            # in reference orientation.
-            handle = Entrez.efetch(
-                db='nuccore', rettype='gbwithparts', retmode='text', id=accno,
-                seq_start=start, seq_stop=stop, strand=orientation)
-            raw_data = handle.read()
-            handle.close()
-        except (IOError, urllib2.HTTPError, HTTPException) as e:
-            self._output.addMessage(
-                __file__, -1, 'INFO',
-                'Error connecting to Entrez nuccore database: {}'.format(
-                    unicode(e)))
-            self._output.addMessage(
-                __file__, 4, 'ERETR', 'Could not retrieve slice.')
-            return None
+        # It's not present, so create it from the local chromosome reference
+        # if we have it, otherwise download it.
+        raw_data = nc_db.get_genbank_slice(accno, start, stop, orientation)
+        if raw_data is None:
+            try:
+                # EFetch `seq_start` and `seq_stop` are one-based, inclusive,
+                # and in reference orientation.
+                handle = Entrez.efetch(
+                    db='nuccore', rettype='gbwithparts', retmode='text',
+                    id=accno, seq_start=start, seq_stop=stop,
+                    strand=orientation)
+                raw_data = handle.read()
+                handle.close()
+            except (IOError, urllib2.HTTPError, HTTPException) as e:
+                self._output.addMessage(
+                    __file__, -1, 'INFO',
+                    'Error connecting to Entrez nuccore database: {}'.format(
+                        unicode(e)))
+                self._output.addMessage(
+                    __file__, 4, 'ERETR', 'Could not retrieve slice.')
+                return None
 
         # Calculate the hash of the downloaded file.
         md5sum = self._calculate_hash(raw_data)
@@ -413,7 +503,8 @@ class GenBankRetriever(Retriever):
     def retrievegene(self, gene, organism, upstream=0, downstream=0):
         """
         Query the NCBI for the chromosomal location of a gene and make a
-        slice if the gene can be found.
+        slice if the gene can be found. If the gene is found on a chromosome
+        in the gbparser database, its location is taken from there instead.
 
         :arg unicode gene: Name of the gene.
         :arg unicode organism: The organism in which we search.
@@ -423,6 +514,19 @@ class GenBankRetriever(Retriever):
         :returns: GenBank record.
         :rtype: object
         """
+        # Use the local chromosome references if they have the gene.
+        location = nc_db.get_gene_location(gene, organism)
+        if location is not None:
+            chr_acc_ver, chr_start, chr_stop, orientation = location
+            if orientation == 1:
+                chr_start -= upstream
+                chr_stop += downstream
+            else:
+                chr_start -= downstream
+                chr_stop += upstream
+            return self.retrieveslice(
+                chr_acc_ver, chr_start, chr_stop, orientation)
+
         # Search the NCBI for a specific gene in an organism.
         query = '{}[Gene] AND {}[Orgn]'.format(gene, organism)
         try:
@@ -640,11 +744,12 @@ class GenBankRetriever(Retriever):
 
         The record is found by trying the following options in order:
 
-        1. Returned from the cache if it is there.
+        1. Returned from the cache if it is there. For an accession number
+           without version, this is tried with the current version.
         2. Re-created (if it was created by slicing) or re-downloaded (if it
            was created by URL) if we have information on its source in the
            database.
-        3. Fetched from the NCBI.
+        3. Fetched from the NCBI, unless this failed recently.
 
         :arg unicode accession: A RefSeq accession number.
 
@@ -654,9 +759,13 @@ class GenBankRetriever(Retriever):
         """
         reference = Reference.query.filter_by(accession=accession).first()
 
+        if reference is None and '.' not in accession:
+            # Without version, we might have the current version in the cache.
+            reference = self._current_version_reference(accession)
+
         if reference is None:
             # We don't know it, fetch it from NCBI.
-            filename = self.fetch(accession)
+            filename = self._fetch_with_negative_cache(accession)
 
         else:
             # We have seen it before.
@@ -708,6 +817,7 @@ class GenBankRetriever(Retriever):
 
         if reference:
             record.id = reference.accession
+            record.checksum = reference.checksum
         else:
             record.id = record.source_id
 
@@ -760,8 +870,10 @@ class LRGRetriever(Retriever):
         file_handle = bz2.BZ2File(filename, 'r')
 
         # Create GenRecord.Record from LRG file.
-        record = lrg.create_record(file_handle.read())
+        data = file_handle.read()
         file_handle.close()
+        record = lrg.create_record(data)
+        record.checksum = self._calculate_hash(data)
 
         # We don't create LRGs from other sources, so id is always the same
         # as source_id.
@@ -14,9 +14,11 @@ Module used to add and manage the Batch Jobs.
 #             - Batch Name Checker
 #             - Batch Syntax Checker
 #             - Batch Position Converter
+#             - Batch VCF Converter
 
 from __future__ import unicode_literals
 
+import gzip
 import io
 import os                               # os.path.exists
 import smtplib                          # smtplib.STMP
@@ -30,6 +32,7 @@ from mutalyzer.db.models import Assembly, BatchJob, BatchQueueItem
 from mutalyzer import ncbi
 from mutalyzer import stats
 from mutalyzer import variantchecker
+from mutalyzer import vcf
 from mutalyzer.grammar import Grammar
 from mutalyzer.output import Output
 from mutalyzer.mapping import Converter
@@ -39,6 +42,17 @@ from mutalyzer import website
 __all__ = ["Scheduler"]
 
 
+def _batch_input_dir():
+    """
+    Get the directory for batch job input files, creating it if needed.
+    """
+    path = (settings.BATCH_INPUT_DIR or
+            os.path.join(settings.CACHE_DIR, 'batch-input'))
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    return path
+
+
 class Scheduler() :
     """
     Special methods:
@@ -53,6 +67,7 @@ class Scheduler() :
         - Batch Name Checker
         - Batch Syntax Checker
         - Batch Position Converter
+        - Batch VCF Converter
     """
 
     def __init__(self) :
@@ -428,6 +443,8 @@ Mutalyzer batch scheduler""" % download_url)
                         self._processConversion(batch_job, item, flags)
                     elif batch_job.job_type == 'snp-converter':
                         self._processSNP(batch_job, item, flags)
+                    elif batch_job.job_type == 'vcf-converter':
+                        self._processVcf(batch_job, item, flags)
                     else:
                         # Unknown job type, should never happen.
                         # Todo: Log some screaming message.
@@ -770,6 +787,62 @@ Mutalyzer batch scheduler""" % download_url)
                      "Finished SNP converter batch rs%s" % cmd)
     #_processSNP
 
+    def _processVcf(self, batch_job, cmd, flags):
+        """
+        Process a VCF file from the VCF Converter, write the results to the
+        job-file. Contrary to the other batch jobs, the queue has only one
+        entry for the entire VCF file, which is converted in one go by a
+        pool of worker processes (see `mutalyzer.vcf`). If an Exception is
+        raised, the error is written to the job-file.
+
+        Side-effect:
+            - Output written to outputfile.
+            - Input file removed.
+
+        @arg cmd: Filename of the VCF file in the batch input directory
+        @type cmd: unicode
+        @arg flags: Flags of the current entry (unused)
+        @type flags:
+        """
+        O = Output(__file__)
+        O.addMessage(__file__, -1, "INFO",
+            "Received VCF converter batch file " + cmd)
+
+        stats.increment_counter('vcf-converter/batch')
+
+        result_id = batch_job.result_id
+        assembly_name_or_alias = batch_job.argument
+
+        path = os.path.join(_batch_input_dir(), cmd)
+        filename = "%s/batch-job-%s.txt" % (settings.CACHE_DIR, result_id)
+
+        handle = io.open(filename, mode='w', encoding='utf-8')
+        try:
+            try:
+                assembly = Assembly.by_name_or_alias(assembly_name_or_alias)
+            except NoResultFound:
+                O.addMessage(__file__, 3, 'ENOASSEMBLY',
+                             'Not a valid assembly: ' + assembly_name_or_alias)
+                raise
+
+            with io.open(path, mode='rb') as input_handle:
+                vcf.convert(assembly,
+                            io.TextIOWrapper(input_handle, encoding='utf-8',
+                                             errors='replace'),
+                            handle, processes=settings.VCF_CONVERTER_PROCESSES)
+        except Exception:
+            O.addMessage(__file__, 4, "EBATCHU",
+                         "Unexpected error occurred, dev-team notified")
+            handle.write("%s\n" % "|".join(O.getBatchMessages(2)))
+        finally:
+            handle.close()
+            if os.path.exists(path):
+                os.remove(path)
+
+        O.addMessage(__file__, -1, "INFO",
+                     "Finished VCF converter batch file " + cmd)
+    #_processVcf
+
     def addJob(self, email, queue, columns, job_type, argument=None):
         """
         Add a job to the Database and start the BatchChecker.
@@ -821,4 +894,53 @@ Mutalyzer batch scheduler""" % download_url)
         session.commit()
         return batch_job.result_id
     #addJob
+
+    def addVcfJob(self, email, vcf_file, argument):
+        """
+        Add a VCF Converter job to the Database and start the BatchChecker.
+
+        The VCF file is stored in the batch input directory (uncompressed)
+        and added to the queue as one entry. If it is larger than
+        `VCF_CONVERTER_MAX_SIZE` after decompression, no job is added.
+
+        @arg email:         e-mail address of batch supplier
+        @type email:        unicode
+        @arg vcf_file:      The VCF file, optionally gzip compressed
+        @type vcf_file:     file (binary, seekable)
+        @arg argument:      The assembly name or alias
+        @type argument:     unicode
+
+        @return: result_id, or None if the VCF file is too large
+        @rtype: unicode
+        """
+        batch_job = BatchJob('vcf-converter', email=email, argument=argument)
+
+        filename = 'batch-input-%s.vcf' % batch_job.result_id
+        path = os.path.join(_batch_input_dir(), filename)
+
+        if vcf_file.read(2) == b'\x1f\x8b':
+            vcf_file.seek(0)
+            vcf_file = gzip.GzipFile(fileobj=vcf_file, mode='rb')
+        else:
+            vcf_file.seek(0)
+
+        # Decompress in chunks, so we can stop as soon as the limit is passed
+        # (a small gzip file can decompress to a very large file).
+        size = 0
+        with io.open(path, mode='wb') as handle:
+            for chunk in iter(lambda: vcf_file.read(16 * 1024), b''):
+                size += len(chunk)
+                if size > settings.VCF_CONVERTER_MAX_SIZE:
+                    break
+                handle.write(chunk)
+
+        if size > settings.VCF_CONVERTER_MAX_SIZE:
+            os.remove(path)
+            return None
+
+        session.add(batch_job)
+        session.add(BatchQueueItem(batch_job, filename))
+        session.commit()
+        return batch_job.result_id
+    #addVcfJob
 #Scheduler
@@ -25,12 +25,20 @@ BATCH_NOTIFICATION_EMAIL = None
 # reference files from NCBI or user) and batch job results.
 CACHE_DIR = '/tmp'
 
+# Directory to store batch job input files (e.g., uploaded VCF files) until
+# they are processed. If `None`, the `batch-input` subdirectory of `CACHE_DIR`
+# will be used.
+BATCH_INPUT_DIR = None
+
 # Maximum size for uploaded and downloaded files (in bytes).
 MAX_FILE_SIZE = 10 * 1048576 # 10 MB
 
 # Maximum sequence length for description extractor (in bases).
 EXTRACTOR_MAX_INPUT_LENGTH = 50 * 1000 # 50 Kbp
 
+# Maximum number of variants in one numberConversionBatch webservice call.
+NUMBER_CONVERSION_BATCH_MAX_VARIANTS = 10000
+
 # The WSGI application runs behind a reverse proxy (e.g., nginx using
 # proxy_pass). This needs to be set if the application is mapped to a URL
 # other than / or a different HTTP scheme is used by the reverse proxy.
@@ -47,9 +55,38 @@ DATABASE_URI = 'sqlite://'
 # Default genome assembly (by name or alias).
 DEFAULT_ASSEMBLY = 'hg19'
 
+# Maximum number of transcript mappings for which a crossmapper is kept in
+# memory by the position converter (per process).
+CROSSMAP_CACHE_SIZE = 10000
+
+# Maximum number of variant descriptions for which the parse result is kept
+# in memory (per process).
+GRAMMAR_CACHE_SIZE = 10000
+
+# Maximum number of transcripts for which the original CDS and protein are
+# kept in memory (per process).
+PROTEIN_CACHE_SIZE = 10000
+
+# Maximum number of blocks of 1000 bases for which restriction sites are kept
+# in memory (per process). A block takes about 5 kB.
+RESTRICTION_INDEX_CACHE_SIZE = 10000
+
+# Parser for variant descriptions, either 'descent' (a recursive descent
+# parser for the most common descriptions, using pyparsing for all others) or
+# 'pyparsing'.
+GRAMMAR_BACKEND = 'descent'
+
+# Keep a resident in-memory index of the transcript mappings per genome
+# assembly, built on first use in each process.
+TRANSCRIPT_MAPPING_INDEX = False
+
 # Database for NC (dbgb) connection URI (can be any SQLAlchemy connection URI).
 DATABASE_GB_URI = 'sqlite://'
 
+# Keep a resident in-memory index of the transcripts per chromosome reference
+# in the NC (dbgb) database, built on first use in each process.
+NC_TRANSCRIPT_INDEX = False
+
 # Name and location of the log file.
 LOG_FILE = '/tmp/mutalyzer.log'
 
@@ -70,10 +107,41 @@ LRG_PREFIX_URL = 'ftp://ftp.ebi.ac.uk/pub/databases/lrgex/'
 # Allow for this fraction of errors in batch jobs.
 BATCH_JOBS_ERROR_THRESHOLD = 0.05
 
+# Restrict variant descriptions and protein prediction to transcripts near
+# the variant on records with at least this many transcripts (if None, never).
+AFFECTED_TRANSCRIPTS_THRESHOLD = 100
+
+# Distance from the variant within which transcripts are considered affected
+# (in base pairs).
+AFFECTED_TRANSCRIPTS_FLANK = 5000
+
+# Number of worker processes for the VCF converter (if None, the number of
+# cores).
+VCF_CONVERTER_PROCESSES = None
+
+# Number of VCF records per unit of work for the VCF converter.
+VCF_CONVERTER_CHUNK_SIZE = 1000
+
+# Maximum size for VCF converter input files after decompression (in bytes).
+VCF_CONVERTER_MAX_SIZE = 10 * 10 * 1048576 # 100 MB
+
 # Cache expiration time for negative transcript<->protein links from the NCBI
 # (in seconds).
 NEGATIVE_LINK_CACHE_EXPIRATION = 60 * 60 * 24 * 30
 
+# Cache expiration time for current versions of accession numbers from the
+# NCBI (in seconds).
+ACCESSION_VERSION_CACHE_EXPIRATION = 60 * 60 * 24
+
+# Cache expiration times for failed reference retrievals from the NCBI per
+# error code (in seconds). Failures with other error codes are not cached.
+NEGATIVE_REFERENCE_CACHE_EXPIRATION = {
+    'ERETR': 60 * 10,
+    'ENORECORD': 60 * 60,
+    'ENOPARSE': 60 * 60 * 24,
+    'ENOSEQ': 60 * 60 * 24
+}
+
 # URL to the website root (without trailing slash). Used for generating
 # download links in the batch scheduler.
 WEBSITE_ROOT_URL = None
@@ -5,14 +5,16 @@ Models backed by SQL using SQLAlchemy.
 
 from __future__ import unicode_literals
 
+from array import array
 from datetime import datetime
 import sqlite3
+import sys
 import uuid
 
 import binning
 from sqlalchemy import event, or_
 from sqlalchemy import (Boolean, Column, DateTime, Enum, ForeignKey, Index,
-                        Integer, String, Text, TypeDecorator)
+                        Integer, LargeBinary, String, Text, TypeDecorator)
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import backref, relationship
 
@@ -22,7 +24,8 @@ from mutalyzer import db
 BATCH_JOB_TYPES = ('name-checker',
                    'syntax-checker',
                    'position-converter',
-                   'snp-converter')
+                   'snp-converter',
+                   'vcf-converter')
 
 
 @event.listens_for(Engine, 'connect')
@@ -42,26 +45,60 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
 
 class Positions(TypeDecorator):
     """
-    Represents an immutable list of integers as a concatentation of their
-    string serializations.
+    Represents an immutable list of integers as a packed array of signed
+    32-bit little-endian integers.
+
+    Values are packed and unpacked as a whole by the `array` module, so no
+    integer is serialized or parsed separately. The packed representation can
+    also be read directly with `unpack` (or `numpy.frombuffer` with dtype
+    ``<i4``).
 
     Adapted from the `Marshal JSON Strings
     <http://docs.sqlalchemy.org/en/latest/core/types.html#marshal-json-strings>`_
     example in the SQLAlchemy documentation.
     """
-    impl = Text
+    impl = LargeBinary
+
+    @staticmethod
+    def pack(value):
+        """
+        Pack a list of integers.
+
+        :arg list(int) value: The integers.
+
+        :returns: The packed integers.
+        :rtype: bytes
+        """
+        positions = array('i', value)
+        if sys.byteorder == 'big':
+            positions.byteswap()
+        return positions.tostring()
+
+    @staticmethod
+    def unpack(value):
+        """
+        Unpack a packed list of integers.
+
+        :arg bytes value: The packed integers.
+
+        :returns: The integers.
+        :rtype: array.array
+        """
+        positions = array('i')
+        positions.fromstring(bytes(value))
+        if sys.byteorder == 'big':
+            positions.byteswap()
+        return positions
 
     def process_bind_param(self, value, dialect):
         if value is not None:
-            value = ','.join(unicode(i) for i in value)
+            value = self.pack(value)
         return value
 
     def process_result_value(self, value, dialect):
         if value is None:
             return None
-        if value == '':
-            return []
-        return [int(s) for s in value.split(',')]
+        return self.unpack(value).tolist()
 
 
 class BatchJob(db.Base):
@@ -80,7 +117,8 @@ class BatchJob(db.Base):
     job_type = Column(Enum(*BATCH_JOB_TYPES, name='job_type'), nullable=False)
 
     #: Optional argument (currently only used when `job_type` is
-    #: ``PositionConverter``, where it denotes the assembly).
+    #: ``PositionConverter`` or ``VcfConverter``, where it denotes the
+    #: assembly).
     argument = Column(String(20))
 
     #: Identifier to use in the job result filename and thus the URL for
@@ -0,0 +1,585 @@
+"""
+Recursive descent parser for the most common variant descriptions.
+
+This is a faster alternative to the pyparsing grammar in
+:mod:`mutalyzer.grammar` for descriptions of DNA and RNA variants on a
+reference sequence accession number, either as a single variant or as a list
+of variants in one allele. Other descriptions (protein variants, nested
+allele sets, uncertain positions in parentheses, etc.) are not supported and
+must be parsed with the pyparsing grammar.
+
+Every function below implements the grammar rule of the same name (see the
+BNF comments in :mod:`mutalyzer.grammar`) and constructs its parse results in
+exactly the same way pyparsing does, so the parse trees are interchangeable.
+This includes pyparsing's choice of the longest alternative for the `^`
+operator. Rule functions get the description and a position in it, and
+return a tuple of the position after the match and the parse results, or
+`None` if the rule does not match. Where a rule might match in a way that is
+not implemented here, `_Unsupported` is raised.
+"""
+
+
+from __future__ import unicode_literals
+
+import re
+
+from pyparsing import ParseResults
+
+
+# Regular expressions for the pyparsing `Word` tokens in the grammar.
+_NUMBER = re.compile('[0-9]+')
+_NT_STRING = re.compile('[acgturykmswbdhvnACGTURYKMSWBDHVN]+')
+_ACC_NO_STEM = re.compile('[a-zA-Z_]+[0-9]+')
+_GENE_NAME = re.compile('[a-zA-Z0-9-]+')
+
+_NTS = frozenset('acgturykmswbdhvnACGTURYKMSWBDHVN')
+_NUMS = frozenset('0123456789')
+_REF_TYPES = frozenset('cgmnr')
+
+# Characters that may continue an accession number after a nucleotide
+# string.
+_ACC_NO = frozenset('abcdefghijklmnopqrstuvwxyz'
+                    'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+
+# Descriptions containing any of these characters are not supported.
+_UNSUPPORTED = frozenset(' \t\n\r\f\v')
+
+# Variants containing any of these characters are not supported. They are
+# used by the grammar rules for far locations, nested variants, uncertain
+# locations and some types of allele sets.
+_UNSUPPORTED_VARIANT = frozenset('(){}:,/^')
+
+
+class _Unsupported(Exception):
+    """
+    Raised if a description might match a grammar rule that is not
+    implemented here.
+    """
+    pass
+
+
+def _leaf(value, name=None):
+    """
+    Parse results of a token.
+    """
+    return ParseResults(value, name, asList=False)
+
+
+def _empty(name=None):
+    """
+    Parse results of a suppressed or missing optional token.
+    """
+    return ParseResults([], name)
+
+
+def _named(tokens, name, as_list=False):
+    """
+    Parse results of a named rule.
+    """
+    return ParseResults(tokens, name, asList=as_list)
+
+
+def _group(tokens, name=None):
+    """
+    Parse results of a grouped rule.
+    """
+    return ParseResults([tokens], name, asList=True)
+
+
+def _and(*parts):
+    """
+    Parse results of a sequence of rules, where `None` stands for a missing
+    optional rule. Like in pyparsing, the first parse results are extended in
+    place.
+    """
+    tokens = parts[0]
+    for part in parts[1:]:
+        if part is not None and (part or part.haskeys()):
+            tokens += part
+    return tokens
+
+
+def _original_text(s, start, end, tokens):
+    """
+    Parse results of `originalTextFor(..., asString=False)`.
+    """
+    original = ParseResults(start, '_original_start', asList=False)
+    original += tokens
+    original += ParseResults(end, '_original_end', asList=False)
+    del original[:]
+    original.insert(0, s[start:end])
+    del original['_original_start']
+    del original['_original_end']
+    return original
+
+
+def _lrg(s, i):
+    """
+    BNF: LRG -> `LRG' [0-9]+ (`_' (LRGTranscriptID | LRGProteinID))?
+    """
+    number = _NUMBER.match(s, i + 4)
+    if number is None:
+        return None
+    j = number.end()
+    tokens = _leaf(s[i:j], 'LrgAcc')
+
+    # BNF: LRGTranscriptID -> `t' [0-9]+
+    # BNF: LRGProteinID -> `p' [0-9]+
+    for prefix, name in (('t', 'LRGTranscriptID'), ('p', 'LRGProteinID')):
+        if s.startswith(prefix, j):
+            number = _NUMBER.match(s, j + 1)
+            if number is not None:
+                tokens = _and(tokens, _and(_empty(),
+                                           _leaf(number.group(), name)))
+                j = number.end()
+            break
+
+    return j, tokens
+
+
+def _acc_no_full(s, i):
+    """
+    BNF: AccNoFull -> AccNoStem `.' Number
+    """
+    if s.startswith('LRG_', i):
+        return None
+    stem = _ACC_NO_STEM.match(s, i)
+    if stem is None or not s.startswith('.', stem.end()):
+        return None
+    number = _NUMBER.match(s, stem.end() + 1)
+    if number is None:
+        return None
+    return number.end(), _named(_and(_empty(), _leaf(stem.group()),
+                                     _leaf(number.group())),
+                                'AccNoTransVar', as_list=True)
+
+
+def _gene_product_id(s, i):
+    """
+    BNF: GeneProductID -> GeneName (TransVar | ProtIso)
+    """
+    name = _GENE_NAME.match(s, i)
+    if name is None:
+        return None
+    j = name.end()
+    tokens = _leaf(name.group(), 'GeneSymbol')
+
+    # BNF: TransVar -> `_v' Number
+    # BNF: ProtIso -> `_i' Number
+    for prefix, name in (('_v', 'TransVar'), ('_i', 'ProtIso')):
+        if s.startswith(prefix, j):
+            number = _NUMBER.match(s, j + 2)
+            if number is not None:
+                tokens = _and(tokens, _and(_empty(),
+                                           _leaf(number.group(), name)))
+                j = number.end()
+            break
+
+    return j, _group(tokens, 'Gene')
+
+
+def _gene_symbol(s, i):
+    """
+    BNF: GeneSymbol -> `(' (GeneProductID | AccNoFull) `)'
+    """
+    if not s.startswith('(', i):
+        return None
+    # An accession number always matches more than a gene product id, which
+    # cannot contain a `.'.
+    match = _acc_no_full(s, i + 1) or _gene_product_id(s, i + 1)
+    if match is None or not s.startswith(')', match[0]):
+        return None
+    return match[0] + 1, _and(_empty(), match[1])
+
+
+def _ref_seq_acc(s, i):
+    """
+    BNF: RefSeqAcc -> (GI | AccNo | UD | LRG) (`(' GeneSymbol `)')?
+    """
+    if s.startswith('LRG_', i):
+        return _lrg(s, i)
+    if (s.startswith(('GI', 'gi'), i) or s[i:i + 1] in _NUMS or
+            s.startswith('UD_', i) and not s[i + 3:i + 4] in _NUMS):
+        raise _Unsupported()
+
+    # BNF: AccNo -> ([a-Z] Number `_')+ Version?
+    stem = _ACC_NO_STEM.match(s, i)
+    if stem is None:
+        return None
+    j = stem.end()
+    tokens = _and(_empty(), _leaf(stem.group(), 'RefSeqAcc'))
+
+    # BNF: Version -> `.' Number
+    if s.startswith('.', j):
+        number = _NUMBER.match(s, j + 1)
+        if number is not None:
+            tokens = _and(tokens, _and(_empty(),
+                                       _leaf(number.group(), 'Version')))
+            j = number.end()
+
+    match = _gene_symbol(s, j)
+    if match is not None:
+        j, gene_symbol = match
+        tokens = _and(tokens, gene_symbol)
+
+    return j, tokens
+
+
+def _offset(s, i):
+    """
+    BNF: Offset -> (`+' | `-') (`u' | `d')? (Number | `?')
+    """
+    if s[i:i + 1] not in ('+', '-'):
+        return None
+    sign = _leaf(s[i], 'OffSgn')
+    j = i + 1
+
+    if s[j:j + 1] in ('u', 'd'):
+        option = _leaf(s[j], 'OffOpt')
+        j += 1
+    else:
+        option = _empty('OffOpt')
+
+    if s.startswith('?', j):
+        offset = '?'
+    else:
+        number = _NUMBER.match(s, j)
+        if number is None:
+            return None
+        offset = number.group()
+
+    return j + len(offset), _and(sign, option, _leaf(offset, 'Offset'))
+
+
+def _pt_loc(s, i):
+    """
+    BNF: PtLoc -> IVSLoc | RealPtLoc
+    """
+    if s.startswith('IVS', i):
+        raise _Unsupported()
+
+    # BNF: RealPtLoc -> ((`-' | `*')? Number Offset?) | `?'
+    if s.startswith('?', i):
+        return i + 1, _group(_leaf('?'))
+
+    if s[i:i + 1] in ('-', '*'):
+        sign = _leaf(s[i], 'MainSgn')
+        j = i + 1
+    else:
+        sign = _empty('MainSgn')
+        j = i
+
+    number = _NUMBER.match(s, j)
+    if number is None:
+        return None
+    j = number.end()
+    tokens = _and(sign, _leaf(number.group(), 'Main'))
+
+    match = _offset(s, j)
+    if match is not None:
+        j, offset = match
+        tokens = _and(tokens, offset)
+
+    return j, _group(tokens)
+
+
+def _start_loc(start):
+    """
+    Parse results of `Group(PtLoc('PtLoc'))('StartLoc')`.
+    """
+    return _group(_named(start, 'PtLoc'), 'StartLoc')
+
+
+def _extent(start, end):
+    """
+    Parse results of `RealExtent`.
+
+    BNF: RealExtent -> PtLoc `_' (`o'? (RefSeqAcc | GeneSymbol) `:')? RefType? PtLoc
+    """
+    return _and(_start_loc(start),
+                _group(_and(_empty('OptRef'), _named(end, 'PtLoc')),
+                       'EndLoc'))
+
+
+def _range_loc(s, i):
+    """
+    BNF: RangeLoc -> Extent | `(` Extent `)'
+    """
+    if s.startswith('EX', i):
+        raise _Unsupported()
+    match = _pt_loc(s, i)
+    if match is None or not s.startswith('_', match[0]):
+        return None
+    start = match[1]
+    match = _pt_loc(s, match[0] + 1)
+    if match is None:
+        return None
+    return match[0], _extent(start, match[1])
+
+
+def _seq(s, i):
+    """
+    BNF: Seq -> (Nt+ | Number | RangeLoc `inv'? | FarLoc) Nest?
+    """
+    if s[i:i + 1] in _NTS:
+        sequence = _NT_STRING.match(s, i)
+        j = sequence.end()
+        # This might also be the accession number of a far location.
+        if s[j:j + 1] in _ACC_NO:
+            raise _Unsupported()
+        return j, _group(_leaf(sequence.group(), 'Sequence'), 'Seq')
+
+    if s[i:i + 1] not in _NUMS and s[i:i + 1] not in ('-', '*', '?'):
+        raise _Unsupported()
+
+    match = _range_loc(s, i)
+    if match is not None:
+        j, tokens = match
+        tokens = _named(tokens, 'Range')
+        if s.startswith('inv', j):
+            tokens = _and(tokens, _leaf('inv', 'Inv'))
+            j += 3
+        return j, _group(tokens, 'Seq')
+
+    number = _NUMBER.match(s, i)
+    if number is None:
+        return None
+    return number.end(), _group(_leaf(number.group()), 'Seq')
+
+
+def _seq_list(s, i):
+    """
+    BNF: SeqList -> Seq (`;' Seq)*
+    """
+    match = _seq(s, i)
+    if match is None:
+        return None
+    j, tokens = match
+
+    more = None
+    while s.startswith(';', j):
+        match = _seq(s, j + 1)
+        if match is None:
+            break
+        j, seq = match
+        seq = _and(_empty(), seq)
+        more = seq if more is None else _and(more, seq)
+
+    return j, _named(_and(tokens, more), 'SeqList', as_list=True)
+
+
+def _simple_seq_list(s, i):
+    """
+    BNF: SimpleSeqList -> (`[' SeqList `]') | Seq
+    """
+    if not s.startswith('[', i):
+        return _seq(s, i)
+    match = _seq_list(s, i + 1)
+    if match is None or not s.startswith(']', match[0]):
+        return None
+    return match[0] + 1, _and(_empty(), match[1])
+
+
+def _argument(s, i):
+    """
+    Parse results of `Optional(NtString ^ Number)('Arg1')`, which are `None`
+    if there is no match.
+    """
+    argument = _NT_STRING.match(s, i) or _NUMBER.match(s, i)
+    if argument is None:
+        return i, None
+    return argument.end(), _leaf(argument.group(), 'Arg1')
+
+
+def _c_raw_var(s, i):
+    """
+    BNF: CRawVar -> Subst | Del | Dup | VarSSR | Ins | Indel | Inv | Conv
+    """
+    if s.startswith('EX', i):
+        raise _Unsupported()
+    match = _pt_loc(s, i)
+    if match is None:
+        return None
+    j, start = match
+
+    # This might be a repeated sequence.
+    sequence = _NT_STRING.match(s, j)
+    if s.startswith('[', sequence.end() if sequence else j):
+        raise _Unsupported()
+
+    # BNF: Subst -> PtLoc Nt `>' Nt
+    if (s[j:j + 1] in _NTS and s.startswith('>', j + 1) and
+            s[j + 2:j + 3] in _NTS):
+        return j + 3, _group(_and(_start_loc(start),
+                                  _leaf(s[j], 'Arg1'),
+                                  _leaf('subst', 'MutationType'),
+                                  _leaf(s[j + 2], 'Arg2')), 'RawVar')
+
+    # The location is a range if possible, otherwise a point.
+    end = None
+    if s.startswith('_', j):
+        match = _pt_loc(s, j + 1)
+        if match is not None:
+            j, end = match
+            # This might be a repeated sequence.
+            if s.startswith('[', j):
+                raise _Unsupported()
+    if end is None:
+        location = _start_loc(start)
+    else:
+        location = _extent(start, end)
+
+    keyword = s[j:j + 3]
+
+    # BNF: Del -> Loc `del' (Nt+ | Number)?
+    # BNF: Indel -> (RangeLoc | PtLoc) `del' (Nt+ | Number)?
+    #          `ins' SimpleSeqList
+    if keyword == 'del':
+        j, argument = _argument(s, j + 3)
+        if s.startswith('ins', j):
+            match = _simple_seq_list(s, j + 3)
+            if match is not None:
+                return match[0], _group(_and(location, _leaf('del'),
+                                             argument,
+                                             _leaf('delins', 'MutationType'),
+                                             match[1]), 'RawVar')
+        return j, _group(_and(location, _leaf('del', 'MutationType'),
+                              argument), 'RawVar')
+
+    # BNF: Dup -> Loc `dup' (Nt+ | Number)? Nest?
+    if keyword == 'dup':
+        j, argument = _argument(s, j + 3)
+        return j, _group(_and(location, _leaf('dup', 'MutationType'),
+                              argument), 'RawVar')
+
+    if end is None:
+        return None
+
+    # BNF: Inv -> RangeLoc `inv' (Nt+ | Number)? Nest?
+    if keyword == 'inv':
+        j, argument = _argument(s, j + 3)
+        return j, _group(_and(location, _leaf('inv', 'MutationType'),
+                              argument), 'RawVar')
+
+    # BNF: Ins -> RangeLoc `ins' SimpleSeqList
+    if keyword == 'ins':
+        match = _simple_seq_list(s, j + 3)
+        if match is None:
+            return None
+        return match[0], _group(_and(location, _leaf('ins', 'MutationType'),
+                                     match[1]), 'RawVar')
+
+    return None
+
+
+def _raw_var(s, i):
+    """
+    BNF: RawVar -> (CRawVar | (`(' CRawVar `)')) `?'?
+    """
+    match = _c_raw_var(s, i)
+    if match is None:
+        return None
+    j, tokens = match
+    if s.startswith('?', j):
+        j += 1
+    return j, _original_text(s, i, j, tokens)
+
+
+def _simple_allele_var_set(s, i):
+    """
+    BNF: SimpleAlleleVarSet -> (`[' UAlleleVarSet `]') | ExtendedRawVar
+    """
+    if s.startswith('[', i):
+        raise _Unsupported()
+
+    # BNF: ExtendedRawVar -> RawVar | `=' | `?'
+    match = _raw_var(s, i)
+    if match is None:
+        if s[i:i + 1] not in ('=', '?'):
+            return None
+        match = i + 1, _leaf(s[i])
+
+    return match[0], _group(match[1], 'SimpleAlleleVarSet')
+
+
+def _single_allele_var_set(s, i):
+    """
+    BNF: SingleAlleleVarSet -> (`[` ChimeronSet ((`;' | `^') ChimeronSet)*
+                               (`(;)' ChimeronSet)* `]') | ChimeronSet
+
+    Only the first alternative is implemented, with simple allele variant
+    sets as chimeron sets. If it matches, it is chosen over the second
+    alternative (which matches at most the same).
+    """
+    if not s.startswith('[', i):
+        return None
+    match = _simple_allele_var_set(s, i + 1)
+    if match is None:
+        return None
+    j, tokens = match
+    tokens = _and(_empty(), tokens)
+
+    more = None
+    while s.startswith(';', j):
+        match = _simple_allele_var_set(s, j + 1)
+        if match is None:
+            break
+        j, simple_allele_var_set = match
+        simple_allele_var_set = _and(_empty(), simple_allele_var_set)
+        more = (simple_allele_var_set if more is None
+                else _and(more, simple_allele_var_set))
+
+    if not s.startswith(']', j):
+        return None
+    return j + 1, _group(_and(tokens, more), 'SingleAlleleVarSet')
+
+
+def _var(s):
+    """
+    BNF: Var -> SingleVar | MultiVar | MultiTranscriptVar |
+                UnkEffectVar | NoRNAVar | SplicingVar
+
+    Only single variants and single allele variants on a reference sequence
+    accession number are implemented. Since these match the entire
+    description, and precede the other alternatives, they are chosen.
+    """
+    colon = s.find(':')
+    if (colon < 0 or not _UNSUPPORTED.isdisjoint(s) or
+            not _UNSUPPORTED_VARIANT.isdisjoint(s[colon + 1:])):
+        return None
+
+    match = _ref_seq_acc(s, 0)
+    if match is None or match[0] != colon:
+        return None
+    tokens = match[1]
+    i = colon + 1
+
+    # BNF: RefType -> (`c' | `g' | `m' | `n' | `r') `.'
+    if s[i:i + 1] in _REF_TYPES and s.startswith('.', i + 1):
+        tokens = _and(tokens, _leaf(s[i], 'RefType'))
+        i += 2
+
+    # BNF: SingleVar -> Ref RawVar | TransLoc
+    # BNF: SingleAlleleVars -> Ref SingleAlleleVarSet
+    match = _single_allele_var_set(s, i) or _raw_var(s, i)
+    if match is None or match[0] != len(s):
+        return None
+    return _and(tokens, match[1])
+
+
+def parse(description):
+    """
+    Parse a variant description.
+
+    :arg unicode description: Variant description.
+
+    :returns: The parse tree, identical to the parse tree constructed by the
+      pyparsing grammar, or `None` if the description could not be parsed
+      here. In that case the pyparsing grammar should be used, either to
+      construct the parse tree or to report a parse error.
+    :rtype: pyparsing.ParseResults
+    """
+    try:
+        return _var(description)
+    except _Unsupported:
+        return None
@@ -7,9 +7,13 @@ from __future__ import unicode_literals
 
 import argparse
 import codecs
+import gzip
 import json
 import locale
 import os
+import shutil
+import sys
+import tempfile
 
 import alembic.command
 import alembic.config
@@ -19,12 +23,15 @@ from sqlalchemy.orm.exc import NoResultFound
 
 from . import _cli_string
 from .. import announce
+from ..config import settings
 from .. import db
 from ..db import session
 from ..db.models import Assembly, BatchJob, BatchQueueItem, Chromosome
 from .. import mapping
 from .. import output
+from ..redisclient import client as redis
 from .. import sync
+from .. import twobit
 from .. import util
 
 
@@ -91,8 +98,31 @@ def list_assemblies():
                                assembly.taxonomy_id)
 
 
+def _report_import_progress(count):
+    """
+    Report the number of imported transcript mappings on standard error.
+    """
+    sys.stderr.write('\rImported %d transcript mappings...' % count)
+    sys.stderr.flush()
+
+
+def _seekable_file(handle):
+    """
+    Get a file we can seek in. If `handle` is not seekable (e.g., standard
+    input), it is first copied to a temporary file.
+    """
+    try:
+        handle.seek(0, os.SEEK_CUR)
+    except IOError:
+        spooled = tempfile.TemporaryFile()
+        shutil.copyfileobj(handle, spooled)
+        spooled.seek(0)
+        return spooled
+    return handle
+
+
 def import_mapview(assembly_name_or_alias, mapview_file, encoding,
-                   group_label):
+                   group_label, replace=False):
     """
     Import transcript mappings from an NCBI mapview file.
     """
@@ -100,6 +130,11 @@ def import_mapview(assembly_name_or_alias, mapview_file, encoding,
     # human-readable process name.
     util.set_process_name('mutalyzer: mapview-import')
 
+    # Without --replace, the file is read twice (the first time to check if
+    # it is sorted).
+    if not replace:
+        mapview_file = _seekable_file(mapview_file)
+
     mapview_file = codecs.getreader(encoding)(mapview_file)
 
     try:
@@ -108,12 +143,18 @@ def import_mapview(assembly_name_or_alias, mapview_file, encoding,
         raise UserError('Not a valid assembly: %s' % assembly_name_or_alias)
 
     try:
-        mapping.import_from_mapview_file(assembly, mapview_file, group_label)
+        count = mapping.import_from_mapview_file(
+            assembly, mapview_file, group_label, replace=replace,
+            progress=_report_import_progress)
     except mapping.MapviewSortError as e:
         raise UserError(unicode(e))
 
+    sys.stderr.write('\n')
+    print 'Imported %d transcript mappings.' % count
+
 
-def import_lrgmap(assembly_name_or_alias, lrgmap_file, encoding):
+def import_lrgmap(assembly_name_or_alias, lrgmap_file, encoding,
+                  replace=False):
     """
     Import transcript mappings from an EBI LRG transcripts map file.
     """
@@ -124,7 +165,48 @@ def import_lrgmap(assembly_name_or_alias, lrgmap_file, encoding):
     except NoResultFound:
         raise UserError('Not a valid assembly: %s' % assembly_name_or_alias)
 
-    mapping.import_from_lrgmap_file(assembly, lrgmap_file)
+    count = mapping.import_from_lrgmap_file(
+        assembly, lrgmap_file, replace=replace,
+        progress=_report_import_progress)
+
+    sys.stderr.write('\n')
+    print 'Imported %d transcript mappings.' % count
+
+
+def import_ucsc_dump(assembly_name_or_alias, dump_file, encoding,
+                     replace=False):
+    """
+    Import transcript mappings from a UCSC table dump or GTF file.
+    """
+    # For long-running processes it can be convenient to have a short and
+    # human-readable process name.
+    util.set_process_name('mutalyzer: ucsc-dump-import')
+
+    # Gzip compressed files are recognized by their magic number, after
+    # which we seek back to the start (as does GzipFile while reading).
+    dump_file = _seekable_file(dump_file)
+    if dump_file.read(2) == b'\x1f\x8b':
+        dump_file.seek(0)
+        dump_file = gzip.GzipFile(fileobj=dump_file, mode='rb')
+    else:
+        dump_file.seek(0)
+
+    dump_file = codecs.getreader(encoding)(dump_file)
+
+    try:
+        assembly = Assembly.by_name_or_alias(assembly_name_or_alias)
+    except NoResultFound:
+        raise UserError('Not a valid assembly: %s' % assembly_name_or_alias)
+
+    try:
+        count = mapping.import_from_ucsc_dump(
+            assembly, dump_file, replace=replace,
+            progress=_report_import_progress)
+    except mapping.UcscDumpError as e:
+        raise UserError(unicode(e))
+
+    sys.stderr.write('\n')
+    print 'Imported %d transcript mappings.' % count
 
 
 def import_gene(assembly_name_or_alias, gene):
@@ -175,6 +257,69 @@ def sync_cache(wsdl_url, url_template, history=7):
            % (inserted, downloaded))
 
 
+def pack_sequences(remove=False):
+    """
+    Convert chromosome sequence files to packed sequence files.
+
+    All plain sequence files (`.sequence`) in the chromosome sequence
+    directory (`SEQ_PATH`) for which no packed sequence file exists yet are
+    converted.
+    """
+    # For long-running processes it can be convenient to have a short and
+    # human-readable process name.
+    util.set_process_name('mutalyzer: pack-sequences')
+
+    try:
+        seq_path = settings.SEQ_PATH
+    except AttributeError:
+        raise UserError('Chromosome sequence directory (SEQ_PATH) not set')
+
+    if not os.path.isdir(seq_path):
+        raise UserError('Chromosome sequence directory does not exist: %s'
+                        % seq_path)
+
+    packed = 0
+    for filename in sorted(os.listdir(seq_path)):
+        name, extension = os.path.splitext(filename)
+        if extension != '.sequence':
+            continue
+
+        source_path = os.path.join(seq_path, filename)
+        target_path = os.path.join(seq_path, name + twobit.EXTENSION)
+
+        if not os.path.isfile(target_path):
+            try:
+                twobit.convert(source_path, target_path)
+            except twobit.PackedSequenceError as e:
+                raise UserError(unicode(e))
+            packed += 1
+
+        if remove:
+            os.remove(source_path)
+
+    print 'Packed %d sequence files.' % packed
+
+
+def flush_negative_cache(accessions=None):
+    """
+    Remove cached failed reference retrievals.
+
+    Reference retrievals from the NCBI that failed are cached for a short
+    time (see `NEGATIVE_REFERENCE_CACHE_EXPIRATION`). This removes them for
+    the given accession numbers, or for all accession numbers if none are
+    given.
+    """
+    if accessions:
+        keys = ['retriever:negative:%s' % accession
+                for accession in accessions]
+    else:
+        keys = redis.keys('retriever:negative:*')
+
+    flushed = redis.delete(*keys) if keys else 0
+
+    print 'Removed %d cached failed reference retrievals.' % flushed
+
+
 def list_batch_jobs():
     """
     List batch jobs.
@@ -326,6 +471,10 @@ def main():
         'group_label', metavar='GROUP_LABEL', type=_cli_string,
         help='use only entries with this group label (example: '
         'GRCh37.p2-Primary Assembly)')
+    p.add_argument(
+        '--replace', action='store_true',
+        help='replace all existing mappings from NCBI mapview in one '
+        'transaction after staging the import')
 
     # Subparser 'assemblies import-lrgmap'.
     p = s.add_parser(
@@ -342,6 +491,32 @@ def main():
         '--encoding', metavar='ENCODING', type=_cli_string,
         default=default_encoding,
         help='input file encoding (default: %s)' % default_encoding)
+    p.add_argument(
+        '--replace', action='store_true',
+        help='replace all existing mappings from EBI LRG transcript map '
+        'files in one transaction after staging the import')
+
+    # Subparser 'assemblies import-ucsc-dump'.
+    p = s.add_parser(
+        'import-ucsc-dump',
+        help='import mappings from UCSC table dump or GTF file',
+        parents=[assembly_parser],
+        description=import_ucsc_dump.__doc__.split('\n\n')[0],
+        epilog='Note: Only RefSeq transcripts are imported. FILE may be gzip '
+        'compressed.')
+    p.set_defaults(func=import_ucsc_dump)
+    p.add_argument(
+        'dump_file', metavar='FILE', type=argparse.FileType('rb'),
+        help='UCSC refGene or ncbiRefSeq table dump (example: '
+        'ncbiRefSeq.txt.gz) or GTF file (example: hg19.ncbiRefSeq.gtf.gz)')
+    p.add_argument(
+        '--encoding', metavar='ENCODING', type=_cli_string,
+        default=default_encoding,
+        help='input file encoding (default: %s)' % default_encoding)
+    p.add_argument(
+        '--replace', action='store_true',
+        help='replace all existing mappings from the UCSC in one '
+        'transaction after staging the import')
 
     # Subparser 'assemblies import-gene'.
     p = s.add_parser(
@@ -420,6 +595,29 @@ def main():
         '(default: 7)')
     p.set_defaults(func=sync_cache)
 
+    # Subparser 'pack-sequences'.
+    p = subparsers.add_parser(
+        'pack-sequences', help='convert chromosome sequences to packed format',
+        description=pack_sequences.__doc__.split('\n\n')[0],
+        epilog='Packed sequence files store two bits per base and are used '
+        'instead of the plain sequence files if they exist.')
+    p.add_argument(
+        '--remove', dest='remove', action='store_true',
+        help='remove the plain sequence files after conversion')
+    p.set_defaults(func=pack_sequences)
+
+    # Subparser 'flush-negative-cache'.
+    p = subparsers.add_parser(
+        'flush-negative-cache', help='remove cached failed retrievals',
+        description=flush_negative_cache.__doc__.split('\n\n')[0],
+        epilog='Failed reference retrievals from the NCBI are cached for a '
+        'short time, depending on the error.')
+    p.add_argument(
+        'accessions', metavar='ACCESSION', type=_cli_string, nargs='*',
+        help='accession number to remove the cached failure for (default: '
+        'all)')
+    p.set_defaults(func=flush_negative_cache)
+
     # Subparser 'setup-database'.
     p = subparsers.add_parser(
         'setup-database', help='setup database',
@@ -8,13 +8,22 @@ Mutalyzer command-line name checker.
 from __future__ import unicode_literals
 
 import argparse
+import codecs
+import gzip
+import io
 import json
+import locale
+import sys
 
 import extractor
+from sqlalchemy.orm.exc import NoResultFound
 
 from . import _cli_string
+from ..db.models import Assembly
+from .. import mapping
 from .. import output
 from .. import variantchecker
+from .. import vcf
 
 
 # TODO: This seems like a bit of a weird trick. In any case, we should
@@ -137,18 +146,134 @@ def check_name(description):
             "allele_description": described_allele}, cls=AlleleEncoder)
 
 
+def check_names(variants_file):
+    """
+    Run the name checker on a file with variant descriptions.
+
+    Output is tab-separated with the variant, the errors, the genomic
+    variant, and the transcript and protein variants, in the order of the
+    input file. Results are written as soon as they are available.
+    """
+    variants = (line.strip() for line in variants_file if line.strip())
+
+    print '\t'.join(['Input Variant', 'Errors', 'Genomic Description',
+                     'Transcript and Protein Description(s)'])
+    for variant, O in variantchecker.check_variants(variants):
+        errors = '|'.join(O.getBatchMessages(3))
+        print '\t'.join([variant, errors,
+                         O.getIndexedOutput('genomicDescription', 0, '')] +
+                        O.getOutput('descriptions') +
+                        O.getOutput('protDescriptions'))
+        sys.stdout.flush()
+
+
+def convert_positions(assembly, variants_file, gene=None):
+    """
+    Run the position converter on a file with variant descriptions.
+
+    Output is tab-separated with the variant, the errors, and the converted
+    variants, in the order of the input file.
+    """
+    variants = [line.strip() for line in variants_file if line.strip()]
+
+    O = output.Output(__file__)
+    converter = mapping.Converter(assembly, O)
+
+    print '\t'.join(['Input Variant', 'Errors', 'Converted Variant(s)'])
+    for variant, (conversions, messages) in zip(
+            variants, converter.convert_many(variants, gene=gene)):
+        errors = '|'.join('(%s): %s' % (message.origin, message.description)
+                          for message in messages)
+        print '\t'.join([variant, errors] + conversions)
+
+
+def convert_vcf(assembly, vcf_file, processes=None):
+    """
+    Describe the variants in a VCF file.
+
+    Output is tab-separated with the VCF record fields, the errors, the
+    chromosomal variant, and the transcript variants, in the order of the
+    input file.
+    """
+    vcf.convert(assembly, vcf_file, codecs.getwriter('utf-8')(sys.stdout),
+                processes=processes)
+
+
 def main():
     """
     Command-line interface to the name checker.
     """
+    default_encoding = locale.getpreferredencoding()
+
     parser = argparse.ArgumentParser(
         description='Mutalyzer command-line name checker.')
     parser.add_argument(
         'description', metavar='DESCRIPTION', type=_cli_string,
-        help='variant description to run the name checker on')
+        help='variant description to run the name checker on, or with '
+        '--multiple or --position-converter a file with variant descriptions '
+        '(one per line), or with --vcf-converter a VCF file (use - for '
+        'standard input)')
+    parser.add_argument(
+        '-m', '--multiple', action='store_true',
+        help='run the name checker on a file with variant descriptions, '
+        'loading every reference only once')
+    parser.add_argument(
+        '-p', '--position-converter', metavar='ASSEMBLY', type=_cli_string,
+        dest='assembly_name_or_alias',
+        help='run the position converter for this assembly instead of the '
+        'name checker')
+    parser.add_argument(
+        '--vcf-converter', metavar='ASSEMBLY', type=_cli_string,
+        dest='vcf_assembly_name_or_alias',
+        help='describe the variants in a VCF file for this assembly instead '
+        'of running the name checker')
+    parser.add_argument(
+        '-g', '--gene', metavar='GENE', type=_cli_string,
+        help='with --position-converter, convert to all transcripts for '
+        'this gene')
+    parser.add_argument(
+        '--encoding', metavar='ENCODING', type=_cli_string,
+        default=default_encoding,
+        help='input file encoding (default: %s)' % default_encoding)
+    parser.add_argument(
+        '-j', '--processes', metavar='N', type=int,
+        help='with --vcf-converter, number of worker processes (default: '
+        'number of cores)')
 
     args = parser.parse_args()
-    check_name(args.description)
+
+    assembly_name_or_alias = (args.assembly_name_or_alias or
+                              args.vcf_assembly_name_or_alias)
+
+    if not (assembly_name_or_alias or args.multiple):
+        check_name(args.description)
+        return
+
+    if assembly_name_or_alias:
+        try:
+            assembly = Assembly.by_name_or_alias(assembly_name_or_alias)
+        except NoResultFound:
+            parser.error('Not a valid assembly: %s' % assembly_name_or_alias)
+
+    if args.description == '-':
+        variants_file = sys.stdin
+    else:
+        try:
+            if args.description.endswith('.gz'):
+                variants_file = gzip.open(args.description, 'rb')
+            else:
+                variants_file = io.open(args.description, 'rb')
+        except IOError as e:
+            parser.error(unicode(e))
+
+    variants_file = codecs.getreader(args.encoding)(variants_file)
+
+    if not assembly_name_or_alias:
+        check_names(variants_file)
+    elif args.vcf_assembly_name_or_alias:
+        convert_vcf(assembly, variants_file, processes=args.processes)
+    else:
+        convert_positions(assembly, variants_file, gene=args.gene)
 
 
 if __name__ == '__main__':
@@ -11,6 +11,10 @@ informal overview, see [2].
 
 The grammar is described in [3].
 
+For the most common descriptions, a faster recursive descent parser
+constructing the same parse trees is used instead of pyparsing (see
+`mutalyzer.descent` and the `GRAMMAR_BACKEND` setting).
+
 @todo: Automatically generate a LaTeX BNF description from this.
 
 [1] http://pyparsing.wikispaces.com/
@@ -21,7 +25,99 @@ The grammar is described in [3].
 
 from __future__ import unicode_literals
 
+from collections import namedtuple
+import threading
+import weakref
+
 from pyparsing import *
+from pyparsing import _ParseResultsWithOffset
+
+from mutalyzer.config import settings
+from mutalyzer import descent
+from mutalyzer import util
+
+
+# Cache of parse results by variant description, shared by all Grammar
+# instances (see `_get_parse_results`).
+_parse_results = None
+
+# The grammar and the pyparsing packrat cache are shared by all Grammar
+# instances, so only one description is parsed at a time.
+_parse_lock = threading.Lock()
+
+
+#: Parse error for a description, with the error message and the position in
+#: the description where the error occurred.
+ParseError = namedtuple('ParseError', ['message', 'position'])
+
+
+def _get_parse_results():
+    """
+    Get the cache of parse results.
+
+    @return: The cache
+    @rtype: util.LRUCache
+    """
+    global _parse_results
+    parse_results = _parse_results
+    if parse_results is None:
+        parse_results = _parse_results = util.LRUCache(
+            settings.GRAMMAR_CACHE_SIZE)
+    return parse_results
+
+
+def _clear_parse_results(*args):
+    """
+    Clear the cache of parse results.
+    """
+    global _parse_results
+    _parse_results = None
+
+
+settings.on_update(_clear_parse_results, 'GRAMMAR_CACHE_SIZE')
+settings.on_update(_clear_parse_results, 'GRAMMAR_BACKEND')
+
+
+def _copy_parse_results(results, copies=None):
+    """
+    Copy a parse tree, including all nested parse results.
+
+    `ParseResults.copy` only copies the top level and `copy.deepcopy` does
+    not work on parse results, so we copy the (pyparsing 2.0.5) internals
+    ourselves.
+
+    @arg results: The parse tree.
+    @type results: pyparsing.ParseResults
+    @arg copies: Copies made so far, by id of the original.
+    @type copies: dict
+
+    @return: The copy.
+    @rtype: pyparsing.ParseResults
+    """
+    if not isinstance(results, ParseResults):
+        return results
+
+    if copies is None:
+        copies = {}
+    if id(results) in copies:
+        return copies[id(results)]
+
+    copy = copies[id(results)] = results.copy()
+
+    parent = results._ParseResults__parent
+    if parent is not None and id(parent()) in copies:
+        copy._ParseResults__parent = weakref.ref(copies[id(parent())])
+
+    copy._ParseResults__toklist = [
+        _copy_parse_results(token, copies)
+        for token in results._ParseResults__toklist]
+    copy._ParseResults__tokdict = {
+        name: [_ParseResultsWithOffset(
+                   _copy_parse_results(occurrence[0], copies), occurrence[1])
+               for occurrence in occurrences]
+        for name, occurrences in results._ParseResults__tokdict.items()}
+
+    return copy
 
 
 class Grammar():
@@ -474,12 +570,47 @@ class Grammar():
         ParserElement.enablePackrat()
     #__init__
 
+    def _parse(self, variant):
+        """
+        Parse the input string.
+
+        @arg variant: The input string that needs to be parsed.
+        @type variant: unicode
+
+        @return: The parse tree containing the parse results, or the parse
+                 error.
+        @rtype: pyparsing.ParseResults or ParseError
+        """
+        if settings.GRAMMAR_BACKEND == 'descent':
+            # Descriptions not supported by the recursive descent parser are
+            # parsed with pyparsing, which also reports any parse errors.
+            result = descent.parse(variant)
+            if result is not None:
+                return result
+
+        with _parse_lock:
+            try:
+                return self.Var.parseString(variant, parseAll=True)
+                # Todo: check .dump()
+            except ParseException as err:
+                return ParseError(
+                    unicode(err), int(unicode(err).split(':')[-1][:-1]) - 1)
+            finally:
+                # The packrat cache is of no use for the next description,
+                # so we don't keep it around.
+                ParserElement.resetCache()
+    #_parse
+
     def parse(self, variant):
         """
         Parse the input string and return a parse tree if the parsing was
         successful. Otherwise print the parse error and the position in
         the input where the error occurred (and return None).
 
+        Parse results are cached per process (see `GRAMMAR_CACHE_SIZE`).
+        Every call returns its own copy of the parse tree, so it can safely
+        be modified.
+
         @arg variant: The input string that needs to be parsed.
         @type variant: unicode
 
@@ -490,18 +621,19 @@ class Grammar():
         @todo: Use information in ParseException as described here:
             http://pyparsing.wikispaces.com/HowToUsePyparsing
         """
-        try:
-            return self.Var.parseString(variant, parseAll=True)
-            # Todo: check .dump()
-        except ParseException as err:
-            #print err.line
-            #print " "*(err.column-1) + "^"
-            #print err
+        parse_results = _get_parse_results()
+        result = parse_results.get(variant)
+        if result is None:
+            result = self._parse(variant)
+            parse_results.set(variant, result)
+
+        if isinstance(result, ParseError):
             # Log parse error and the position where it occurred.
-            self._output.addMessage(__file__, 4, 'EPARSE', unicode(err))
-            pos = int(unicode(err).split(':')[-1][:-1]) - 1
+            self._output.addMessage(__file__, 4, 'EPARSE', result.message)
             self._output.addOutput('parseError', variant)
-            self._output.addOutput('parseError', pos * ' ' + '^')
+            self._output.addOutput('parseError', result.position * ' ' + '^')
             return None
+
+        return _copy_parse_results(result)
     #parse
 #Grammar
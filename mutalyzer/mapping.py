@@ -12,13 +12,22 @@ update the database with this information.
 
 from __future__ import unicode_literals
 
-from collections import defaultdict
-from itertools import groupby
+from array import array
+import bisect
+from collections import defaultdict, namedtuple, OrderedDict
+from itertools import chain, groupby, islice
 from operator import attrgetter, itemgetter
+import re
+import threading
+import uuid
 
 import binning
 import MySQLdb
+import numpy
+from sqlalchemy import (and_, cast, Column, Enum, event, exists, MetaData,
+                        or_, select, String, Table)
 
+from mutalyzer.config import settings
 from mutalyzer.db import session
 from mutalyzer.db.models import Chromosome, TranscriptMapping
 from mutalyzer.grammar import Grammar
@@ -27,12 +36,625 @@ from mutalyzer.output import Output
 from mutalyzer import Crossmap
 from mutalyzer import Retriever
 from mutalyzer import util
+from mutalyzer.redisclient import client as redis
+
+
+# Crossmap objects for transcript mappings shared by all Converter instances,
+# see `Converter.makeCrossmap`. Created on first use.
+_crossmaps = None
+
+# Chromosome ids by assembly and chromosome accession or name, see
+# `Converter._get_chromosome`.
+_chromosome_ids = {}
+
+
+# Columns of transcript mappings kept in the resident transcript mapping
+# index, see `_TranscriptMappingIndex`.
+_INDEXED_COLUMNS = ('id', 'chromosome_id', 'reference_type', 'accession',
+                    'version', 'gene', 'transcript', 'orientation', 'start',
+                    'stop', 'cds_start', 'cds_stop', 'exon_starts',
+                    'exon_stops', 'select_transcript')
+
+# Resident transcript mapping indexes by assembly id.
+_transcript_mapping_indexes = {}
+_transcript_mapping_indexes_lock = threading.RLock()
+
+
+class _IndexedMapping(namedtuple('_IndexedMapping', _INDEXED_COLUMNS)):
+    """
+    Read-only copy of a transcript mapping in the resident transcript mapping
+    index. It has the same attributes as a TranscriptMapping, except for the
+    chromosome relationship.
+    """
+    __slots__ = ()
+
+    coding = TranscriptMapping.coding
+    cds = property(TranscriptMapping.cds.fget)
+    get_reference = TranscriptMapping.get_reference.im_func
+    reference = TranscriptMapping.reference
+
+
+def _get_crossmaps():
+    """
+    Get the cache of Crossmap objects for transcript mappings.
+
+    @return: The cache
+    @rtype: util.LRUCache
+    """
+    global _crossmaps
+    crossmaps = _crossmaps
+    if crossmaps is None:
+        crossmaps = _crossmaps = util.LRUCache(settings.CROSSMAP_CACHE_SIZE)
+    return crossmaps
+
+
+def _clear_caches(*args):
+    """
+    Clear the caches shared by all Converter instances, for example when the
+    database changes.
+    """
+    global _crossmaps
+    _crossmaps = None
+    _chromosome_ids.clear()
+
+
+settings.on_update(_clear_caches, 'DATABASE_URI')
+settings.on_update(_clear_caches, 'CROSSMAP_CACHE_SIZE')
+
+
+def _transcript_mappings_version(assembly_id):
+    """
+    Get the version of the transcript mappings of an assembly. It is
+    incremented by `transcript_mappings_changed`, which is shared between
+    processes through Redis.
+
+    @arg assembly_id: Assembly id
+    @type assembly_id: int
+
+    @return: The version (None if it was never incremented)
+    @rtype: unicode
+    """
+    return redis.get('transcript-mappings:version:%d' % assembly_id)
+
+
+def transcript_mappings_changed(assembly):
+    """
+    Notify all processes that the transcript mappings of an assembly were
+    changed, such that their resident transcript mapping index is rebuilt.
+
+    @arg assembly: The assembly
+    @type assembly: Assembly
+    """
+    redis.incr('transcript-mappings:version:%d' % assembly.id)
+    with _transcript_mapping_indexes_lock:
+        _transcript_mapping_indexes.pop(assembly.id, None)
+
+
+class _TranscriptMappingIndex(object):
+    """
+    Resident interval index over all transcript mappings of one assembly.
+
+    Per chromosome, the transcript mappings are sorted on their start
+    position (and further as in the database queries for transcript mappings
+    in a range) and their start and stop positions are kept in integer
+    arrays, together with the running maximum of the stop positions. Exon
+    positions are decoded once when the index is built.
+    """
+    def __init__(self, assembly_id):
+        """
+        Build the index from the database.
+
+        @arg assembly_id: Assembly id
+        @type assembly_id: int
+        """
+        self.version = _transcript_mappings_version(assembly_id)
+
+        columns = [getattr(TranscriptMapping, c) for c in _INDEXED_COLUMNS]
+        rows = TranscriptMapping.query.join(Chromosome) \
+            .with_entities(*columns) \
+            .filter(Chromosome.assembly_id == assembly_id) \
+            .order_by(TranscriptMapping.chromosome_id,
+                      TranscriptMapping.start,
+                      TranscriptMapping.stop,
+                      TranscriptMapping.gene,
+                      TranscriptMapping.accession,
+                      TranscriptMapping.version,
+                      TranscriptMapping.transcript) \
+            .all()
+
+        self._chromosomes = {}
+
+        for chromosome_id, chromosome_rows in groupby(
+                rows, attrgetter('chromosome_id')):
+            mappings = []
+            starts = array('l')
+            stops = array('l')
+            max_stops = array('l')
+            for row in chromosome_rows:
+                mapping = _IndexedMapping(*row)._replace(
+                    exon_starts=array('l', row.exon_starts),
+                    exon_stops=array('l', row.exon_stops))
+                mappings.append(mapping)
+                starts.append(mapping.start)
+                stops.append(mapping.stop)
+                max_stops.append(max(max_stops[-1], mapping.stop)
+                                 if max_stops else mapping.stop)
+            self._chromosomes[chromosome_id] = (mappings, starts, stops,
+                                                max_stops)
+
+    def overlapping(self, chromosome_id, start, stop):
+        """
+        Get the transcript mappings on a chromosome overlapping a range.
+
+        @arg chromosome_id: Chromosome id
+        @type chromosome_id: int
+        @arg start: Start of the range (one-based, inclusive)
+        @type start: int
+        @arg stop: Stop of the range (one-based, inclusive)
+        @type stop: int
+
+        @return: Transcript mappings ordered by start position
+        @rtype: list(_IndexedMapping)
+        """
+        try:
+            mappings, starts, stops, max_stops = \
+                self._chromosomes[chromosome_id]
+        except KeyError:
+            return []
+
+        result = []
+        i = bisect.bisect_right(starts, stop)
+        while i > 0 and max_stops[i - 1] >= start:
+            i -= 1
+            if stops[i] >= start:
+                result.append(mappings[i])
+        result.reverse()
+        return result
+
+    def contained(self, chromosome_id, start, stop):
+        """
+        Get the transcript mappings on a chromosome contained in a range.
+
+        @arg chromosome_id: Chromosome id
+        @type chromosome_id: int
+        @arg start: Start of the range (one-based, inclusive)
+        @type start: int
+        @arg stop: Stop of the range (one-based, inclusive)
+        @type stop: int
+
+        @return: Transcript mappings ordered by start position
+        @rtype: list(_IndexedMapping)
+        """
+        try:
+            mappings, starts, stops, max_stops = \
+                self._chromosomes[chromosome_id]
+        except KeyError:
+            return []
+
+        return [mappings[i] for i in
+                xrange(bisect.bisect_left(starts, start),
+                       bisect.bisect_right(starts, stop))
+                if stops[i] <= stop]
+
+
+def _get_transcript_mapping_index(assembly_id):
+    """
+    Get the resident transcript mapping index for an assembly. The index is
+    built on first use and rebuilt if the transcript mappings changed since.
+
+    @arg assembly_id: Assembly id
+    @type assembly_id: int
+
+    @return: The transcript mapping index
+    @rtype: _TranscriptMappingIndex
+    """
+    version = _transcript_mappings_version(assembly_id)
+
+    index = _transcript_mapping_indexes.get(assembly_id)
+    if index is not None and index.version == version:
+        return index
+
+    with _transcript_mapping_indexes_lock:
+        index = _transcript_mapping_indexes.get(assembly_id)
+        if index is None or index.version != version:
+            index = _TranscriptMappingIndex(assembly_id)
+            _transcript_mapping_indexes[assembly_id] = index
+    return index
+
+
+def _clear_transcript_mapping_indexes(*args):
+    """
+    Drop all resident transcript mapping indexes.
+    """
+    with _transcript_mapping_indexes_lock:
+        _transcript_mapping_indexes.clear()
+
+
+def _invalidate_transcript_mapping_indexes(mapper, connection, target):
+    """
+    Drop all resident transcript mapping indexes when a transcript mapping is
+    changed.
+    """
+    _clear_transcript_mapping_indexes()
+
+
+# Changes made in this process are picked up by these events, changes by
+# other processes are detected by the transcript mappings version.
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(TranscriptMapping, _event,
+                 _invalidate_transcript_mapping_indexes)
+
+# Indexes of another database are of no use.
+settings.on_update(_clear_transcript_mapping_indexes, 'DATABASE_URI')
+
+
+def get_transcript_mappings(chromosome, start, stop, contained=False):
+    """
+    Get the transcript mappings on a chromosome overlapping or contained in
+    a range, ordered by start, stop, gene, accession, version, and
+    transcript.
+
+    If `settings.TRANSCRIPT_MAPPING_INDEX` is set, the transcript mappings
+    are read-only copies taken from the resident transcript mapping index of
+    the assembly instead of the database.
+
+    @arg chromosome: The chromosome
+    @type chromosome: Chromosome
+    @arg start: Start of the range (one-based, inclusive)
+    @type start: int
+    @arg stop: Stop of the range (one-based, inclusive)
+    @type stop: int
+    @kwarg contained: Only include transcript mappings completely contained
+        in the range
+    @type contained: bool
+
+    @return: Transcript mappings
+    @rtype: list
+    """
+    if settings.TRANSCRIPT_MAPPING_INDEX:
+        index = _get_transcript_mapping_index(chromosome.assembly_id)
+        if contained:
+            return index.contained(chromosome.id, start, stop)
+        return index.overlapping(chromosome.id, start, stop)
+
+    if contained:
+        bins = binning.contained_bins(start - 1, stop)
+        range_filter = (TranscriptMapping.bin.in_(bins),
+                        TranscriptMapping.start >= start,
+                        TranscriptMapping.stop <= stop)
+    else:
+        bins = binning.overlapping_bins(start - 1, stop)
+        range_filter = (TranscriptMapping.bin.in_(bins),
+                        TranscriptMapping.start <= stop,
+                        TranscriptMapping.stop >= start)
+
+    return chromosome.transcript_mappings.filter(*range_filter).order_by(
+        TranscriptMapping.start,
+        TranscriptMapping.stop,
+        TranscriptMapping.gene,
+        TranscriptMapping.accession,
+        TranscriptMapping.version,
+        TranscriptMapping.transcript).all()
+
+
+# Variant descriptions simple enough to be converted in bulk without using
+# the nomenclature parser, see `Converter.convert_many`.
+_SIMPLE_VARIANT = re.compile(r"""
+    ^(?P<reference>[A-Z]{2}_\d+\.\d+|chr[^:]+):(?P<type>[cgmn])\.
+    (?P<start>[-*]?\d+)(?P<start_offset>[-+][ud]?\d+)?
+    (?:_(?P<stop>[-*]?\d+)(?P<stop_offset>[-+][ud]?\d+)?)?
+    (?:(?P<arg1>[ACGT])>(?P<arg2>[ACGT])
+      |(?P<operation>delins|del|dup|ins|inv)(?P<sequence>[ACGT]*))$
+    """, re.VERBOSE)
 
 
 class MapviewSortError(Exception):
     pass
 
 
+class UcscDumpError(Exception):
+    pass
+
+
+# Transcript mappings are imported and committed in chunks of this size.
+_IMPORT_CHUNK_SIZE = 1000
+
+# Columns identifying a transcript mapping (as in the unique index).
+_KEY_COLUMNS = ('chromosome_id', 'accession', 'version', 'gene',
+                'transcript')
+
+_mapping_key = itemgetter(*_KEY_COLUMNS)
+
+
+def _transcript_mapping_row(chromosome_id, reference_type, accession, gene,
+                            orientation, start, stop, exon_starts, exon_stops,
+                            source, transcript=1, cds=None,
+                            select_transcript=False, version=None):
+    """
+    Create the column values for a transcript mapping, for bulk inserts and
+    updates. The arguments are those of `TranscriptMapping`, except for the
+    chromosome, which is given by its id.
+
+    @return: Column values by column name
+    @rtype: dict
+    """
+    cds_start, cds_stop = cds or (None, None)
+    return {'chromosome_id': chromosome_id,
+            'reference_type': reference_type,
+            'accession': accession,
+            'version': version,
+            'gene': gene,
+            'transcript': transcript,
+            'orientation': orientation,
+            'start': start,
+            'stop': stop,
+            'bin': binning.assign_bin(start - 1, stop),
+            'cds_start': cds_start,
+            'cds_stop': cds_stop,
+            'exon_starts': exon_starts,
+            'exon_stops': exon_stops,
+            'select_transcript': select_transcript,
+            'source': source}
+
+
+def _chunks(iterable, size):
+    """
+    Split an iterable into lists of at most `size` items.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _upsert_transcript_mappings(rows):
+    """
+    Insert transcript mappings, updating existing transcript mappings with
+    the same key in place. This takes one query for the existing transcript
+    mappings and one bulk update and insert, instead of a query per
+    transcript mapping as in `TranscriptMapping.create_or_update`.
+
+    If a key occurs more than once in `rows`, the last one is used.
+
+    @arg rows: Transcript mappings (see `_transcript_mapping_row`)
+    @type rows: list(dict)
+    """
+    by_key = OrderedDict((_mapping_key(row), dict(row)) for row in rows)
+
+    existing = session.query(
+        TranscriptMapping.id,
+        *[getattr(TranscriptMapping, c) for c in _KEY_COLUMNS]) \
+        .filter(TranscriptMapping.accession.in_(
+            set(key[1] for key in by_key))) \
+        .all()
+
+    updates = []
+    for row in existing:
+        key = tuple(row[1:])
+        if key in by_key:
+            update = by_key.pop(key)
+            update['id'] = row.id
+            updates.append(update)
+
+    session.bulk_update_mappings(TranscriptMapping, updates)
+    session.bulk_insert_mappings(TranscriptMapping, by_key.values())
+
+
+def _staging_table():
+    """
+    Table for staging transcript mappings. It has the columns of the
+    transcript mappings table, but no constraints and no enum types (which
+    would be dropped with the table on some databases). Every import gets
+    its own staging table, such that concurrent imports don't interfere.
+
+    @return: The staging table
+    @rtype: sqlalchemy.Table
+    """
+    columns = []
+    for column in TranscriptMapping.__table__.columns:
+        if column.primary_key:
+            continue
+        type_ = column.type
+        if isinstance(type_, Enum):
+            type_ = String(max(len(value) for value in type_.enums))
+        columns.append(Column(column.name, type_))
+    return Table('transcript_mappings_staging_%s' % uuid.uuid4().hex,
+                 MetaData(), *columns)
+
+
+def _replace_transcript_mappings(assembly, rows, source, chunk_size,
+                                 progress=None):
+    """
+    Replace all transcript mappings from a source in an assembly.
+
+    The transcript mappings are first written to a staging table in chunks
+    and then swapped in by one transaction, such that the old transcript
+    mappings can be used until the import is complete.
+
+    @return: Number of imported transcript mappings
+    @rtype: int
+    """
+    staging = _staging_table()
+    staging.drop(session.connection(), checkfirst=True)
+    staging.create(session.connection())
+    session.commit()
+
+    def same_key(table):
+        return and_(
+            staging.c.chromosome_id == table.c.chromosome_id,
+            staging.c.accession == table.c.accession,
+            or_(staging.c.version == table.c.version,
+                and_(staging.c.version == None, table.c.version == None)),
+            staging.c.gene == table.c.gene,
+            staging.c.transcript == table.c.transcript)
+
+    try:
+        count = 0
+        staged_keys = set()
+        for chunk in _chunks(rows, chunk_size):
+            by_key = OrderedDict((_mapping_key(row), row) for row in chunk)
+
+            # As with updates, the last transcript mapping with a key is
+            # used.
+            for key in staged_keys.intersection(by_key):
+                session.execute(staging.delete().where(and_(
+                    *[staging.c[c] == v for c, v in zip(_KEY_COLUMNS, key)])))
+            staged_keys.update(by_key)
+
+            session.execute(staging.insert(), by_key.values())
+            session.commit()
+            count += len(chunk)
+            if progress is not None:
+                progress(count)
+
+        table = TranscriptMapping.__table__
+        session.execute(table.delete().where(and_(
+            table.c.source == source,
+            table.c.chromosome_id.in_(select([Chromosome.id]).where(
+                Chromosome.assembly_id == assembly.id)))))
+        session.execute(table.delete().where(
+            exists().where(same_key(table))))
+        # The enum columns are strings in the staging table, which are not
+        # converted implicitly to enum types in PostgreSQL.
+        columns = list(staging.columns)
+        if session.get_bind().dialect.name == 'postgresql':
+            columns = [cast(c, table.c[c.name].type)
+                       if isinstance(table.c[c.name].type, Enum) else c
+                       for c in columns]
+        session.execute(table.insert().from_select(
+            [c.name for c in staging.columns], select(columns)))
+        session.commit()
+    finally:
+        session.rollback()
+        staging.drop(session.connection(), checkfirst=True)
+        session.commit()
+
+    return count
+
+
+def _import_transcript_mappings(assembly, rows, source, replace=False,
+                                chunk_size=_IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Import transcript mappings in chunks.
+
+    By default, transcript mappings are inserted or updated (if a transcript
+    mapping with the same key exists) and committed per chunk, such that no
+    long-running transaction is needed.
+
+    @arg assembly: The assembly to import to
+    @type assembly: Assembly
+    @arg rows: Transcript mappings (see `_transcript_mapping_row`)
+    @type rows: iterator(dict)
+    @arg source: Source of the transcript mappings
+    @type source: unicode
+    @arg replace: If set, all transcript mappings from `source` in the
+        assembly are replaced at once, see `_replace_transcript_mappings`
+    @type replace: bool
+    @arg chunk_size: Number of transcript mappings per chunk
+    @type chunk_size: int
+    @arg progress: Called with the number of imported transcript mappings
+        after each chunk
+    @type progress: function
+
+    @return: Number of imported transcript mappings
+    @rtype: int
+    """
+    if replace:
+        count = _replace_transcript_mappings(assembly, rows, source,
+                                             chunk_size, progress=progress)
+    else:
+        count = 0
+        for chunk in _chunks(rows, chunk_size):
+            _upsert_transcript_mappings(chunk)
+            session.commit()
+            count += len(chunk)
+            if progress is not None:
+                progress(count)
+
+    # Bulk operations do not trigger the events that drop the resident
+    # transcript mapping indexes.
+    transcript_mappings_changed(assembly)
+    return count
+
+
+def _match_simple_variant(variant):
+    """
+    Match a variant description against the simple variant descriptions we
+    can convert in bulk.
+
+    Descriptions that do not match are not necessarily invalid, they are
+    just converted one by one (and rejected by the nomenclature parser if
+    they are invalid).
+
+    @arg variant: Variant description
+    @type variant: unicode
+
+    @return: The match or None if the description is not simple
+    @rtype: re.MatchObject
+    """
+    match = _SIMPLE_VARIANT.match(variant.replace(' ', ''))
+    if not match:
+        return None
+
+    start, stop = match.group('start', 'stop')
+
+    if match.group('type') in 'gm':
+        if (match.group('start_offset') or match.group('stop_offset') or
+                not start.isdigit() or (stop and not stop.isdigit())):
+            return None
+        if stop and int(stop) < int(start):
+            return None
+    elif match.group('reference').startswith('chr'):
+        return None
+
+    operation, sequence = match.group('operation', 'sequence')
+
+    if match.group('arg1'):
+        if stop:
+            return None
+    elif operation == 'ins':
+        if not (stop and sequence):
+            return None
+    elif operation == 'delins':
+        if not sequence:
+            return None
+    elif operation == 'inv':
+        if not stop or sequence:
+            return None
+
+    return match
+#_match_simple_variant
+
+
+def _construct_simple_change(match, reverse=False):
+    """
+    Construct mutation description for a simple variant description, see
+    `_construct_change`.
+
+    @arg match: Match of the simple variant description.
+    @type match: re.MatchObject
+    @var reverse: Variant is on the reverse strand.
+    @type reverse: bool
+
+    @return: Description of mutation (without reference and positions).
+    @rtype: unicode
+    """
+    if match.group('arg1'):
+        arg1, arg2 = match.group('arg1', 'arg2')
+        if reverse:
+            arg1 = util.reverse_complement(arg1)
+            arg2 = util.reverse_complement(arg2)
+        return '%s>%s' % (arg1, arg2)
+
+    sequence = match.group('sequence')
+    if reverse and sequence:
+        sequence = util.reverse_complement(sequence)
+    return match.group('operation') + sequence
+#_construct_simple_change
+
+
 def _construct_change(var, reverse=False):
     """
     Construct mutation description.
@@ -251,10 +873,43 @@ class Converter(object) :
         #        "Available: %s.%s" % (acc, sorted(versions)[-1]))
     #_get_mapping
 
+    def _get_chromosome(self, **criteria) :
+        """
+        Get a chromosome in the assembly.
+
+        The chromosome ids found are cached per assembly, such that repeated
+        lookups can be done by primary key.
+
+        @kwarg criteria: Chromosome accession or name (one of them)
+        @type criteria: unicode
+
+        @return: The chromosome or None if it could not be found
+        @rtype: Chromosome
+        """
+        (field, value), = criteria.items()
+        key = self.assembly.id, field, value
+
+        chromosome_id = _chromosome_ids.get(key)
+        if chromosome_id is not None:
+            chromosome = Chromosome.query.get(chromosome_id)
+            if chromosome is not None:
+                return chromosome
+
+        chromosome = Chromosome.query.filter_by(
+            assembly=self.assembly, **criteria).first()
+        if chromosome is not None:
+            _chromosome_ids[key] = chromosome.id
+        return chromosome
+    #_get_chromosome
+
     def makeCrossmap(self) :
         """
         Build the crossmapper.
 
+        Crossmap objects are cached by transcript mapping, keyed by its id
+        and the values it is built from (such that updated mappings are
+        built again).
+
         @todo: ADD Error Messages
 
         @return: Cross ; A Crossmap object
@@ -264,15 +919,23 @@ class Converter(object) :
         if not self.mapping:
             return None
 
-        # Create Mutalyzer compatible exon list.
-        mrna = []
-        for exon in zip(self.mapping.exon_starts, self.mapping.exon_stops):
-            mrna.extend(exon)
-
         cds = self.mapping.cds or []
         orientation = 1 if self.mapping.orientation == 'forward' else -1
 
-        self.crossmap = Crossmap.Crossmap(mrna, cds, orientation)
+        key = (self.mapping.id, orientation, tuple(cds),
+               tuple(self.mapping.exon_starts), tuple(self.mapping.exon_stops))
+        crossmaps = _get_crossmaps()
+
+        self.crossmap = crossmaps.get(key)
+        if self.crossmap is None:
+            # Create Mutalyzer compatible exon list.
+            mrna = []
+            for exon in zip(self.mapping.exon_starts, self.mapping.exon_stops):
+                mrna.extend(exon)
+
+            self.crossmap = Crossmap.Crossmap(mrna, cds, orientation)
+            crossmaps.set(key, self.crossmap)
+
         return self.crossmap
     #makeCrossmap
 
@@ -662,8 +1325,7 @@ class Converter(object) :
         if variant.startswith('chr') and ':' in variant:
             preco, postco = variant.split(':', 1)
 
-            chromosome = Chromosome.query.filter_by(assembly=self.assembly,
-                                                    name=preco).first()
+            chromosome = self._get_chromosome(name=preco)
             if not chromosome:
                 self.__output.addMessage(__file__, 4, "ENOTINDB",
                     "Accession number %s could not be found in our database "
@@ -696,9 +1358,7 @@ class Converter(object) :
         acc = self.parseTree.LrgAcc or self.parseTree.RefSeqAcc
         version = self.parseTree.Version
 
-        chromosome = Chromosome.query \
-            .filter_by(assembly=self.assembly,
-                       accession='%s.%s' % (acc, version)).first()
+        chromosome = self._get_chromosome(accession='%s.%s' % (acc, version))
         if not chromosome :
             self.__output.addMessage(__file__, 4, "ENOTINDB",
                 "Accession number %s could not be found in our database or is "
@@ -736,18 +1396,7 @@ class Converter(object) :
         else:
             start = max(min_loc - 5000, 1)
             stop = min(max_loc + 5000, binning.MAX_POSITION + 1)
-            bins = binning.overlapping_bins(start - 1, stop)
-            mappings = chromosome.transcript_mappings.filter(
-                TranscriptMapping.bin.in_(bins),
-                TranscriptMapping.start <= stop,
-                TranscriptMapping.stop >= start
-            ).order_by(
-                TranscriptMapping.start,
-                TranscriptMapping.stop,
-                TranscriptMapping.gene,
-                TranscriptMapping.accession,
-                TranscriptMapping.version,
-                TranscriptMapping.transcript)
+            mappings = get_transcript_mappings(chromosome, start, stop)
 
         HGVS_notatations = defaultdict(list)
         NM_list = []
@@ -816,6 +1465,260 @@ class Converter(object) :
             return NM_list
         return HGVS_notatations
     #chrom2c
+
+    def _convert_one(self, variant, gene=None):
+        """
+        Convert a variant in either I{c.} or I{g.} notation, as done by the
+        numberConversion webservice method.
+
+        @arg variant: The variant description
+        @type variant: unicode
+        @kwarg gene: Optional gene name. If given, return variant descriptions
+            on all transcripts for this gene.
+        @type gene: unicode
+
+        @return: The converted variant descriptions and the messages
+        @rtype: tuple(list, list)
+        """
+        output = Output(__file__)
+        converter = Converter(self.assembly, output)
+        variant = converter.correctChrVariant(variant)
+
+        conversions = []
+        if not variant:
+            pass
+        elif "c." in variant or "n." in variant:
+            conversion = converter.c2chrom(variant)
+            if conversion:
+                conversions.append(conversion)
+        elif "g." in variant or "m." in variant:
+            conversions = converter.chrom2c(variant, "list", gene=gene) or []
+        else:
+            output.addMessage(__file__, 4, "EPARSE",
+                              "Could not parse the given variant")
+
+        return conversions, output.getMessages()
+    #_convert_one
+
+    def _convert_transcript_group(self, reference, matches):
+        """
+        Convert simple variants in I{c.} or I{n.} notation on one transcript
+        to I{g.} notation.
+
+        @arg reference: Transcript accession number (with version)
+        @type reference: unicode
+        @arg matches: Matches of the simple variant descriptions
+        @type matches: list
+
+        @return: For every variant, the converted variant descriptions and the
+            messages, or None if it must be converted by itself
+        @rtype: list
+        """
+        output = Output(__file__)
+        converter = Converter(self.assembly, output)
+        accession, version = reference.split('.')
+        converter._get_mapping(accession, int(version))
+
+        crossmap = converter.makeCrossmap()
+        if not crossmap:
+            messages = output.getMessages()
+            return [([], messages) for _ in matches]
+
+        def chromosomal_positions(locations):
+            mains = [crossmap.main2int(main) for main, _ in locations]
+            offsets = [crossmap.offset2int(offset or '')
+                       for _, offset in locations]
+            return crossmap.x2g_many(numpy.array(mains),
+                                     numpy.array(offsets)).tolist()
+
+        starts = [match.group('start', 'start_offset') for match in matches]
+        stops = [match.group('stop', 'stop_offset') if match.group('stop')
+                 else start for match, start in zip(matches, starts)]
+        starts_g = chromosomal_positions(starts)
+        stops_g = chromosomal_positions(stops)
+
+        mapping = converter.mapping
+        reverse = mapping.orientation == 'reverse'
+        if mapping.chromosome.organelle == 'mitochondrion':
+            prefix = '%s:m.' % mapping.chromosome.accession
+        else:
+            prefix = '%s:g.' % mapping.chromosome.accession
+
+        results = []
+        for match, start_g, stop_g in zip(matches, starts_g, stops_g):
+            if start_g != stop_g:
+                if reverse:
+                    last_g, first_g = start_g, stop_g
+                else:
+                    first_g, last_g = start_g, stop_g
+                if last_g < first_g:
+                    # Leave error reporting to the regular conversion.
+                    results.append(None)
+                    continue
+                location = '%s_%s' % (first_g, last_g)
+            else:
+                location = '%s' % start_g
+            results.append((
+                [prefix + location + _construct_simple_change(match, reverse)],
+                []))
+
+        return results
+    #_convert_transcript_group
+
+    def _convert_chromosome_group(self, reference, matches, gene=None):
+        """
+        Convert simple variants in I{g.} or I{m.} notation on one chromosome
+        to I{c.} or I{n.} notation on all transcripts near the variants.
+
+        @arg reference: Chromosome accession number (with version) or name
+        @type reference: unicode
+        @arg matches: Matches of the simple variant descriptions
+        @type matches: list
+        @kwarg gene: Optional gene name. If given, return variant descriptions
+            on all transcripts for this gene.
+        @type gene: unicode
+
+        @return: For every variant, the converted variant descriptions and the
+            messages
+        @rtype: list
+        """
+        if reference.startswith('chr'):
+            chromosome = self._get_chromosome(name=reference)
+            not_found = reference
+        else:
+            chromosome = self._get_chromosome(accession=reference)
+            not_found = reference.split('.')[0]
+
+        if not chromosome:
+            output = Output(__file__)
+            output.addMessage(__file__, 4, "ENOTINDB",
+                "Accession number %s could not be found in our database or is "
+                "not suitable for the requested conversion." % not_found)
+            messages = output.getMessages()
+            return [([], messages) for _ in matches]
+
+        starts = numpy.array([int(match.group('start')) for match in matches])
+        stops = numpy.array([int(match.group('stop') or match.group('start'))
+                             for match in matches])
+
+        # Windows around the variants to look for transcripts in (as done in
+        # chrom2c), and their order by start.
+        lows = numpy.maximum(starts - 5000, 1)
+        highs = numpy.minimum(stops + 5000, binning.MAX_POSITION + 1)
+        order = numpy.argsort(lows, kind='mergesort')
+        sorted_lows = lows[order]
+        max_span = (highs - lows).max()
+
+        if gene:
+            mappings = chromosome.transcript_mappings.filter_by(gene=gene)
+        else:
+            mappings = get_transcript_mappings(chromosome, lows.min(),
+                                               highs.max())
+
+        changes = [(_construct_simple_change(match),
+                    _construct_simple_change(match, reverse=True))
+                   for match in matches]
+        conversions = [[] for _ in matches]
+
+        for mapping in mappings:
+            if gene:
+                selected = order
+            else:
+                selected = order[
+                    numpy.searchsorted(sorted_lows, mapping.start - max_span,
+                                       'left'):
+                    numpy.searchsorted(sorted_lows, mapping.stop, 'right')]
+                selected = selected[highs[selected] >= mapping.start]
+                if not len(selected):
+                    continue
+
+            self._reset()
+            self.mapping = mapping
+            crossmap = self.makeCrossmap()
+
+            mains, offsets = crossmap.g2x_many(
+                numpy.concatenate((starts[selected], stops[selected])))
+            mains = mains.tolist()
+            offsets = offsets.tolist()
+
+            reference = mapping.reference
+            forward = mapping.orientation == 'forward'
+            mtype = 'c' if crossmap.CDS else 'n'
+
+            for j, i in enumerate(selected.tolist()):
+                k = j + len(selected)
+                startp = crossmap.tuple2string((mains[j], offsets[j]))
+                endp = crossmap.tuple2string((mains[k], offsets[k]))
+
+                if forward:
+                    change = changes[i][0]
+                else:
+                    change = changes[i][1]
+                    startp, endp = endp, startp
+
+                if starts[i] != stops[i]:
+                    location = '%s_%s' % (startp, endp)
+                else:
+                    location = startp
+
+                conversions[i].append(
+                    '%s:%c.%s%s' % (reference, mtype, location, change))
+        #for
+
+        return [(descriptions, []) for descriptions in conversions]
+    #_convert_chromosome_group
+
+    def convert_many(self, variants, gene=None):
+        """
+        Convert a list of variants in either I{c.} or I{g.} notation, with
+        the same results as converting them one by one.
+
+        Simple variant descriptions are grouped by transcript or chromosome
+        and converted per group with one crossmapper. Other variant
+        descriptions are converted one by one.
+
+        @arg variants: The variant descriptions
+        @type variants: list(unicode)
+        @kwarg gene: Optional gene name. If given, return variant descriptions
+            on all transcripts for this gene.
+        @type gene: unicode
+
+        @return: For every variant, in the order given, the converted variant
+            descriptions and the messages
+        @rtype: list(tuple(list, list))
+        """
+        results = [None] * len(variants)
+        transcript_groups = defaultdict(list)
+        chromosome_groups = defaultdict(list)
+
+        for i, variant in enumerate(variants):
+            match = _match_simple_variant(variant)
+            if not match:
+                continue
+            if match.group('type') in 'cn':
+                group = transcript_groups[match.group('reference')]
+            else:
+                group = chromosome_groups[match.group('reference')]
+            group.append((i, match))
+
+        for reference, group in transcript_groups.items():
+            indices, matches = zip(*group)
+            for i, result in zip(indices, self._convert_transcript_group(
+                    reference, matches)):
+                results[i] = result
+
+        for reference, group in chromosome_groups.items():
+            indices, matches = zip(*group)
+            for i, result in zip(indices, self._convert_chromosome_group(
+                    reference, matches, gene=gene)):
+                results[i] = result
+
+        for i, variant in enumerate(variants):
+            if results[i] is None:
+                results[i] = self._convert_one(variant, gene=gene)
+
+        return results
+    #convert_many
 #Converter
 
 
@@ -866,6 +1769,163 @@ def import_from_ucsc_by_gene(assembly, gene):
         session.add(mapping)
 
     session.commit()
+    transcript_mappings_changed(assembly)
+
+
+def import_from_ucsc_dump(assembly, dump_file, replace=False,
+                          chunk_size=_IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Import transcript mappings from a UCSC Genome Browser table dump or a GTF
+    file.
+
+    The table dump must be in the format of the `refGene` and `ncbiRefSeq`
+    tables (with or without `bin` column). Accession numbers without version
+    (as in the `refGene` table) are imported without version, so the
+    `ncbiRefSeq` table is preferred.
+
+    GTF files must have the lines of each transcript grouped together, which
+    is the case for those provided by the UCSC and GENCODE. The CDS is taken
+    from the `CDS`, `start_codon`, and `stop_codon` features, the exons from
+    the `exon` features. Raises :exc:`UcscDumpError` if the lines of a
+    transcript are not grouped.
+
+    Only RefSeq transcripts (e.g., ``NM_003002.2``) on chromosomes we know
+    are imported, since transcript mappings for other references (such as
+    Ensembl transcripts in GENCODE files) cannot be used.
+
+    All ranges in the UCSC tables are zero-based and open-ended, in GTF files
+    they are one-based and inclusive. We convert this to one-based, inclusive
+    for our database.
+
+    The file is read and imported in a streaming fashion, see
+    `_import_transcript_mappings` for the `replace`, `chunk_size`, and
+    `progress` arguments.
+
+    @return: Number of imported transcript mappings
+    @rtype: int
+    """
+    chromosome_ids = dict(assembly.chromosomes.with_entities(
+        Chromosome.name, Chromosome.id))
+
+    def get_chromosome_id(name):
+        # GTF files from GENCODE use chromosome names without `chr` prefix.
+        if name in chromosome_ids:
+            return chromosome_ids[name]
+        return chromosome_ids.get('chr' + name)
+
+    def parse_accession(name):
+        match = re.match(r'([NX][MR]_\d+)(?:\.(\d+))?', name)
+        if match is None:
+            return None, None
+        accession, version = match.groups()
+        return accession, int(version) if version else None
+
+    def read_table_mappings(lines):
+        for line in lines:
+            fields = line.rstrip('\r\n').split('\t')
+            if len(fields) == 16:
+                # Remove `bin` column.
+                fields = fields[1:]
+            if len(fields) != 15:
+                raise UcscDumpError('Not a valid refGene or ncbiRefSeq line: '
+                                    '%s' % line.rstrip('\r\n'))
+
+            (name, chrom, strand, tx_start, tx_end, cds_start, cds_end, _,
+             exon_starts, exon_stops, _, gene) = fields[:12]
+
+            accession, version = parse_accession(name)
+            chromosome_id = get_chromosome_id(chrom)
+            if accession is None or chromosome_id is None:
+                continue
+
+            cds_start, cds_end = int(cds_start), int(cds_end)
+            if cds_start < cds_end:
+                cds = cds_start + 1, cds_end
+            else:
+                cds = None
+
+            yield _transcript_mapping_row(
+                chromosome_id, 'refseq', accession, gene,
+                'reverse' if strand == '-' else 'forward',
+                int(tx_start) + 1, int(tx_end),
+                [int(i) + 1 for i in exon_starts.split(',') if i],
+                [int(i) for i in exon_stops.split(',') if i],
+                'ucsc', cds=cds, version=version)
+
+    def read_gtf_records(lines):
+        for line in lines:
+            fields = line.rstrip('\r\n').split('\t')
+            if len(fields) != 9:
+                raise UcscDumpError('Not a valid GTF line: %s'
+                                    % line.rstrip('\r\n'))
+            attributes = dict(re.findall(r'(\w+) "([^"]*)"', fields[8]))
+            if 'transcript_id' not in attributes:
+                continue
+            yield {'chromosome': fields[0],
+                   'feature_type': fields[2],
+                   'start': int(fields[3]),
+                   'stop': int(fields[4]),
+                   'orientation': 'reverse' if fields[6] == '-' else 'forward',
+                   'transcript': attributes['transcript_id'],
+                   'gene': attributes.get('gene_name',
+                                          attributes.get('gene_id'))}
+
+    def read_gtf_mappings(lines):
+        processed_keys = set()
+
+        for key, records in groupby(read_gtf_records(lines),
+                                    itemgetter('transcript', 'chromosome')):
+            if key in processed_keys:
+                raise UcscDumpError('GTF file must have the lines of each '
+                                    'transcript grouped together')
+            processed_keys.add(key)
+
+            transcript, chrom = key
+            accession, version = parse_accession(transcript)
+            chromosome_id = get_chromosome_id(chrom)
+            if accession is None or chromosome_id is None:
+                continue
+
+            records = list(records)
+            exons = sorted((r['start'], r['stop']) for r in records
+                           if r['feature_type'] == 'exon')
+            if not exons:
+                continue
+
+            cds_positions = [position for r in records
+                             if r['feature_type'] in ('CDS', 'start_codon',
+                                                      'stop_codon')
+                             for position in (r['start'], r['stop'])]
+            if cds_positions:
+                cds = min(cds_positions), max(cds_positions)
+            else:
+                cds = None
+
+            yield _transcript_mapping_row(
+                chromosome_id, 'refseq', accession, records[0]['gene'],
+                records[0]['orientation'], exons[0][0],
+                max(stop for _, stop in exons),
+                [start for start, _ in exons], [stop for _, stop in exons],
+                'ucsc', cds=cds, version=version)
+
+    lines = (line for line in dump_file
+             if line.strip() and not line.startswith('#'))
+
+    # The file format is detected from the first line.
+    try:
+        first_line = next(lines)
+    except StopIteration:
+        mappings = iter([])
+    else:
+        lines = chain([first_line], lines)
+        if len(first_line.split('\t')) == 9:
+            mappings = read_gtf_mappings(lines)
+        else:
+            mappings = read_table_mappings(lines)
+
+    return _import_transcript_mappings(
+        assembly, mappings, 'ucsc', replace=replace, chunk_size=chunk_size,
+        progress=progress)
 
 
 def import_from_reference(assembly, reference):
@@ -915,9 +1975,12 @@ def import_from_reference(assembly, reference):
         session.add(mapping)
 
     session.commit()
+    transcript_mappings_changed(assembly)
 
 
-def import_from_mapview_file(assembly, mapview_file, group_label):
+def import_from_mapview_file(assembly, mapview_file, group_label,
+                             replace=False, chunk_size=_IMPORT_CHUNK_SIZE,
+                             progress=None):
     """
     Import transcript mappings from an NCBI mapview file.
 
@@ -927,7 +1990,10 @@ def import_from_mapview_file(assembly, mapview_file, group_label):
 
         sort -t $'\t' -k 11,11 -k 2,2 seq_gene.md > seq_gene.by_gene.md
 
-    Raises :exc:`ValueError` if `mapview_file` is not sorted this way.
+    Raises :exc:`MapviewSortError` if `mapview_file` is not sorted this way.
+    Unless `replace` is set, the sort order is checked in a first pass over
+    `mapview_file` (which must therefore be seekable), such that nothing is
+    imported from an unsorted file.
 
     The NCBI mapping file consists of entries, one per line, in order of
     their location in the genome (more specifically by start location).
@@ -962,13 +2028,21 @@ def import_from_mapview_file(assembly, mapview_file, group_label):
 
     All positions are one-based, inclusive, and that is what we also use in
     our database.
+
+    The file is read and imported in a streaming fashion, see
+    `_import_transcript_mappings` for the `replace`, `chunk_size`, and
+    `progress` arguments.
+
+    @return: Number of imported transcript mappings
+    @rtype: int
     """
     columns = ['taxonomy', 'chromosome', 'start', 'stop', 'orientation',
                'contig', 'ctg_start', 'ctg_stop', 'ctg_orientation',
                'feature_name', 'feature_id', 'feature_type', 'group_label',
                'transcript', 'evidence_code']
 
-    chromosomes = assembly.chromosomes.all()
+    chromosome_ids = dict(assembly.chromosomes.with_entities(
+        Chromosome.name, Chromosome.id))
 
     def read_records(mapview_file):
         for line in mapview_file:
@@ -982,9 +2056,9 @@ def import_from_mapview_file(assembly, mapview_file, group_label):
 
             # Only use records on chromosomes we know.
             try:
-                record['chromosome'] = next(c for c in chromosomes if
-                                            c.name == 'chr' + record['chromosome'])
-            except StopIteration:
+                record['chromosome'] = chromosome_ids[
+                    'chr' + record['chromosome']]
+            except KeyError:
                 continue
 
             record['start'] = int(record['start'])
@@ -1047,38 +2121,60 @@ def import_from_mapview_file(assembly, mapview_file, group_label):
                 exon_starts = [start]
                 exon_stops = [stop]
 
-            yield TranscriptMapping.create_or_update(
+            yield _transcript_mapping_row(
                 chromosome, 'refseq', accession, gene, orientation, start,
                 stop, exon_starts, exon_stops, 'ncbi', cds=cds,
                 version=version)
 
-    processed_keys = set()
-
-    for key, records in groupby(read_records(mapview_file),
-                                itemgetter('feature_id', 'chromosome')):
-        if key in processed_keys:
-            raise MapviewSortError('Mapview file must be sorted by feature_id '
-                                   'and chromosome (try `sort -k 11,11 -k '
-                                   '2,2`)')
-        processed_keys.add(key)
-
-        for mapping in build_mappings(records):
-            session.add(mapping)
-
-    session.commit()
-
-
-def import_from_lrgmap_file(assembly, lrgmap_file):
+    def group_records(mapview_file):
+        processed_keys = set()
+
+        for key, records in groupby(read_records(mapview_file),
+                                    itemgetter('feature_id', 'chromosome')):
+            if key in processed_keys:
+                raise MapviewSortError('Mapview file must be sorted by '
+                                       'feature_id and chromosome (try `sort '
+                                       '-k 11,11 -k 2,2`)')
+            processed_keys.add(key)
+            yield records
+
+    def read_mappings(mapview_file):
+        for records in group_records(mapview_file):
+            for mapping in build_mappings(records):
+                yield mapping
+
+    if not replace:
+        # Transcript mappings are committed per chunk, so we don't want to
+        # find out halfway the import that the file is not sorted.
+        for _ in group_records(mapview_file):
+            pass
+        mapview_file.seek(0)
+
+    return _import_transcript_mappings(
+        assembly, read_mappings(mapview_file), 'ncbi', replace=replace,
+        chunk_size=chunk_size, progress=progress)
+
+
+def import_from_lrgmap_file(assembly, lrgmap_file, replace=False,
+                            chunk_size=_IMPORT_CHUNK_SIZE, progress=None):
     """
     Import transcript mappings from an EBI LRG transcripts map file.
 
     All positions are one-based, inclusive, and that is what we also use in
     our database.
+
+    The file is read and imported in a streaming fashion, see
+    `_import_transcript_mappings` for the `replace`, `chunk_size`, and
+    `progress` arguments.
+
+    @return: Number of imported transcript mappings
+    @rtype: int
     """
     columns = ['transcript', 'gene', 'chromosome', 'strand', 'start', 'stop',
                'exons', 'protein', 'cds_start', 'cds_stop']
 
-    chromosomes = assembly.chromosomes.all()
+    chromosome_ids = dict(assembly.chromosomes.with_entities(
+        Chromosome.name, Chromosome.id))
 
     def read_mappings(lrgmap_file):
         for line in lrgmap_file:
@@ -1107,9 +2203,8 @@ def import_from_lrgmap_file(assembly, lrgmap_file):
     def build_mapping(record):
         # Only use records on chromosomes we know.
         try:
-            chromosome = next(c for c in chromosomes if
-                              c.name == 'chr' + record['chromosome'])
-        except StopIteration:
+            chromosome = chromosome_ids['chr' + record['chromosome']]
+        except KeyError:
             raise ValueError()
 
         accession, transcript = record['transcript'].split('t')
@@ -1126,14 +2221,13 @@ def import_from_lrgmap_file(assembly, lrgmap_file):
         # some transcripts occur twice (with different CDSs and different
         # protein numbers).
         # https://github.com/mutalyzer/mutalyzer/issues/372
-        return TranscriptMapping.create_or_update(
+        return _transcript_mapping_row(
             chromosome, 'lrg', accession, record['gene'], orientation,
             record['start'], record['stop'],
             [start for start, _ in record['exons']],
             [stop for _, stop in record['exons']],
             'ebi', transcript=transcript, cds=cds, select_transcript=True)
 
-    for mapping in read_mappings(lrgmap_file):
-        session.add(mapping)
-
-    session.commit()
+    return _import_transcript_mappings(
+        assembly, read_mappings(lrgmap_file), 'ebi', replace=replace,
+        chunk_size=chunk_size, progress=progress)
@@ -375,6 +375,18 @@ class TranscriptMappingInfo(ComplexModel):
 #TranscriptMappingInfo
 
 
+class NumberConversionOutput(ComplexModel):
+    """
+    Used in return type of SOAP method numberConversionBatch.
+    """
+    __namespace__ = SOAP_NAMESPACE
+
+    variant = Mandatory.Unicode
+    conversions = Array(Mandatory.Unicode)
+    messages = Array(SoapMessage)
+#NumberConversionOutput
+
+
 class CheckSyntaxOutput(ComplexModel):
     """
     Return type of SOAP method checkSyntax.
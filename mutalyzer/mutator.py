@@ -14,10 +14,13 @@ The original as well as the mutated string are stored here.
 
 from __future__ import unicode_literals
 
+from array import array
+import bisect
 from collections import defaultdict
 
 from Bio import Restriction
 
+from mutalyzer.config import settings
 from mutalyzer import util
 
 
@@ -31,6 +34,171 @@ VIS_MAX_LENGTH = 25
 # (because it exceeds VIS_MAX_LENGTH).
 VIS_CLIP_FLANK_LENGTH = 6
 
+# Size of the blocks in which restriction sites are indexed.
+RESTRICTION_INDEX_BLOCK_SIZE = 1000
+
+# Restriction enzymes used in the restriction site analysis.
+_restriction_batch = Restriction.RestrictionBatch([], ['N'])
+
+# The same restriction enzymes in a fixed order, such that the restriction
+# site index can refer to them by number.
+_restriction_enzymes = sorted(_restriction_batch, key=unicode)
+
+# Size of the largest recognition site of the restriction enzymes.
+_restriction_max_size = max(enzyme.size for enzyme in _restriction_enzymes)
+
+# Indexed blocks of restriction sites per reference checksum and block
+# number, see `RestrictionSiteIndex`. Initialized on first use.
+_restriction_blocks = None
+
+
+def _get_restriction_blocks():
+    """
+    Get the cache of indexed blocks of restriction sites.
+
+    @return: The cache
+    @rtype: util.LRUCache
+    """
+    global _restriction_blocks
+    restriction_blocks = _restriction_blocks
+    if restriction_blocks is None:
+        restriction_blocks = _restriction_blocks = util.LRUCache(
+            settings.RESTRICTION_INDEX_CACHE_SIZE)
+    return restriction_blocks
+#_get_restriction_blocks
+
+
+def _clear_restriction_blocks(*args):
+    """
+    Clear the cache of indexed blocks of restriction sites.
+    """
+    global _restriction_blocks
+    _restriction_blocks = None
+#_clear_restriction_blocks
+
+
+settings.on_update(_clear_restriction_blocks, 'RESTRICTION_INDEX_CACHE_SIZE')
+
+
+class RestrictionSiteIndex(object):
+    """
+    Index of restriction enzyme recognition sites in a sequence. The index is
+    built per block of RESTRICTION_INDEX_BLOCK_SIZE bases when the block is
+    first queried. The indexed blocks of all sequences are kept in one cache
+    of at most RESTRICTION_INDEX_CACHE_SIZE blocks.
+
+    The index does not keep the sequence, it should be given with each query
+    and must always be the same.
+    """
+    def __init__(self, checksum):
+        """
+        Initialise the index.
+
+        @arg checksum: Checksum of the sequence, identifying its blocks in
+            the cache.
+        @type checksum: unicode
+        """
+        self._checksum = checksum
+    #__init__
+
+    def _block(self, sequence, block):
+        """
+        Get the recognition sites starting in a block, indexing them if
+        needed.
+
+        @arg sequence: The sequence.
+        @type sequence: str
+        @arg block: Block number.
+        @type block: int
+
+        @return: Recognition sites as two arrays with, ordered by position,
+            the first interbase position in the block and the number of the
+            enzyme (in `_restriction_enzymes`) of every site.
+        @rtype: tuple(array(int), array(int))
+        """
+        blocks = _get_restriction_blocks()
+        key = self._checksum, block
+
+        sites = blocks.get(key)
+        if sites is not None:
+            return sites
+
+        offset = block * RESTRICTION_INDEX_BLOCK_SIZE
+        data = sequence[offset:offset + RESTRICTION_INDEX_BLOCK_SIZE +
+                        _restriction_max_size - 1].upper()
+
+        found = []
+        for number, enzyme in enumerate(_restriction_enzymes):
+            for match in enzyme.compsite.finditer(data):
+                if match.start() >= RESTRICTION_INDEX_BLOCK_SIZE:
+                    break
+                found.append((match.start(), number))
+        found.sort()
+
+        sites = (array('H', [start for start, _ in found]),
+                 array('H', [number for _, number in found]))
+        blocks.set(key, sites)
+        return sites
+    #_block
+
+    def enzymes(self, sequence, pos1, pos2):
+        """
+        Get the restriction enzymes with a recognition site in a range.
+
+        @arg sequence: The sequence.
+        @type sequence: str
+        @arg pos1: First interbase position of the range.
+        @type pos1: int
+        @arg pos2: Second interbase position of the range.
+        @type pos2: int
+
+        @return: The restriction enzymes.
+        @rtype: set
+        """
+        enzymes = set()
+        for block in range(pos1 // RESTRICTION_INDEX_BLOCK_SIZE,
+                           (pos2 - 1) // RESTRICTION_INDEX_BLOCK_SIZE + 1):
+            offset = block * RESTRICTION_INDEX_BLOCK_SIZE
+            starts, numbers = self._block(sequence, block)
+            for i in range(bisect.bisect_left(starts, pos1 - offset),
+                           bisect.bisect_left(starts, pos2 - offset)):
+                enzyme = _restriction_enzymes[numbers[i]]
+                if offset + starts[i] + enzyme.size <= pos2:
+                    enzymes.add(enzyme)
+        return enzymes
+    #enzymes
+#RestrictionSiteIndex
+
+
+def _restriction_enzymes_in(sequence):
+    """
+    Get the restriction enzymes with a recognition site in a sequence.
+
+    @arg sequence: The sequence.
+    @type sequence: str
+
+    @return: The restriction enzymes.
+    @rtype: set
+    """
+    data = sequence.upper()
+    return set(enzyme for enzyme in _restriction_enzymes
+               if enzyme.compsite.search(data))
+#_restriction_enzymes_in
+
+
+def restriction_index(checksum):
+    """
+    Get the restriction site index for a reference.
+
+    @arg checksum: Checksum of the reference.
+    @type checksum: unicode
+
+    @return: The restriction site index.
+    @rtype: RestrictionSiteIndex
+    """
+    return RestrictionSiteIndex(checksum)
+#restriction_index
+
 
 class Mutator():
     """
@@ -40,7 +208,8 @@ class Mutator():
     in the output object as 'visualisation', 'deletedRestrictionSites' and
     'addedRestrictionSites' respectively.
     """
-    def __init__(self, orig, output):
+    def __init__(self, orig, output, restriction_index=None,
+                 restriction_sites=True):
         """
         Initialise the instance with the original sequence.
 
@@ -48,10 +217,17 @@ class Mutator():
         @type orig: Bio.Seq.Seq
         @arg output: The output object.
         @type output: mutalyzer.Output.Output
+        @kwarg restriction_index: Restriction site index for the original
+            sequence. If given, only enzymes with a recognition site near the
+            variant are used in the analysis.
+        @type restriction_index: RestrictionSiteIndex
+        @kwarg restriction_sites: Whether to do the restriction site analysis.
+        @type restriction_sites: bool
         """
         self._shifts = defaultdict(int)
         self._removed_sites = set()
-        self._restriction_batch = Restriction.RestrictionBatch([], ['N'])
+        self._restriction_index = restriction_index
+        self._restriction_sites = restriction_sites
 
         self._output = output
         self.orig = orig
@@ -61,19 +237,33 @@ class Mutator():
         self.mutated = orig
     #__init__
 
-    def _restriction_count(self, sequence):
+    def _restriction_count(self, sequence, enzymes=None):
         """
         Return the count per restriction enzyme that can bind in a certain
         sequence.
 
         @arg sequence: The sequence to be analysed
         @type sequence: str
+        @kwarg enzymes: Restriction enzymes to use (default: all).
+        @type enzymes: iterable
 
         @return: A mapping of restriction enzymes to counts.
         @rtype: dict
         """
-        analysis = Restriction.Analysis(self._restriction_batch, sequence)
-        return dict((unicode(k), len(v)) for k, v in analysis.with_sites().items())
+        if enzymes is None:
+            enzymes = _restriction_batch
+        if not enzymes:
+            return {}
+
+        # This is what Restriction.Analysis does, without making a copy of
+        # the restriction batch.
+        dna = Restriction.FormattedSeq(sequence, linear=True)
+        counts = {}
+        for enzyme in enzymes:
+            sites = enzyme.search(dna)
+            if sites:
+                counts[unicode(enzyme)] = len(sites)
+        return counts
     #_restriction_count
 
     def _counts_diff(self, counts1, counts2):
@@ -136,14 +326,43 @@ class Mutator():
             visualisation = ['%s %s%s %s' % (loflank, odel, '-' * fill, roflank),
                              '%s %s %s' % (lmflank, insvis, rmflank)]
 
+        if not self._restriction_sites:
+            return visualisation
+
         # Todo: This part is for restriction site analysis. It doesn't really
         #     belong in this method, but since it uses many variables computed
         #     for the visualisation, we leave it here for the moment.
-        counts1 = self._restriction_count(loflank + delPart + roflank)
-        counts2 = self._restriction_count(lmflank + ins + rmflank)
-        self._output.addOutput('restrictionSites',
-                               [self._counts_diff(counts2, counts1),
-                                self._counts_diff(counts1, counts2)])
+        # The analysis is relatively costly, so it is only done if the result
+        # is requested.
+        orig = self.orig
+
+        def restriction_sites():
+            enzymes1 = enzymes2 = None
+            if self._restriction_index:
+                # Only enzymes with a recognition site in the original flanks
+                # can bind there.
+                enzymes1 = self._restriction_index.enzymes(
+                    util.sequence_bytes(orig),
+                    max(pos1 - VIS_FLANK_LENGTH, 0), pos2 + VIS_FLANK_LENGTH)
+                # Unless the flanks were changed by other variants, enzymes
+                # binding in the mutated flanks also bind in the original
+                # flanks, so we only have to look for the others around the
+                # inserted sequence.
+                if (unicode(lmflank) == unicode(loflank) and
+                        unicode(rmflank) == unicode(roflank)):
+                    size = _restriction_max_size - 1
+                    enzymes2 = enzymes1 | _restriction_enzymes_in(
+                        util.sequence_bytes(lmflank)[-size:] +
+                        util.sequence_bytes(ins) +
+                        util.sequence_bytes(rmflank)[:size])
+            counts1 = self._restriction_count(loflank + delPart + roflank,
+                                              enzymes1)
+            counts2 = self._restriction_count(lmflank + ins + rmflank,
+                                              enzymes2)
+            return [self._counts_diff(counts2, counts1),
+                    self._counts_diff(counts1, counts2)]
+
+        self._output.addLazyOutput('restrictionSites', restriction_sites)
 
         return visualisation
     #_visualise
@@ -1,14 +1,40 @@
+from array import array
+import bisect
+from collections import namedtuple
 from datetime import datetime
 
 import mmap
 import os
+import threading
+from StringIO import StringIO
+from Bio import SeqIO
 from Bio.Seq import Seq
 from Bio.Alphabet import generic_dna
+from Bio.SeqFeature import CompoundLocation, FeatureLocation, SeqFeature
+from Bio.SeqRecord import SeqRecord
 from mutalyzer.GenRecord import PList, Locus, Gene, Record
 from mutalyzer.dbgb.models import Transcript, Reference
+from sqlalchemy import event
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 from mutalyzer.config import settings
+from mutalyzer import ncbi
+from mutalyzer import twobit
+
+
+#: Transcript columns kept in the resident transcript index. The exon columns
+#: are stored decoded, as integer arrays.
+_INDEXED_COLUMNS = ('transcript_accession', 'transcript_version',
+                    'protein_accession', 'protein_version', 'gene', 'strand',
+                    'transcript_start', 'transcript_stop', 'cds_start',
+                    'cds_stop', 'transcript_product', 'protein_product',
+                    'exons_start', 'exons_stop')
+
+_IndexedTranscript = namedtuple('_IndexedTranscript', _INDEXED_COLUMNS)
+
+# Resident transcript indexes by reference id, see `_get_transcript_index`.
+_transcript_indexes = {}
+_transcript_indexes_lock = threading.RLock()
 
 
 def get_entire_nc_record(record_id, geneName=None):
@@ -171,6 +197,216 @@ def cds_position_list(mrna_position_list, cds_location):
     return ret
 
 
+def get_gene_location(gene, organism):
+    """
+    Get the location of a gene on the latest version of the chromosome
+    reference it is annotated on in the gbparser database.
+
+    :param gene: The gene symbol.
+    :param organism: The organism name.
+    :return: Tuple of chromosome reference (accession and version), start,
+        stop (one-based, inclusive, in reference orientation) and orientation
+        (1 for forward, 2 for reverse), or None if the gene is not found.
+    """
+    if organism.lower().replace(' ', '').replace('_', '') \
+            not in ('homosapiens', 'human'):
+        return None
+    if not _local_store_available():
+        return None
+
+    rows = Transcript.query.join(Reference).with_entities(
+        Reference.accession, Reference.version, Transcript.strand,
+        Transcript.transcript_start, Transcript.transcript_stop). \
+        filter(Transcript.gene == gene). \
+        filter(Reference.accession.startswith('NC_', autoescape=True)).all()
+    if not rows:
+        return None
+
+    accession, version = max(set((row.accession, row.version)
+                                 for row in rows),
+                             key=lambda reference: (int(reference[1]),
+                                                    reference[0]))
+    rows = [row for row in rows
+            if (row.accession, row.version) == (accession, version)]
+
+    start = min(row.transcript_start for row in rows)
+    stop = max(row.transcript_stop for row in rows)
+    orientation = 2 if rows[0].strand == '-' else 1
+
+    return '%s.%s' % (accession, version), start, stop, orientation
+
+
+def get_reference(record_id):
+    """
+    Get a reference from the local NC sequence store.
+
+    :param record_id: The reference accession with version.
+    :return: Database reference entry, or None if the local store is not
+        configured or does not have the reference.
+    """
+    if not _local_store_available():
+        return None
+
+    accession, version = get_accession_version(record_id)
+    if version is None:
+        return None
+
+    return _get_reference(accession, version)
+
+
+def get_sequence(reference, start, end):
+    """
+    Sequence retrieval for a reference from the local NC sequence store.
+
+    :param reference: Database reference entry (see `get_reference`).
+    :param start: Start position (one-based, inclusive).
+    :param end: End position (one-based, inclusive).
+    :return: The (uppercase) sequence, clipped to the reference.
+    """
+    start = max(start, 1)
+    end = min(end, reference.length)
+    if start > end:
+        return b''
+    return _get_sequence(reference, start, end).upper()
+
+
+def get_genbank_slice(record_id, start, stop, orientation):
+    """
+    Create a GenBank record for a slice of a chromosome reference from the
+    gbparser database and the local sequence files.
+
+    The record contains the transcripts that are completely within the slice.
+    The links between these transcripts and their proteins are stored in the
+    transcript-protein link cache.
+
+    :param record_id: The chromosome reference (accession and version).
+    :param start: Start position of the slice (one-based, inclusive, in
+        reference orientation).
+    :param stop: End position of the slice (one-based, inclusive, in
+        reference orientation).
+    :param orientation: Orientation of the slice (1 for forward, 2 for
+        reverse complement).
+    :return: The GenBank record (raw data) or None if the chromosome
+        reference is not available locally.
+    """
+    if not _local_store_available():
+        return None
+
+    accession, version = get_accession_version(record_id)
+    if version is None:
+        return None
+
+    reference = _get_reference(accession, version)
+    if reference is None or start < 1 or stop > reference.length:
+        return None
+
+    try:
+        seq = Seq(_get_sequence(reference, start, stop), generic_dna)
+    except (IOError, twobit.PackedSequenceError):
+        return None
+
+    if orientation == 2:
+        seq = seq.reverse_complement()
+        region = 'complement(%d..%d)' % (start, stop)
+    else:
+        region = '%d..%d' % (start, stop)
+
+    def location(positions, strand):
+        # Convert a list of (start, stop) chromosomal positions to a feature
+        # location on the slice, parts in transcription order.
+        if orientation == 2:
+            parts = [FeatureLocation(stop - p_e, stop - p_s + 1, -strand)
+                     for p_s, p_e in positions]
+            strand = -strand
+        else:
+            parts = [FeatureLocation(p_s - start, p_e - start + 1, strand)
+                     for p_s, p_e in positions]
+        parts.sort(key=lambda part: part.start, reverse=strand == -1)
+        if len(parts) == 1:
+            return parts[0]
+        return CompoundLocation(parts)
+
+    biorecord = SeqRecord(
+        seq, id=record_id, name=reference.accession,
+        description='Homo sapiens chromosome reference %s, region %s'
+                    % (record_id, region),
+        annotations={'organism': 'Homo sapiens',
+                     'accessions': [reference.accession]})
+    biorecord.features.append(SeqFeature(
+        FeatureLocation(0, len(seq), 1), type='source',
+        qualifiers={'organism': ['Homo sapiens'],
+                    'mol_type': [reference.mol_type]}))
+
+    genes = {}
+    for transcript in _get_contained_transcripts(reference, start, stop):
+        genes.setdefault(transcript.gene, []).append(transcript)
+
+    for gene, transcripts in sorted(
+            genes.items(),
+            key=lambda item: min(t.transcript_start for t in item[1])):
+        strand = -1 if transcripts[0].strand == '-' else 1
+        biorecord.features.append(SeqFeature(
+            location([(min(t.transcript_start for t in transcripts),
+                       max(t.transcript_stop for t in transcripts))], strand),
+            type='gene', qualifiers={'gene': [gene]}))
+
+        cds_features = []
+        for transcript in transcripts:
+            strand = -1 if transcript.strand == '-' else 1
+            starts = _decode_positions(transcript.exons_start)
+            stops = _decode_positions(transcript.exons_stop)
+            if starts and stops and len(starts) == len(stops):
+                exons = zip(starts, stops)
+            else:
+                exons = [(transcript.transcript_start,
+                          transcript.transcript_stop)]
+
+            transcript_id = '%s.%s' % (transcript.transcript_accession,
+                                       transcript.transcript_version)
+            qualifiers = {'gene': [gene], 'transcript_id': [transcript_id]}
+            if transcript.transcript_product:
+                qualifiers['product'] = [transcript.transcript_product]
+            biorecord.features.append(SeqFeature(
+                location(exons, strand), type='mRNA', qualifiers=qualifiers))
+
+            if transcript.protein_accession and transcript.protein_version \
+                    and transcript.cds_start and transcript.cds_stop:
+                cds = [(max(e_s, transcript.cds_start),
+                        min(e_e, transcript.cds_stop)) for e_s, e_e in exons
+                       if e_s <= transcript.cds_stop and
+                       e_e >= transcript.cds_start]
+                if not cds:
+                    continue
+                protein_id = '%s.%s' % (transcript.protein_accession,
+                                        transcript.protein_version)
+                qualifiers = {'gene': [gene], 'protein_id': [protein_id]}
+                if transcript.protein_product:
+                    qualifiers['product'] = [transcript.protein_product]
+                if reference.transl_table not in (None, '', '1'):
+                    qualifiers['transl_table'] = [reference.transl_table]
+                cds_features.append(SeqFeature(
+                    location(cds, strand), type='CDS', qualifiers=qualifiers))
+
+                ncbi.cache_transcript_protein_link(
+                    transcript.transcript_accession,
+                    int(transcript.transcript_version),
+                    transcript.protein_accession,
+                    int(transcript.protein_version))
+
+        biorecord.features.extend(cds_features)
+
+    # BioPython writes a mix of str and unicode.
+    handle = StringIO()
+    SeqIO.write(biorecord, handle, 'genbank')
+
+    # The region of the slice is part of the accession line, but BioPython
+    # only writes the primary accession.
+    raw_data = unicode(handle.getvalue()).replace(
+        'ACCESSION   %s\n' % reference.accession,
+        'ACCESSION   %s REGION: %s\n' % (reference.accession, region), 1)
+    return raw_data.encode('utf-8')
+
+
 def _bare_record(reference):
     record = Record()
     # Populating the record with the generic information.
@@ -237,10 +473,8 @@ def _get_mutalyzer_record(reference, db_transcripts):
                                             (db_transcript.protein_accession,
                                              db_transcript.protein_version)
             transcript['linkMethod'] = 'ncbi'
-        starts = map(int, db_transcript.exons_start.split(',')) \
-            if db_transcript.exons_start else None
-        stops = map(int, db_transcript.exons_stop.split(',')) \
-            if db_transcript.exons_stop else None
+        starts = _decode_positions(db_transcript.exons_start)
+        stops = _decode_positions(db_transcript.exons_stop)
         if (starts and stops) and (len(starts) == len(stops)):
             for start, stop in zip(starts, stops):
                 exon = {'start': start,
@@ -278,8 +512,8 @@ def _get_mutalyzer_record(reference, db_transcripts):
         else:
             transcript.exon.positionList = transcript.mRNA.location
 
+        transcript.exon.positionList = sorted(transcript.exon.positionList)
         transcript.mRNA.positionList = transcript.exon.positionList
-        transcript.mRNA.positionList.sort()
 
         if db_transcript.get('proteinID'):
             transcript.CDS = PList()
@@ -311,11 +545,10 @@ def _get_mutalyzer_record(reference, db_transcripts):
     record.geneList = list(gene_dict.values())
 
     # Get the sequence.
-    seq_path = settings.SEQ_PATH + reference.checksum_sequence + '.sequence'
     try:
-        seq = Seq(_get_sequence_mmap(seq_path, 1, reference.length + 1),
+        seq = Seq(_get_sequence(reference, 1, reference.length + 1),
                   generic_dna)
-    except IOError:
+    except (IOError, twobit.PackedSequenceError):
         return None
     else:
         record.seq = seq
@@ -474,6 +707,9 @@ def _get_transcripts(reference, position_start, position_end):
     Retrieves the transcripts information from the database for the provided
     reference that are between the provided start and end positions to which
     5000 is subtracted and added, respectively.
+
+    If `settings.NC_TRANSCRIPT_INDEX` is set, the transcripts are taken from
+    the resident transcript index of the reference instead of the database.
     :param reference:
     :param position_start:
     :param position_end:
@@ -489,6 +725,13 @@ def _get_transcripts(reference, position_start, position_end):
     else:
         p_e = reference.length
 
+    if settings.NC_TRANSCRIPT_INDEX:
+        index = _get_transcript_index(reference)
+        transcripts = index.overlapping(p_s, p_e)
+        if transcripts:
+            p_s, p_e = _boundaries(transcripts)
+        return index.overlapping(p_s, p_e)
+
     p_s, p_e = _get_db_boundaries_positions(reference, p_s, p_e)
 
     transcripts = Transcript.query.filter_by(reference_id=reference.id). \
@@ -504,6 +747,22 @@ def _get_transcripts(reference, position_start, position_end):
     return transcripts
 
 
+def _get_sequence(reference, start, end):
+    """
+    Sequence retrieval for a reference. The packed sequence file is used if
+    it exists, otherwise the plain sequence file.
+    :param reference: Database reference entry.
+    :param start: Start position.
+    :param end: End position
+    :return: The sequence.
+    """
+    seq_path = settings.SEQ_PATH + reference.checksum_sequence
+    if os.path.isfile(seq_path + twobit.EXTENSION):
+        return twobit.open_sequence(seq_path + twobit.EXTENSION).read(
+            start - 1, end)
+    return _get_sequence_mmap(seq_path + '.sequence', start, end)
+
+
 def _get_sequence_mmap(file_path, start, end):
     """
     Sequence retrieval.
@@ -516,3 +775,172 @@ def _get_sequence_mmap(file_path, start, end):
         # memory-map the file, size 0 means whole file
         mm = mmap.mmap(f.fileno(), 0)
         return mm[start - 1:end]
+
+
+def _local_store_available():
+    """
+    Check if the gbparser database and the sequence folder are configured.
+    :return: True if they are, False otherwise.
+    """
+    try:
+        return bool(settings.DATABASE_GB_URI) and \
+            os.path.isdir(settings.SEQ_PATH)
+    except AttributeError:
+        return False
+
+
+def _get_contained_transcripts(reference, position_start, position_end):
+    """
+    Retrieves the transcripts of the provided reference that are completely
+    between the provided start and end positions.
+    :param reference: Database reference entry.
+    :param position_start: Start position (inclusive).
+    :param position_end: End position (inclusive).
+    :return: List of transcripts.
+    """
+    if settings.NC_TRANSCRIPT_INDEX:
+        return [t for t in _get_transcript_index(reference).overlapping(
+                    position_start, position_end)
+                if t.transcript_start >= position_start and
+                t.transcript_stop <= position_end]
+
+    return Transcript.query.filter_by(reference_id=reference.id). \
+        filter((Transcript.transcript_start >= position_start) &
+               (Transcript.transcript_stop <= position_end)). \
+        order_by(Transcript.transcript_start, Transcript.id).all()
+
+
+def _decode_positions(positions):
+    """
+    Decode a list of exon positions as stored in the gbparser database.
+    :param positions: Comma separated positions, or an already decoded
+        integer array.
+    :return: List of positions or None if there are none.
+    """
+    if not positions:
+        return None
+    if isinstance(positions, basestring):
+        return map(int, positions.split(','))
+    return list(positions)
+
+
+def _reference_stamp(reference):
+    """
+    Values of a gbparser reference entry that change whenever the reference
+    is reloaded, used to detect stale transcript indexes.
+    :param reference: Database reference entry.
+    :return: Tuple identifying the current state of the reference.
+    """
+    return (reference.checksum_reference, reference.checksum_sequence,
+            reference.length, reference.date_added)
+
+
+class _TranscriptIndex(object):
+    """
+    Resident interval index over all transcripts of one gbparser reference.
+
+    Transcripts are sorted on their start position and their start and stop
+    positions are kept in integer arrays, together with the running maximum
+    of the stop positions. An overlap query finds the last transcript starting
+    before the end of the query range by bisection and walks back from there
+    until no earlier transcript can reach the start of the query range.
+    """
+    def __init__(self, reference):
+        """
+        Build the index from the database.
+        :param reference: Database reference entry.
+        """
+        self.stamp = _reference_stamp(reference)
+
+        columns = [getattr(Transcript, c) for c in _INDEXED_COLUMNS]
+        rows = Transcript.query.with_entities(*columns) \
+            .filter_by(reference_id=reference.id) \
+            .order_by(Transcript.transcript_start, Transcript.id) \
+            .all()
+
+        self.transcripts = []
+        self.starts = array('l')
+        self.stops = array('l')
+        self.max_stops = array('l')
+
+        for row in rows:
+            transcript = _IndexedTranscript(*row)._replace(
+                exons_start=array('l', _decode_positions(row.exons_start)
+                                  or []),
+                exons_stop=array('l', _decode_positions(row.exons_stop)
+                                 or []))
+            self.transcripts.append(transcript)
+            self.starts.append(transcript.transcript_start)
+            self.stops.append(transcript.transcript_stop)
+            if self.max_stops:
+                self.max_stops.append(max(self.max_stops[-1],
+                                          transcript.transcript_stop))
+            else:
+                self.max_stops.append(transcript.transcript_stop)
+
+    def overlapping(self, position_start, position_end):
+        """
+        Retrieves the transcripts overlapping the provided range.
+        :param position_start: Start position (inclusive).
+        :param position_end: End position (inclusive).
+        :return: List of transcripts ordered by their start position.
+        """
+        transcripts = []
+        i = bisect.bisect_right(self.starts, position_end)
+        while i > 0 and self.max_stops[i - 1] >= position_start:
+            i -= 1
+            if self.stops[i] >= position_start:
+                transcripts.append(self.transcripts[i])
+        transcripts.reverse()
+        return transcripts
+
+
+def _get_transcript_index(reference):
+    """
+    Retrieves the resident transcript index for the provided reference. The
+    index is built on first use and rebuilt if the reference entry changed
+    since.
+    :param reference: Database reference entry.
+    :return: The transcript index.
+    """
+    index = _transcript_indexes.get(reference.id)
+    if index is not None and index.stamp == _reference_stamp(reference):
+        return index
+
+    with _transcript_indexes_lock:
+        index = _transcript_indexes.get(reference.id)
+        if index is None or index.stamp != _reference_stamp(reference):
+            index = _TranscriptIndex(reference)
+            _transcript_indexes[reference.id] = index
+    return index
+
+
+def _clear_transcript_indexes(*args):
+    """
+    Drop all resident transcript indexes.
+    """
+    with _transcript_indexes_lock:
+        _transcript_indexes.clear()
+
+
+def _invalidate_transcript_index(mapper, connection, target):
+    """
+    Drop the resident transcript index for a reference of which the entry or
+    one of its transcripts is changed.
+    """
+    if isinstance(target, Reference):
+        reference_id = target.id
+    else:
+        reference_id = target.reference_id
+    with _transcript_indexes_lock:
+        _transcript_indexes.pop(reference_id, None)
+
+
+# Changes made in this process are picked up by these events, changes by
+# other processes are detected by the reference stamp.
+for _model in (Reference, Transcript):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _invalidate_transcript_index)
+
+# Indexes of another database are of no use.
+settings.on_update(_clear_transcript_indexes, 'DATABASE_GB_URI')
@@ -335,6 +335,98 @@ def protein_to_transcript(protein_accession, protein_version=None,
         match_version=match_version)
 
 
+def cache_transcript_protein_link(transcript_accession, transcript_version,
+                                  protein_accession, protein_version):
+    """
+    Store a transcript-protein link that is known from another source than
+    the NCBI (e.g., the gbparser database) in the cache.
+
+    :arg str transcript_accession: Accession number of the transcript
+      (without version number).
+    :arg int transcript_version: Transcript version number.
+    :arg str protein_accession: Accession number of the protein (without
+      version number).
+    :arg int protein_version: Protein version number.
+    """
+    _cache_link(
+        'ncbi:transcript-to-protein:%s', 'ncbi:protein-to-transcript:%s',
+        transcript_accession, protein_accession,
+        source_version=transcript_version, target_version=protein_version)
+
+
+def _get_accession_version_from_ncbi(accession):
+    """
+    Retrieve the current version of an accession number from the NCBI.
+
+    :arg str accession: Accession number (without version number).
+
+    :returns: Accession number with current version number, or `None` if it
+      could not be retrieved.
+    :rtype: str
+    """
+    Entrez.email = settings.EMAIL
+
+    try:
+        handle = Entrez.esummary(db='nucleotide', id=accession)
+    except (IOError, httplib.HTTPException):
+        # TODO: Log error.
+        return None
+
+    try:
+        result = Entrez.read(handle)
+    except (Entrez.Parser.ValidationError, RuntimeError):
+        # TODO: Log error.
+        return None
+    finally:
+        handle.close()
+
+    try:
+        accession_version = unicode(result[0]['AccessionVersion'])
+    except (IndexError, KeyError):
+        return None
+
+    if accession_version.split('.')[0] != accession:
+        return None
+    return accession_version
+
+
+def get_accession_version(accession):
+    """
+    Get the current version of an accession number.
+
+    Versions are retrieved from the NCBI with an esummary query, which is
+    much cheaper than downloading the record. They are cached for
+    `ACCESSION_VERSION_CACHE_EXPIRATION` seconds, so new versions at the NCBI
+    are picked up eventually.
+
+    :arg str accession: Accession number (without version number).
+
+    :returns: Accession number with current version number, or `None` if it
+      could not be retrieved.
+    :rtype: str
+    """
+    accession_version = redis.get('ncbi:accession-version:%s' % accession)
+    if accession_version is not None:
+        return accession_version
+
+    accession_version = _get_accession_version_from_ncbi(accession)
+    if accession_version is not None:
+        cache_accession_version(accession, accession_version)
+    return accession_version
+
+
+def cache_accession_version(accession, accession_version):
+    """
+    Store the current version of an accession number in the cache, for example
+    after downloading the record.
+
+    :arg str accession: Accession number (without version number).
+    :arg str accession_version: Accession number with current version number.
+    """
+    redis.setex('ncbi:accession-version:%s' % accession,
+                settings.ACCESSION_VERSION_CACHE_EXPIRATION, accession_version)
+
+
 def _get_snp_from_ncbi(rsid):
     """
     Connects to the Entrez DB to fetch the annotated SNP records.
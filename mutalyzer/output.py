@@ -38,6 +38,7 @@ class Output() :
 
     Private variables:
         - _outputdata ; The output dictionary.
+        - _lazyOutput ; Names of nodes with data that is not computed yet.
         - _messages   ; The messages list.
         - _instance   ; The name of the module that made this object.
         - _loghandle  ; The handle of the log file.
@@ -54,6 +55,9 @@ class Output() :
         - getMessages()           ; Print all messages that exceed the
                                     configured output level.
         - addOutput(name, data)   ; Add output to the output dictionary.
+        - addLazyOutput(name, function) ; Add output to the output
+                                          dictionary that is computed when
+                                          it is retrieved.
         - getOutput(name)         ; Retrieve data from the output dictionary.
         - Summary()               ; Print a summary of the number of errors
                                     and warnings.
@@ -65,6 +69,7 @@ class Output() :
 
         Private variables (altered):
             - _outputdata ; The output dictionary.
+            - _lazyOutput ; Initialised as an empty set.
             - _messages   ; The messages list.
             - _instance   ; Initialised with the name of the module that
                              created this object.
@@ -77,6 +82,7 @@ class Output() :
         @type instance: unicode
         """
         self._outputData = {}
+        self._lazyOutput = set()
         self._messages = []
         self._instance = util.nice_filename(instance)
         self._loghandle = io.open(settings.LOG_FILE, mode='a+',
@@ -208,6 +214,59 @@ class Output() :
             self._outputData[name] = [data]
     #addOutput
 
+    def addLazyOutput(self, name, function, multiple=False) :
+        """
+        Like addOutput, but the data is computed by calling {function} only
+        when the node is retrieved with getOutput or getIndexedOutput. Use
+        this for data that is large or costly to compute and often not used.
+
+        Private variables:
+            - _outputData ; The output dictionary.
+            - _lazyOutput ; Names of nodes with data that is not computed
+                            yet.
+
+        @arg name: Name of a node in the output dictionary
+        @type name: unicode
+        @arg function: Function without arguments computing the data to be
+            stored at this node
+        @type function: callable
+        @kwarg multiple: Whether {function} computes a list of data to be
+            stored at this node instead of one item.
+        @type multiple: bool
+        """
+        self.addOutput(name, _LazyData(function, multiple))
+        self._lazyOutput.add(name)
+    #addLazyOutput
+
+    def _computeOutput(self, name) :
+        """
+        Compute the data added with addLazyOutput for a node in the output
+        dictionary.
+
+        Private variables:
+            - _outputData ; The output dictionary.
+            - _lazyOutput ; Names of nodes with data that is not computed
+                            yet.
+
+        @arg name: Name of a node in the output dictionary
+        @type name: unicode
+        """
+        if name not in self._lazyOutput :
+            return
+        self._lazyOutput.remove(name)
+
+        data = []
+        for item in self._outputData[name] :
+            if isinstance(item, _LazyData) :
+                if item.multiple :
+                    data.extend(item.function())
+                else :
+                    data.append(item.function())
+            else :
+                data.append(item)
+        self._outputData[name] = data
+    #_computeOutput
+
     def getOutput(self, name) :
         """
         Return a list of data from the output dictionary.
@@ -222,6 +281,7 @@ class Output() :
         @rtype: dictionary
         """
         if self._outputData.has_key(name) :
+            self._computeOutput(name)
             return self._outputData[name]
         return []
     #getOutput
@@ -244,6 +304,7 @@ class Output() :
         @rtype: any type
         """
         if self._outputData.has_key(name) :
+            self._computeOutput(name)
             if 0 <= index < len(self._outputData[name]) :
                 return self._outputData[name][index]
         return default
@@ -276,6 +337,17 @@ class Output() :
     #Summary
 #Output
 
+class _LazyData(object) :
+    """
+    Container for data in the output dictionary that is not computed yet.
+    """
+    def __init__(self, function, multiple) :
+        self.function = function
+        self.multiple = multiple
+    #__init__
+#_LazyData
+
+
 class Message() :
     """
     Container class for message variables.
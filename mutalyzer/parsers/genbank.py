@@ -597,7 +597,7 @@ class GBparser():
                             myTranscript.proteinProduct = i.link.product
                             if i.link.qualifiers.has_key("transl_table") :
                                 myTranscript.txTable = \
-                                    int(i.qualifiers["transl_table"][0])
+                                    int(i.link.qualifiers["transl_table"][0])
                         #if
                         myRealGene.transcriptList.append(myTranscript)
                     #if
@@ -142,7 +142,7 @@ def _get_transcripts(section):
             coordinates = _get_coordinates(exon, lrg_id)
             exonPList.positionList.extend([int(coordinates["start"]),
                                            int(coordinates["end"])])
-        exonPList.positionList.sort()
+        exonPList.positionList = sorted(exonPList.positionList)
 
         # Get the CDS of the transcript and store them in a position list.
         # NOTE: up until now all CDSlists only consisted of a starting end
@@ -162,7 +162,7 @@ def _get_transcripts(section):
             coordinates = _get_coordinates(CDS, lrg_id)
             CDSPList.positionList.extend([int(coordinates["start"]),
                                           int(coordinates["end"])])
-        CDSPList.positionList.sort()
+        CDSPList.positionList = sorted(CDSPList.positionList)
 
         # If there is a CDS position List set the transcriptflag to True
         if CDSPList.positionList:
@@ -40,7 +40,7 @@ from mutalyzer import announce
 from mutalyzer import ncbi
 from mutalyzer import stats
 from mutalyzer import variantchecker
-from mutalyzer.mapping import Converter
+from mutalyzer.mapping import Converter, get_transcript_mappings
 from mutalyzer import File
 from mutalyzer import Retriever
 from mutalyzer import GenRecord
@@ -251,18 +251,7 @@ class MutalyzerService(ServiceBase):
                             "chromosome name." % chrom)
 
         pos = max(min(pos, binning.MAX_POSITION + 1), 1)
-        bins = binning.overlapping_bins(pos - 1, pos)
-        mappings = chromosome.transcript_mappings.filter(
-            TranscriptMapping.bin.in_(bins),
-            TranscriptMapping.start <= pos,
-            TranscriptMapping.stop >= pos
-        ).order_by(
-            TranscriptMapping.start,
-            TranscriptMapping.stop,
-            TranscriptMapping.gene,
-            TranscriptMapping.accession,
-            TranscriptMapping.version,
-            TranscriptMapping.transcript)
+        mappings = get_transcript_mappings(chromosome, pos, pos)
 
         L.addMessage(__file__, -1, "INFO",
                      "Finished processing getTranscripts(%s %s %s %s)"
@@ -362,24 +351,8 @@ class MutalyzerService(ServiceBase):
             raise Fault("EARG", "The chrom argument (%s) was not a valid " \
                             "chromosome name." % chrom)
 
-        if method:
-            bins = binning.overlapping_bins(pos1 - 1, pos2)
-            range_filter = (TranscriptMapping.bin.in_(bins),
-                            TranscriptMapping.start <= pos2,
-                            TranscriptMapping.stop >= pos1)
-        else:
-            bins = binning.contained_bins(pos1 - 1, pos2)
-            range_filter = (TranscriptMapping.bin.in_(bins),
-                            TranscriptMapping.start >= pos1,
-                            TranscriptMapping.stop <= pos2)
-
-        mappings = chromosome.transcript_mappings.filter(*range_filter).order_by(
-            TranscriptMapping.start,
-            TranscriptMapping.stop,
-            TranscriptMapping.gene,
-            TranscriptMapping.accession,
-            TranscriptMapping.version,
-            TranscriptMapping.transcript)
+        mappings = get_transcript_mappings(chromosome, pos1, pos2,
+                                           contained=not method)
 
         L.addMessage(__file__, -1, "INFO",
             "Finished processing getTranscriptsRange(%s %s %s %s %s)" % (
@@ -459,24 +432,8 @@ class MutalyzerService(ServiceBase):
             raise Fault("EARG", "The chrom argument (%s) was not a valid " \
                             "chromosome name." % chrom)
 
-        if method:
-            bins = binning.overlapping_bins(pos1 - 1, pos2)
-            range_filter = (TranscriptMapping.bin.in_(bins),
-                            TranscriptMapping.start <= pos2,
-                            TranscriptMapping.stop >= pos1)
-        else:
-            bins = binning.contained_bins(pos1 - 1, pos2)
-            range_filter = (TranscriptMapping.bin.in_(bins),
-                            TranscriptMapping.start >= pos1,
-                            TranscriptMapping.stop <= pos2)
-
-        mappings = chromosome.transcript_mappings.filter(*range_filter).order_by(
-            TranscriptMapping.start,
-            TranscriptMapping.stop,
-            TranscriptMapping.gene,
-            TranscriptMapping.accession,
-            TranscriptMapping.version,
-            TranscriptMapping.transcript)
+        mappings = get_transcript_mappings(chromosome, pos1, pos2,
+                                           contained=not method)
 
         transcripts = []
 
@@ -828,6 +785,78 @@ class MutalyzerService(ServiceBase):
         return result
     #numberConversion
 
+    @srpc(Mandatory.Unicode, Array(Mandatory.Unicode), Unicode,
+          _returns=Array(NumberConversionOutput))
+    def numberConversionBatch(build, variants, gene=None):
+        """
+        Converts a list of variants from I{c.} to I{g.} notation or vice
+        versa.
+
+        Variants are converted as in numberConversion, but grouped by
+        transcript or chromosome such that large lists of variants are
+        converted much faster. The number of variants is limited by the
+        NUMBER_CONVERSION_BATCH_MAX_VARIANTS setting.
+
+        @arg build: The genome build (hg19, hg18, mm10).
+        @type build: string
+        @arg variants: The variants in either I{c.} or I{g.} notation, full
+            HGVS notation, including NM_, NC_, or LRG_ accession number.
+        @type variants: list
+        @kwarg gene: Optional gene name. If given, return variant descriptions
+            on all transcripts for this gene.
+        @type gene: string
+
+        @return: For every variant, in the order given, an object with
+            fields:
+            - variant: The variant.
+            - conversions: The variant(s) in either I{g.} or I{c.} notation.
+            - messages: List of (error) messages.
+        @rtype: list
+        """
+        variants = variants or []
+
+        O = Output(__file__)
+        O.addMessage(__file__, -1, "INFO",
+            "Received request numberConversionBatch(%s %d variants)"
+            % (build, len(variants)))
+
+        stats.increment_counter('position-converter/webservice')
+
+        if len(variants) > settings.NUMBER_CONVERSION_BATCH_MAX_VARIANTS:
+            raise Fault('EMAXSIZE',
+                        'Only up to %d variants are accepted.'
+                        % settings.NUMBER_CONVERSION_BATCH_MAX_VARIANTS)
+
+        try:
+            assembly = Assembly.by_name_or_alias(build)
+        except NoResultFound:
+            O.addMessage(__file__, 4, "EARG", "EARG %s" % build)
+            raise Fault("EARG",
+                        "The build argument (%s) was not a valid " \
+                            "build name." % build)
+
+        converter = Converter(assembly, O)
+
+        result = []
+        for variant, (conversions, messages) in zip(
+                variants, converter.convert_many(variants, gene=gene)):
+            output = NumberConversionOutput()
+            output.variant = variant
+            output.conversions = conversions
+            output.messages = []
+            for message in messages:
+                soap_message = SoapMessage()
+                soap_message.errorcode = message.code
+                soap_message.message = message.description
+                output.messages.append(soap_message)
+            result.append(output)
+
+        O.addMessage(__file__, -1, "INFO",
+            "Finished processing numberConversionBatch(%s %d variants)"
+            % (build, len(variants)))
+        return result
+    #numberConversionBatch
+
     @srpc(Mandatory.Unicode, _returns=CheckSyntaxOutput)
     def checkSyntax(variant):
         """
@@ -1219,6 +1248,8 @@ class MutalyzerService(ServiceBase):
             O.addOutput('add_original_sequence_to_output', 'not')
         if not check_param(extras, 'mutated'):
             O.addOutput('add_mutated_sequence_to_output', 'not')
+        # The restriction site analysis is not part of the response.
+        O.addOutput('add_restriction_sites_to_output', 'not')
         variantchecker.check_variant(variant, O)
 
         result = MutalyzerOutput()
@@ -0,0 +1,309 @@
+"""
+Packed storage for chromosome sequences at two bits per base.
+
+The format is modelled after the UCSC 2bit format, but holds exactly one
+sequence per file, such that it can be used as a drop-in replacement for the
+plain `.sequence` files in `settings.SEQ_PATH` (which are named by their
+checksum). All integers are stored unsigned 32-bit little-endian.
+
+    header      magic, version, sequence length, number of ambiguous runs,
+                number of mask runs, offset of the ambiguous runs table,
+                offset of the mask runs table, offset of the packed bases
+    ambiguous   run starts, run lengths, run characters (one byte each)
+    mask        run starts, run lengths
+    bases       packed bases, four per byte, first base in the high bits
+
+Bases are packed as T=0, C=1, A=2 and G=3. Stretches of any other character
+(typically N, but also IUPAC ambiguity codes) are stored as runs of T in the
+packed bases and listed in the ambiguous runs table. Stretches of lowercase
+characters are listed in the mask runs table.
+
+Reading a window of the sequence only touches the packed bases of that
+window, so it is done in time linear in the window length.
+"""
+
+
+from __future__ import unicode_literals
+
+import mmap
+import os
+import struct
+import threading
+
+import numpy
+
+
+#: Extension for packed sequence files.
+EXTENSION = '.2bit'
+
+_MAGIC = b'M2BT'
+_VERSION = 1
+_HEADER = struct.Struct(b'<4sIIIIIII')
+
+_BASES = b'TCAG'
+
+# Lookup table from (uppercase) character to base code, 255 for characters
+# that cannot be packed.
+_ENCODE = numpy.full(256, 255, dtype=numpy.uint8)
+for _code, _base in enumerate(bytearray(_BASES)):
+    _ENCODE[_base] = _code
+
+# Lookup table from packed byte to the four characters it encodes, viewed as
+# one 32-bit integer per byte for fast indexing.
+_DECODE = numpy.array([[bytearray(_BASES)[(byte >> shift) & 3]
+                        for shift in (6, 4, 2, 0)]
+                       for byte in range(256)],
+                      dtype=numpy.uint8).view(numpy.uint32).ravel()
+
+# Runs overlapping a window are applied one by one up to this number, above
+# it they are applied at once.
+_MAX_RUNS_ONE_BY_ONE = 64
+
+# Open packed sequence files by path, see `open_sequence`.
+_open_sequences = {}
+_open_sequences_lock = threading.Lock()
+
+
+class PackedSequenceError(Exception):
+    """
+    Raised when a file is not a valid packed sequence file.
+    """
+    pass
+
+
+def _runs(flags, values=None):
+    """
+    Find runs of set flags.
+
+    :arg numpy.ndarray flags: Boolean array.
+    :arg numpy.ndarray values: If given, runs are also split where the value
+      changes.
+
+    :returns: Tuple of run starts and run lengths.
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    first = flags.copy()
+    first[1:] &= ~flags[:-1]
+    last = flags.copy()
+    last[:-1] &= ~flags[1:]
+
+    if values is not None and len(values) > 1:
+        changes = values[1:] != values[:-1]
+        first[1:] |= flags[1:] & changes
+        last[:-1] |= flags[:-1] & changes
+
+    starts = numpy.flatnonzero(first)
+    stops = numpy.flatnonzero(last) + 1
+    return starts, stops - starts
+
+
+def pack(sequence, handle):
+    """
+    Write a sequence in packed format.
+
+    :arg bytes sequence: The sequence (ASCII).
+    :arg file handle: Writable binary file handle.
+    """
+    characters = numpy.frombuffer(sequence, dtype=numpy.uint8)
+    upper = numpy.frombuffer(sequence.upper(), dtype=numpy.uint8)
+
+    codes = _ENCODE[upper]
+    ambiguous = codes == 255
+    codes[ambiguous] = 0
+
+    ambiguous_starts, ambiguous_lengths = _runs(ambiguous, upper)
+    ambiguous_characters = upper[ambiguous_starts]
+    mask_starts, mask_lengths = _runs(characters != upper)
+
+    padding = -len(codes) % 4
+    if padding:
+        codes = numpy.concatenate((codes, numpy.zeros(padding, numpy.uint8)))
+    codes = codes.reshape(-1, 4)
+    packed = (codes[:, 0] << 6) | (codes[:, 1] << 4) | (codes[:, 2] << 2) | \
+        codes[:, 3]
+
+    ambiguous_offset = _HEADER.size
+    mask_offset = ambiguous_offset + 9 * len(ambiguous_starts)
+    mask_offset += -mask_offset % 4
+    bases_offset = mask_offset + 8 * len(mask_starts)
+
+    handle.write(_HEADER.pack(_MAGIC, _VERSION, len(sequence),
+                              len(ambiguous_starts), len(mask_starts),
+                              ambiguous_offset, mask_offset, bases_offset))
+    handle.write(ambiguous_starts.astype('<u4').tostring())
+    handle.write(ambiguous_lengths.astype('<u4').tostring())
+    handle.write(ambiguous_characters.tostring())
+    handle.write(b'\0' * (mask_offset - ambiguous_offset -
+                          9 * len(ambiguous_starts)))
+    handle.write(mask_starts.astype('<u4').tostring())
+    handle.write(mask_lengths.astype('<u4').tostring())
+    handle.write(packed.tostring())
+
+
+def convert(source_path, target_path):
+    """
+    Convert a plain sequence file to a packed sequence file.
+
+    The packed file is read back and compared to the original before it is
+    moved into place.
+
+    :arg unicode source_path: Path to the plain sequence file.
+    :arg unicode target_path: Path to the packed sequence file to create.
+    """
+    temporary_path = target_path + '.tmp'
+
+    with open(source_path, 'rb') as source:
+        sequence = source.read().rstrip(b'\r\n')
+
+    with open(temporary_path, 'wb') as target:
+        pack(sequence, target)
+
+    packed_sequence = PackedSequence(temporary_path)
+    try:
+        if packed_sequence.read(0, packed_sequence.length) != sequence:
+            raise PackedSequenceError('Packed sequence does not match the '
+                                      'original: %s' % source_path)
+    except PackedSequenceError:
+        os.remove(temporary_path)
+        raise
+    finally:
+        packed_sequence.close()
+
+    os.rename(temporary_path, target_path)
+
+
+class PackedSequence(object):
+    """
+    Random access reader for a packed sequence file.
+    """
+    def __init__(self, path):
+        """
+        Open a packed sequence file.
+
+        :arg unicode path: Path to the packed sequence file.
+        """
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _HEADER.size:
+            raise PackedSequenceError('Not a packed sequence file: %s' % path)
+
+        (magic, version, self.length, ambiguous_count, mask_count,
+         ambiguous_offset, mask_offset,
+         self._bases_offset) = _HEADER.unpack_from(self._mmap)
+
+        if magic != _MAGIC or version != _VERSION:
+            raise PackedSequenceError('Not a packed sequence file: %s' % path)
+
+        def table(dtype, count, offset):
+            return numpy.frombuffer(self._mmap, dtype, count, offset)
+
+        self._ambiguous_starts = table('<u4', ambiguous_count,
+                                       ambiguous_offset)
+        self._ambiguous_stops = self._ambiguous_starts + table(
+            '<u4', ambiguous_count, ambiguous_offset + 4 * ambiguous_count)
+        self._ambiguous_characters = table(
+            numpy.uint8, ambiguous_count,
+            ambiguous_offset + 8 * ambiguous_count)
+
+        self._mask_starts = table('<u4', mask_count, mask_offset)
+        self._mask_stops = self._mask_starts + table(
+            '<u4', mask_count, mask_offset + 4 * mask_count)
+
+    def close(self):
+        """
+        Close the underlying file.
+        """
+        self._mmap.close()
+
+    def _window_runs(self, starts, stops, start, stop):
+        """
+        Find the runs overlapping a window.
+
+        :returns: Tuple of the index range of the runs and their start and
+          stop positions relative to the window.
+        :rtype: tuple(slice, numpy.ndarray, numpy.ndarray)
+        """
+        runs = slice(numpy.searchsorted(stops, start, 'right'),
+                     numpy.searchsorted(starts, stop, 'left'))
+        run_starts = numpy.maximum(starts[runs].astype(numpy.int64), start)
+        run_stops = numpy.minimum(stops[runs].astype(numpy.int64), stop)
+        return runs, run_starts - start, run_stops - start
+
+    def _covered(self, run_starts, run_stops, length):
+        """
+        Flag the positions in a window covered by runs.
+
+        :returns: Boolean array of the window length.
+        :rtype: numpy.ndarray
+        """
+        flags = numpy.zeros(length + 1, dtype=numpy.int8)
+        flags[run_starts] = 1
+        flags[run_stops] -= 1
+        return numpy.cumsum(flags[:-1], dtype=numpy.int8) > 0
+
+    def read(self, start, stop):
+        """
+        Read a window of the sequence.
+
+        :arg int start: Start of the window (zero-based, inclusive).
+        :arg int stop: End of the window (zero-based, exclusive).
+
+        :returns: The sequence in the window (ASCII).
+        :rtype: bytes
+        """
+        start = max(0, start)
+        stop = min(self.length, stop)
+        if start >= stop:
+            return b''
+
+        first = start // 4
+        packed = numpy.frombuffer(self._mmap, numpy.uint8,
+                                  (stop + 3) // 4 - first,
+                                  self._bases_offset + first)
+        offset = 4 * first
+        window = _DECODE[packed].view(numpy.uint8)[start - offset:
+                                                   stop - offset]
+
+        # A few runs are applied one by one, many runs at once.
+        runs, run_starts, run_stops = self._window_runs(
+            self._ambiguous_starts, self._ambiguous_stops, start, stop)
+        characters = self._ambiguous_characters[runs]
+        if len(characters) > _MAX_RUNS_ONE_BY_ONE:
+            window[self._covered(run_starts, run_stops, len(window))] = \
+                numpy.repeat(characters, run_stops - run_starts)
+        else:
+            for run_start, run_stop, character in zip(run_starts, run_stops,
+                                                      characters):
+                window[run_start:run_stop] = character
+
+        runs, run_starts, run_stops = self._window_runs(
+            self._mask_starts, self._mask_stops, start, stop)
+        if len(run_starts) > _MAX_RUNS_ONE_BY_ONE:
+            window[self._covered(run_starts, run_stops, len(window))] |= 0x20
+        else:
+            for run_start, run_stop in zip(run_starts, run_stops):
+                window[run_start:run_stop] |= 0x20
+
+        return window.tostring()
+
+
+def open_sequence(path):
+    """
+    Get a reader for a packed sequence file. Readers are kept open for the
+    lifetime of the process, which is safe because sequence files are named
+    by their checksum and never change.
+
+    :arg unicode path: Path to the packed sequence file.
+
+    :returns: Reader for the packed sequence file.
+    :rtype: PackedSequence
+    """
+    packed_sequence = _open_sequences.get(path)
+    if packed_sequence is None:
+        with _open_sequences_lock:
+            packed_sequence = _open_sequences.get(path)
+            if packed_sequence is None:
+                packed_sequence = PackedSequence(path)
+                _open_sequences[path] = packed_sequence
+    return packed_sequence
@@ -21,16 +21,21 @@ General utility functions.
 
 from __future__ import unicode_literals
 
+from collections import OrderedDict
 from functools import wraps
 import inspect
 from itertools import izip_longest
 import math
 import operator
+import string
 import sys
+import threading
 import time
 
 from Bio import Seq
 from Bio import SeqIO
+from Bio.Data import CodonTable
+from Bio.Data.IUPACData import ambiguous_dna_complement
 from Bio.SeqUtils import seq3
 
 # NOTE: This is a temporary fix.
@@ -48,6 +53,134 @@ def reverse_complement(sequence):
     return unicode(Seq.reverse_complement(str(sequence)))
 
 
+# Translation table for complementing byte strings, including ambiguous and
+# lowercase nucleotides.
+_COMPLEMENT = string.maketrans(
+    b''.join(str(base) + str(base).lower()
+             for base in ambiguous_dna_complement),
+    b''.join(str(base) + str(base).lower()
+             for base in ambiguous_dna_complement.values()))
+
+# Codon to amino acid lookup tables by translation table id, see
+# `_codon_table`.
+_codon_tables = {}
+
+
+def sequence_bytes(sequence):
+    """
+    Get a sequence as a byte string.
+
+    For a Bio.Seq.Seq object, this is the underlying string (no copy is
+    made).
+
+    @arg sequence: A DNA sequence.
+    @type sequence: Bio.Seq.Seq, unicode or str
+
+    @return: The sequence.
+    @rtype: str
+    """
+    if isinstance(sequence, unicode):
+        return sequence.encode('ascii')
+    return str(sequence)
+
+
+def reverse_complement_bytes(sequence):
+    """
+    Reverse complement of a sequence represented as byte string.
+
+        >>> reverse_complement_bytes(b'ATGCn')
+        'nGCAT'
+
+    @arg sequence: A DNA sequence.
+    @type sequence: str
+
+    @return: The reverse complement.
+    @rtype: str
+    """
+    return sequence.translate(_COMPLEMENT)[::-1]
+
+
+def _codon_table(table):
+    """
+    Get the codon to amino acid lookup table and the start codons for a
+    translation table.
+
+    The lookup table only contains unambiguous codons initially, other codons
+    are added by `_translate_codon` when they are seen.
+    """
+    try:
+        return _codon_tables[table]
+    except KeyError:
+        codon_table = CodonTable.unambiguous_dna_by_id[table]
+        codons = dict((str(codon), str(amino_acid)) for codon, amino_acid
+                      in codon_table.forward_table.items())
+        codons.update((str(codon), b'*')
+                      for codon in codon_table.stop_codons)
+        start_codons = set(str(codon) for codon in CodonTable.
+                           ambiguous_generic_by_id[table].start_codons)
+        _codon_tables[table] = codons, start_codons
+        return codons, start_codons
+
+
+def _translate_codon(codons, codon, table):
+    """
+    Translate an ambiguous (or otherwise unknown) codon and add it to the
+    lookup table.
+    """
+    amino_acid = codons[codon] = str(Seq.translate(codon, table=table))
+    return amino_acid
+
+
+def translate_bytes(sequence, table=1, cds=False):
+    """
+    Translate a DNA sequence represented as byte string. This gives the same
+    result as translating a Bio.Seq.Seq object, but without the overhead.
+
+        >>> translate_bytes(b'ATGGCCTAAGG')
+        'MA*'
+        >>> translate_bytes(b'TTGGCCTAA', cds=True)
+        'MA'
+
+    @arg sequence: A DNA sequence. A trailing partial codon is ignored.
+    @type sequence: str
+    @kwarg table: Translation table id.
+    @type table: int
+    @kwarg cds: Check that the sequence is a complete CDS, translate its
+        start codon to M and remove the stop codon.
+    @type cds: bool
+
+    @return: The protein sequence.
+    @rtype: str
+
+    @raise CodonTable.TranslationError: If `cds` is True and the sequence is
+        not a complete CDS.
+    """
+    codons, start_codons = _codon_table(table)
+    sequence = sequence.upper()
+
+    if cds:
+        if len(sequence) % 3:
+            raise CodonTable.TranslationError(
+                'Sequence length %i is not a multiple of three'
+                % len(sequence))
+        if sequence[:3] not in start_codons:
+            raise CodonTable.TranslationError(
+                'First codon %r is not a start codon' % sequence[:3])
+        if translate_bytes(sequence[-3:], table) != b'*':
+            raise CodonTable.TranslationError(
+                'Final codon %r is not a stop codon' % sequence[-3:])
+        protein = translate_bytes(sequence[3:-3], table)
+        if b'*' in protein:
+            raise CodonTable.TranslationError(
+                'Extra in frame stop codon found.')
+        return b'M' + protein
+
+    return b''.join([codons[codon] if codon in codons
+                     else _translate_codon(codons, codon, table)
+                     for codon in (sequence[i:i + 3] for i in
+                                   xrange(0, len(sequence) - 2, 3))])
+
+
 def is_utf8_alias(encoding):
     """
     Returns `True` if the given encoding is recognized as UTF-8.
@@ -129,6 +262,25 @@ def over_splice_site(first, last, splice_sites):
 #over_splice_site
 
 
+def _sequence_data(s):
+    """
+    The string underlying a sequence, such that it can be sliced without
+    creating new Bio.Seq.Seq objects.
+    """
+    if isinstance(s, Seq.Seq):
+        return str(s)
+    return s
+
+
+def _like(s, data):
+    """
+    A sequence of the same type as {s} with content {data}.
+    """
+    if isinstance(s, Seq.Seq):
+        return s.__class__(data, s.alphabet)
+    return data
+
+
 def splice(s, splice_sites):
     """
     Construct the transcript or the coding sequence from a record and a list
@@ -148,12 +300,9 @@ def splice(s, splice_sites):
 
     @todo: Assert length of splice_sites is even.
     """
-    transcript = s[:0]
-
-    for acceptor, donor in grouper(splice_sites):
-        transcript += s[acceptor - 1:donor]
-
-    return transcript
+    data = _sequence_data(s)
+    return _like(s, data[:0].join([data[acceptor - 1:donor] for
+                                   acceptor, donor in grouper(splice_sites)]))
 #splice
 
 
@@ -169,29 +318,30 @@ def __nsplice(string, splice_sites, CDS, orientation) :
     @todo: documentation
     """
 
-    transcript = string[:0]
+    data = _sequence_data(string)
+    transcript = []
     if orientation == 1 :
         for i in range(0, len(splice_sites), 2) :
             if CDS[0] >= splice_sites[i] and CDS[0] <= splice_sites[i + 1] :
-                transcript += string[CDS[0] - 1:splice_sites[i + 1]]
+                transcript.append(data[CDS[0] - 1:splice_sites[i + 1]])
             else :
                 if splice_sites[i] > CDS[0] :
-                    transcript += \
-                        string[splice_sites[i] - 1:splice_sites[i + 1]]
+                    transcript.append(
+                        data[splice_sites[i] - 1:splice_sites[i + 1]])
         #for
     #if
     else :
         for i in range(0, len(splice_sites), 2) :
             if CDS[1] >= splice_sites[i] and CDS[1] <= splice_sites[i + 1] :
-                transcript += string[splice_sites[i] - 1:CDS[1]]
+                transcript.append(data[splice_sites[i] - 1:CDS[1]])
             else :
                 if splice_sites[i] < CDS[1] :
-                    transcript += \
-                        string[splice_sites[i] - 1:splice_sites[i + 1]]
+                    transcript.append(
+                        data[splice_sites[i] - 1:splice_sites[i + 1]])
         #for
     #else
 
-    return transcript
+    return _like(string, data[:0].join(transcript))
 #__nsplice
 
 
@@ -264,6 +414,119 @@ def roll_(s, start, end) :
 #roll
 
 
+# Number of characters compared in the first block by common_prefix_length
+# and common_suffix_length. Blocks double in size as long as they are equal.
+COMMON_BLOCK_SIZE = 16
+
+
+def common_prefix_length(s1, s2):
+    """
+    Calculate the length of the longest common prefix of two strings.
+
+        >>> common_prefix_length('abcdefg', 'abcabcdefg')
+        3
+        >>> common_prefix_length('abcdefg', 'abcdefg')
+        7
+
+    Rather than comparing one character at a time, the strings are compared
+    in blocks of doubling size. The first unequal block is then narrowed
+    down by bisection.
+
+    @arg s1: The first string.
+    @type s1: unicode
+    @arg s2: The second string.
+    @type s2: unicode
+
+    @return: The length of the longest common prefix of s1 and s2.
+    @rtype: int
+    """
+    length = min(len(s1), len(s2))
+    block = COMMON_BLOCK_SIZE
+    start = 0
+
+    # Invariant: s1[:start] == s2[:start].
+    while True:
+        end = min(start + block, length)
+        if s1[start:end] != s2[start:end]:
+            break
+        if end == length:
+            return length
+        start = end
+        block *= 2
+
+    # There is a difference in s1[start:end].
+    while end - start > COMMON_BLOCK_SIZE:
+        middle = (start + end) // 2
+        if s1[start:middle] == s2[start:middle]:
+            start = middle
+        else:
+            end = middle
+
+    while s1[start] == s2[start]:
+        start += 1
+
+    return start
+#common_prefix_length
+
+
+def common_suffix_length(s1, s2, limit=None):
+    """
+    Calculate the length of the longest common suffix of two strings. See
+    common_prefix_length.
+
+        >>> common_suffix_length('abcdefg', 'abcabcdefg')
+        7
+        >>> common_suffix_length('abcdefg', 'abcefg')
+        3
+        >>> common_suffix_length('abcdefg', 'abcabcdefg', limit=4)
+        4
+
+    @arg s1: The first string.
+    @type s1: unicode
+    @arg s2: The second string.
+    @type s2: unicode
+    @kwarg limit: Maximum length of the common suffix.
+    @type limit: int
+
+    @return: The length of the longest common suffix of s1 and s2.
+    @rtype: int
+    """
+    length = min(len(s1), len(s2))
+    if limit is not None:
+        length = min(length, limit)
+    block = COMMON_BLOCK_SIZE
+    start = 0
+
+    # We work with offsets from the ends of the strings here, s1[-end:-start]
+    # is written as s1[l1 - end:l1 - start].
+    l1 = len(s1)
+    l2 = len(s2)
+
+    # Invariant: the last start characters are equal.
+    while True:
+        end = min(start + block, length)
+        if s1[l1 - end:l1 - start] != s2[l2 - end:l2 - start]:
+            break
+        if end == length:
+            return length
+        start = end
+        block *= 2
+
+    # There is a difference in the block from start to end.
+    while end - start > COMMON_BLOCK_SIZE:
+        middle = (start + end) // 2
+        if s1[l1 - middle:l1 - start] != s2[l2 - middle:l2 - start]:
+            end = middle
+        else:
+            start = middle
+
+    while s1[l1 - start - 1] == s2[l2 - start - 1]:
+        start += 1
+
+    return start
+#common_suffix_length
+
+
 def longest_common_prefix(s1, s2):
     """
     Calculate the longest common prefix of two strings.
@@ -281,15 +544,9 @@ def longest_common_prefix(s1, s2):
     @return: The longest common prefix of s1 and s2.
     @rtype: unicode
 
-    @todo: This is mostly used just for the length of the returned string,
-           and we could also return that directly.
+    @note: Use common_prefix_length if only the length is needed.
     """
-    pos = 0
-
-    while pos < min(len(s1), len(s2)) and s1[pos] == s2[pos]:
-        pos += 1
-
-    return s1[:pos]
+    return s1[:common_prefix_length(s1, s2)]
 #longest_common_prefix
 
 
@@ -309,8 +566,10 @@ def longest_common_suffix(s1, s2):
 
     @return: The longest common suffix of s1 and s2.
     @rtype: unicode
+
+    @note: Use common_suffix_length if only the length is needed.
     """
-    return longest_common_prefix(s1[::-1], s2[::-1])[::-1]
+    return s1[len(s1) - common_suffix_length(s1, s2):]
 #longest_common_suffix
 
 
@@ -333,11 +592,9 @@ def trim_common(s1, s2):
         - unicode: Trimmed version of s2.
         - int:     Length of longest common prefix.
         - int:     Length of longest common suffix.
-
-    @todo: More intelligently handle longest_common_prefix().
     """
-    lcp = len(longest_common_prefix(s1, s2))
-    lcs = len(longest_common_suffix(s1[lcp:], s2[lcp:]))
+    lcp = common_prefix_length(s1, s2)
+    lcs = common_suffix_length(s1, s2, limit=min(len(s1), len(s2)) - lcp)
     return s1[lcp:len(s1) - lcs], s2[lcp:len(s2) - lcs], lcp, lcs
 #trim_common
 
@@ -450,7 +707,6 @@ def in_frame_description(s1, s2):
         - int     ; Last position of the change in the second protein.
     @rtype: tuple(unicode, int, int, int)
 
-    @todo: More intelligently handle longest_common_prefix().
     @todo: Refactor this code (too many return statements).
     """
     s2_stop = '*' in s2
@@ -461,8 +717,8 @@ def in_frame_description(s1, s2):
         # Nothing happened.
         return ('p.(=)', 0, 0, 0)
 
-    lcp = len(longest_common_prefix(s1, s2))
-    lcs = len(longest_common_suffix(s1[lcp:], s2[lcp:]))
+    lcp = common_prefix_length(s1, s2)
+    lcs = common_suffix_length(s1, s2, limit=min(len(s1), len(s2)) - lcp)
     s1_end = len(s1) - lcs
     s2_end = len(s2) - lcs
 
@@ -552,12 +808,10 @@ def out_of_frame_description(s1, s2):
         - int     ; Last position of the first protein.
         - int     ; Last position of the second protein.
     @rtype: tuple(unicode, int, int, int)
-
-    @todo: More intelligently handle longest_common_prefix().
     """
     s1_seq = s1.rstrip('*')
     s2_seq = s2.rstrip('*')
-    lcp = len(longest_common_prefix(s1_seq, s2_seq))
+    lcp = common_prefix_length(s1_seq, s2_seq)
 
     if lcp == len(s2_seq): # NonSense mutation.
         if lcp == len(s1_seq): # Is this correct?
@@ -969,6 +1223,57 @@ class LazyObject(object):
     __contains__ = _new_method_proxy(operator.contains)
 
 
+class LRUCache(object):
+    """
+    A dictionary-like cache holding at most `maxsize` items, discarding the
+    least recently used item when full. It can be shared between threads.
+    """
+    def __init__(self, maxsize):
+        """
+        :arg int maxsize: Maximum number of items in the cache.
+        """
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Get the value for `key` and mark it as most recently used, or return
+        `default` if it is not in the cache.
+        """
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value
+            return value
+
+    def set(self, key, value):
+        """
+        Set the value for `key`, discarding the least recently used item if
+        the cache is full.
+        """
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all items from the cache.
+        """
+        with self._lock:
+            self._items.clear()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
 # We try to minimize non-trivial dependencies for non-critical features. The
 # setproctitle package is implemented as a C extension and hence requires a C
 # compiler and the Python development headers. Here we use it as an optional
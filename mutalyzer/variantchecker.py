@@ -26,16 +26,49 @@ from Bio.Alphabet import DNAAlphabet
 from Bio.Alphabet import ProteinAlphabet
 from Bio.Alphabet import _verify_alphabet
 
+from mutalyzer.config import settings
 from mutalyzer import util
 from mutalyzer.db.models import Assembly
 from mutalyzer.grammar import Grammar
-from mutalyzer.mutator import Mutator
+from mutalyzer.mutator import Mutator, restriction_index
 from mutalyzer.mapping import Converter
+from mutalyzer.output import Output
 from mutalyzer import Retriever
 from mutalyzer import GenRecord
 from mutalyzer.nc_db import get_nc_record
 from datetime import datetime
 
+# Cache of original CDS sequences and proteins, see `_original_protein`.
+# Initialized on first use.
+_original_proteins = None
+
+
+def _get_original_proteins():
+    """
+    Get the cache of original CDS sequences and proteins.
+
+    @return: The cache
+    @rtype: util.LRUCache
+    """
+    global _original_proteins
+    original_proteins = _original_proteins
+    if original_proteins is None:
+        original_proteins = _original_proteins = util.LRUCache(
+            settings.PROTEIN_CACHE_SIZE)
+    return original_proteins
+
+
+def _clear_original_proteins(*args):
+    """
+    Clear the cache of original CDS sequences and proteins.
+    """
+    global _original_proteins
+    _original_proteins = None
+
+
+settings.on_update(_clear_original_proteins, 'PROTEIN_CACHE_SIZE')
+
+
 # Exceptions used (privately) in this module.
 class _VariantError(Exception): pass
 class _RawVariantError(_VariantError): pass
@@ -1722,16 +1755,137 @@ def process_variant(mutator, description, record, output):
 #process_variant
 
 
-def check_variant(description, output):
+def _legends(genes, checked=True):
+    """
+    Create the legend with information per transcript variant and protein
+    isoform.
+
+    @arg genes: A list of genes.
+    @type genes: list(GenRecord.Gene)
+    @arg checked: Whether the record was checked for the variant (see
+        GenRecord.checkRecord). If not, protein isoforms and link methods
+        are listed as in the record before annotation.
+    @type checked: bool
+
+    @return: Name, ID, locus tag, product and link method per transcript
+        variant and protein isoform.
+    @rtype: list(list)
+    """
+    legends = []
+    for gene in genes:
+        for transcript in sorted(gene.transcriptList, key=attrgetter('name')):
+            if not transcript.name:
+                continue
+            if checked:
+                translate = transcript.translate
+                link_method = transcript.linkMethod
+            else:
+                translate = transcript.parsedTranslate
+                link_method = transcript.parsedLinkMethod
+            legends.append(['%s_v%s' % (gene.name, transcript.name),
+                            transcript.transcriptID, transcript.locusTag,
+                            transcript.transcriptProduct, link_method])
+            if translate:
+                legends.append(['%s_i%s' % (gene.name, transcript.name),
+                                transcript.proteinID, transcript.locusTag,
+                                transcript.proteinProduct, link_method])
+    return legends
+
+
+def _original_protein(record, transcript, sequence):
+    """
+    Get the original CDS of a transcript and its translation.
+
+    They only depend on the reference sequence and the transcript, so they
+    are cached by reference checksum and CDS for records with a checksum.
+
+    @arg record: A record object.
+    @type record: GenRecord.Record
+    @arg transcript: A transcript object.
+    @type transcript: GenRecord.Locus
+    @arg sequence: The original sequence.
+    @type sequence: Bio.Seq.Seq
+
+    @return: The original CDS and protein. The protein is None if the CDS
+        length is not a multiple of three or the CDS could not be translated.
+    @rtype: tuple(str, str)
+    """
+    key = None
+    if record.checksum and sequence is record.seq:
+        key = (record.checksum, tuple(transcript.CDS.positionList),
+               transcript.CM.orientation, transcript.txTable)
+        cached = _get_original_proteins().get(key)
+        if cached is not None:
+            return cached
+
+    cds_original = util.splice(util.sequence_bytes(sequence),
+                               transcript.CDS.positionList)
+
+    if transcript.CM.orientation == -1:
+        cds_original = util.reverse_complement_bytes(cds_original)
+
+    protein_original = None
+    if not len(cds_original) % 3:
+        try:
+            # FIXME this is a bit of a rancid fix.
+            protein_original = util.translate_bytes(
+                cds_original, table=transcript.txTable, cds=True)
+        except CodonTable.TranslationError:
+            pass
+
+    if key is not None:
+        _get_original_proteins().set(key, (cds_original, protein_original))
+
+    return cds_original, protein_original
+
+
+def _load_cached_record(retriever, filetype, record_id, record_cache):
+    """
+    Load a record from the cache, or retrieve it and store it in the cache.
+
+    Variants are checked against an overlay of the record (see
+    GenRecord.Record.overlay), so the record itself can be shared.
+
+    @arg retriever: A retriever object.
+    @type retriever: Retriever.Retriever
+    @arg filetype: Type of the record (LRG or GB).
+    @type filetype: unicode
+    @arg record_id: Identifier of the record.
+    @type record_id: unicode
+    @arg record_cache: Cache of loaded records.
+    @type record_cache: util.LRUCache
+
+    @return: The record, or None if it could not be retrieved.
+    @rtype: GenRecord.Record
+    """
+    key = filetype, record_id
+    record = record_cache.get(key)
+
+    if record is None:
+        record = retriever.loadrecord(record_id)
+        if not record:
+            return None
+        record_cache.set(key, record)
+
+    return record
+
+
+def check_variant(description, output, record_cache=None):
     """
     Check the variant described by {description} according to the HGVS variant
     nomenclature and populate the {output} object with various information
     about the variant and its reference sequence.
 
+    If {record_cache} is given, loaded reference records are stored in it
+    and reused for subsequent calls with the same cache, see
+    L{check_variants}.
+
     @arg description: Variant description in HGVS notation.
     @type description: string
     @arg output: An output object.
     @type output: Modules.Output.Output
+    @arg record_cache: Cache of loaded records.
+    @type record_cache: util.LRUCache
 
     @todo: Documentation.
     @todo: Raise exceptions on failure instead of just return.
@@ -1795,7 +1949,11 @@ def check_variant(description, output):
         retrieved_record = None
 
     if retrieved_record is None:
-        retrieved_record = retriever.loadrecord(record_id)
+        if record_cache is None:
+            retrieved_record = retriever.loadrecord(record_id)
+        else:
+            retrieved_record = _load_cached_record(
+                retriever, filetype, record_id, record_cache)
     else:
         # To remove the download link text from the name checker page.
         filetype = 'GB_NC'
@@ -1840,13 +1998,24 @@ def check_variant(description, output):
     output.addOutput('preColon', description.split(':')[0])
     output.addOutput('variant', description.split(':')[-1])
 
+    # Variant dependent state is kept in an overlay of the record, so the
+    # record itself is not altered.
     record = GenRecord.GenRecord(output)
-    record.record = retrieved_record
+    record.record = retrieved_record.overlay()
 
     # Note: The GenRecord instance is carrying the sequence in .record.seq.
     #       So is the Mutator instance in .mutator.orig.
 
-    mutator = Mutator(record.record.seq, output)
+    # The restriction site index is kept per reference, so we can only use
+    # it if we know the checksum.
+    if record.record.checksum:
+        index = restriction_index(record.record.checksum)
+    else:
+        index = None
+    restriction_sites = not output.getOutput('add_restriction_sites_to_output')
+
+    mutator = Mutator(record.record.seq, output, restriction_index=index,
+                      restriction_sites=restriction_sites)
 
     # Todo: If processing of the variant fails, we might still want to show
     # information about the record, gene, transcript.
@@ -1856,29 +2025,23 @@ def check_variant(description, output):
     except _VariantError:
         return
     finally:
-        # The legend needs to be created after processing the variant (which
-        # enriches the gene model by calling record.checkRecord), but we can
-        # create it regardless of success or failure.
-        for gene in record.record.geneList:
-            for transcript in sorted(gene.transcriptList, key=attrgetter('name')):
-                if not transcript.name:
-                    continue
-                output.addOutput('legends',
-                                 ['%s_v%s' % (gene.name, transcript.name),
-                                  transcript.transcriptID, transcript.locusTag,
-                                  transcript.transcriptProduct,
-                                  transcript.linkMethod])
-                if transcript.translate:
-                    output.addOutput('legends',
-                                     ['%s_i%s' % (gene.name, transcript.name),
-                                      transcript.proteinID, transcript.locusTag,
-                                      transcript.proteinProduct,
-                                      transcript.linkMethod])
-
+        # The legend can be created regardless of success or failure of
+        # processing the variant. Most callers don't use it, so we only do
+        # that if it is requested.
+        output.addLazyOutput('legends',
+                             lambda: _legends(record.record.geneList,
+                                              checked=record.isChecked()),
+                             multiple=True)
+
+    # Note that the sequences are only converted to unicode strings if they
+    # are requested. They are bound as default arguments, since some of these
+    # names are reused below.
     if not output.getOutput('add_original_sequence_to_output'):
-        output.addOutput('original', unicode(mutator.orig))
+        output.addLazyOutput('original',
+                             lambda orig=mutator.orig: unicode(orig))
     if not output.getOutput('add_mutated_sequence_to_output'):
-        output.addOutput('mutated', unicode(mutator.mutated))
+        output.addLazyOutput('mutated',
+                             lambda mutated=mutator.mutated: unicode(mutated))
 
     # Chromosomal region (only for GenBank human transcript references).
     # This is still quite ugly code, and should be cleaned up once we have
@@ -1906,7 +2069,10 @@ def check_variant(description, output):
                                           util.grouper(chromosomal_positions[2]))))
                     # Example value: ('chr12', [('29+4T>C', (2323, 2323)), ('230_233del', (5342, 5345))])
 
-    # Protein.
+    # Protein. We work on byte strings here, since creating Bio.Seq.Seq
+    # objects for every transcript is relatively costly.
+    mutated = util.sequence_bytes(mutator.mutated)
+
     for gene in record.record.geneList:
         for transcript in gene.transcriptList:
 
@@ -1920,18 +2086,23 @@ def check_variant(description, output):
                 transcript.proteinDescription = 'p.?'
                 continue
 
-            cds_original = util.splice(mutator.orig, transcript.CDS.positionList)
-            cds_original.alphabet = IUPAC.unambiguous_dna
+            if not transcript.affected:
+                # There is no variant near this transcript (only on large
+                # records, see GenRecord.checkRecord), so we don't need to
+                # predict the protein.
+                transcript.proteinDescription = 'p.(=)'
+                continue
+
+            cds_original, protein_original = _original_protein(
+                record.record, transcript, mutator.orig)
 
-            cds_variant = util.__nsplice(mutator.mutated,
+            cds_variant = util.__nsplice(mutated,
                                          mutator.shift_sites(transcript.mRNA.positionList),
                                          mutator.shift_sites(transcript.CDS.location),
                                          transcript.CM.orientation)
-            cds_variant.alphabet = IUPAC.unambiguous_dna
 
             if transcript.CM.orientation == -1:
-                cds_original = cds_original.reverse_complement()
-                cds_variant = cds_variant.reverse_complement()
+                cds_variant = util.reverse_complement_bytes(cds_variant)
 
             #if '*' in cds_original.translate()[:-1]:
             #    output.addMessage(__file__, 3, "ESTOP",
@@ -1943,10 +2114,7 @@ def check_variant(description, output):
             # somehow removed, if the sequence is really short, etc.
 
             if not len(cds_original) % 3:
-                try:
-                    # FIXME this is a bit of a rancid fix.
-                    protein_original = cds_original.translate(table=transcript.txTable, cds=True)
-                except CodonTable.TranslationError:
+                if protein_original is None:
                     if transcript.current:
                         output.addMessage(
                             __file__, 2, "WTRANS",
@@ -1968,13 +2136,14 @@ def check_variant(description, output):
                     # with `cds=True`, but not otherwise.
                     # So we manually translate the first codon to M. But only
                     # if it was not affected by the variant.
-                    protein_variant = cds_variant.translate(table=transcript.txTable)
-                    if protein_variant and unicode(cds_variant[:3]) == unicode(cds_original[:3]):
+                    protein_variant = util.translate_bytes(
+                        cds_variant, table=transcript.txTable)
+                    if protein_variant and cds_variant[:3] == cds_original[:3]:
                         protein_variant = protein_original[0] + protein_variant[1:]
 
                         # Up to and including the first '*', or the entire string.
                         try:
-                            stop = unicode(protein_variant).index('*')
+                            stop = protein_variant.index(b'*')
                             protein_variant = protein_variant[:stop + 1]
                         except ValueError:
                             pass
@@ -2087,3 +2256,29 @@ def check_variant(description, output):
     _add_batch_output(output)
 
 #check_variant
+
+
+def check_variants(descriptions):
+    """
+    Check the variants described by {descriptions}, see L{check_variant}.
+
+    This is meant for many variants on the same reference. The reference
+    record and its transcript Crossmap objects are created only once, after
+    which every variant is checked against an overlay of it.
+
+    @arg descriptions: Variant descriptions in HGVS notation.
+    @type descriptions: iterable(string)
+
+    @return: Generator yielding every description with an output object
+        for it, in the order of {descriptions}.
+    @rtype: generator(tuple(string, Modules.Output.Output))
+    """
+    # Variants for the same reference are usually grouped together, so we
+    # only keep the last record.
+    record_cache = util.LRUCache(1)
+
+    for description in descriptions:
+        output = Output(__file__)
+        check_variant(description, output, record_cache=record_cache)
+        yield description, output
+#check_variants
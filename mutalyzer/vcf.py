@@ -0,0 +1,497 @@
+"""
+Describe the variants in VCF files in HGVS notation.
+
+Records are read lazily and described in chunks, optionally on a pool of
+worker processes. The alleles of every record are normalized against the
+chromosome sequence in the local NC sequence store (see `mutalyzer.nc_db`)
+and described on the chromosome and on all transcripts near it, as is done by
+the position converter. Results are written in input order as soon as they
+are available, such that memory use is bounded by the chunk size and the
+number of worker processes.
+"""
+
+
+from __future__ import unicode_literals
+
+from collections import deque, namedtuple
+from itertools import islice
+import multiprocessing
+
+from sqlalchemy.pool import StaticPool
+
+from mutalyzer.config import settings
+from mutalyzer import db
+from mutalyzer import dbgb
+from mutalyzer.db.models import Assembly
+from mutalyzer import mapping
+from mutalyzer import nc_db
+from mutalyzer.output import Output
+from mutalyzer import util
+
+
+#: Columns in the output.
+HEADER = ['Chromosome', 'Position', 'ID', 'Reference', 'Alternate', 'Errors',
+          'Chromosomal Variant', 'Transcript Variant(s)']
+
+# Number of bases read at once from the sequence store while shifting.
+_SHIFT_WINDOW = 100
+
+# Records are described on the transcripts in this range around them.
+_FLANK = 5000
+
+# Describes records in worker processes, see `_initialize_worker`.
+_worker_describer = None
+
+# Database sessions and connection pools inherited from the parent process,
+# see `_initialize_worker`.
+_worker_inherited = []
+
+
+#: A record from a VCF file, with its alternate alleles as a list.
+Record = namedtuple('Record', ['chromosome', 'position', 'identifier',
+                               'reference', 'alternates'])
+
+
+#: Normalized variant on the chromosome, with one-based inclusive start and
+#: stop positions. For insertions these are the flanking positions.
+#: The operation is one of ``subst``, ``del``, ``dup``, ``ins`` and
+#: ``delins``, the deleted and inserted sequences are on the forward strand.
+Variant = namedtuple('Variant', ['start', 'stop', 'operation', 'deleted',
+                                 'inserted'])
+
+
+class VcfError(Exception):
+    """
+    Raised when a record cannot be described.
+    """
+    def __init__(self, code, message):
+        super(VcfError, self).__init__(message)
+        self.code = code
+        self.message = message
+
+
+def read_records(handle):
+    """
+    Read the records from a VCF file, skipping the header and any empty
+    lines.
+
+    :arg handle: VCF file, as an iterator over unicode lines.
+
+    :returns: Records, or tuples of fields for lines that are not valid VCF
+      records.
+    :rtype: iterator(Record or tuple)
+    """
+    for line in handle:
+        line = line.rstrip('\r\n')
+        if not line.strip() or line.startswith('#'):
+            continue
+
+        fields = line.split('\t')
+        try:
+            yield Record(fields[0], int(fields[1]), fields[2],
+                         fields[3].upper(), fields[4].upper().split(','))
+        except (IndexError, ValueError):
+            yield tuple(fields[:5])
+
+
+def _trim(position, reference, alternate):
+    """
+    Remove the common suffix and prefix of two alleles.
+
+    :returns: Tuple of the position, reference allele and alternate allele.
+    :rtype: tuple(int, unicode, unicode)
+    """
+    while reference and alternate and reference[-1] == alternate[-1]:
+        reference = reference[:-1]
+        alternate = alternate[:-1]
+    while reference and alternate and reference[0] == alternate[0]:
+        reference = reference[1:]
+        alternate = alternate[1:]
+        position += 1
+    return position, reference, alternate
+
+
+def _rotate_right(fetch, start, stop, allele):
+    """
+    Shift a deleted or inserted allele towards the end of the sequence.
+
+    :arg function fetch: Sequence reader taking a start and a stop position
+      (one-based, inclusive).
+    :arg int start: First position of the allele (for insertions the
+      position after the insertion point).
+    :arg int stop: Last position of the allele (for insertions the position
+      before the insertion point).
+    :arg unicode allele: The allele.
+
+    :returns: Tuple of the shifted start and stop position and the rotated
+      allele.
+    :rtype: tuple(int, int, unicode)
+    """
+    while True:
+        window = fetch(stop + 1, stop + _SHIFT_WINDOW)
+        for base in window:
+            if base != allele[0]:
+                return start, stop, allele
+            allele = allele[1:] + allele[0]
+            start += 1
+            stop += 1
+        if len(window) < _SHIFT_WINDOW:
+            return start, stop, allele
+
+
+def _rotate_left(fetch, start, stop, allele):
+    """
+    Shift a deleted or inserted allele towards the start of the sequence,
+    see `_rotate_right`.
+    """
+    while True:
+        window = fetch(start - _SHIFT_WINDOW, start - 1)
+        for base in reversed(window):
+            if base != allele[-1]:
+                return start, stop, allele
+            allele = allele[-1] + allele[:-1]
+            start -= 1
+            stop -= 1
+        if len(window) < _SHIFT_WINDOW:
+            return start, stop, allele
+
+
+def normalize(fetch, position, reference, alternate, shift='right'):
+    """
+    Normalize an allele from a VCF record.
+
+    Insertions and deletions are shifted as far as possible in the given
+    direction, and insertions of a copy of the flanking sequence are
+    described as duplications.
+
+    :arg function fetch: Sequence reader taking a start and a stop position
+      (one-based, inclusive), or None if the sequence is not available (in
+      which case nothing is shifted).
+    :arg int position: Position of the reference allele.
+    :arg unicode reference: Reference allele.
+    :arg unicode alternate: Alternate allele.
+    :arg unicode shift: Direction to shift in, ``right`` (the HGVS 3' rule
+      on the forward strand) or ``left`` (the 3' rule on the reverse strand).
+
+    :returns: The normalized variant.
+    :rtype: Variant
+    """
+    position, reference, alternate = _trim(position, reference, alternate)
+
+    if reference and alternate:
+        stop = position + len(reference) - 1
+        if len(reference) == len(alternate) == 1:
+            return Variant(position, stop, 'subst', reference, alternate)
+        return Variant(position, stop, 'delins', reference, alternate)
+
+    if not (reference or alternate):
+        raise VcfError('EVCF', 'Reference and alternate alleles are equal.')
+
+    allele = reference or alternate
+    start, stop = position, position + len(reference) - 1
+
+    if fetch is not None:
+        if shift == 'right':
+            start, stop, allele = _rotate_right(fetch, start, stop, allele)
+        else:
+            start, stop, allele = _rotate_left(fetch, start, stop, allele)
+
+    if reference:
+        return Variant(start, stop, 'del', allele, '')
+
+    # The insertion point is between stop and start.
+    if fetch is not None:
+        if shift == 'right' and fetch(stop - len(allele) + 1, stop) == allele:
+            return Variant(stop - len(allele) + 1, stop, 'dup', allele, '')
+        if shift == 'left' and fetch(start, start + len(allele) - 1) == allele:
+            return Variant(start, start + len(allele) - 1, 'dup', allele, '')
+
+    return Variant(stop, start, 'ins', '', allele)
+
+
+def _change(variant, reverse=False):
+    """
+    Describe the change of a variant (without positions).
+
+    :arg Variant variant: The variant.
+    :arg bool reverse: Describe on the reverse strand.
+
+    :returns: The change in HGVS notation.
+    :rtype: unicode
+    """
+    deleted, inserted = variant.deleted, variant.inserted
+    if reverse:
+        deleted = util.reverse_complement(deleted) if deleted else deleted
+        inserted = util.reverse_complement(inserted) if inserted else inserted
+
+    if variant.operation == 'subst':
+        return '%s>%s' % (deleted, inserted)
+    if variant.operation in ('ins', 'delins'):
+        return '%s%s' % (variant.operation, inserted)
+    return variant.operation
+
+
+def _location(first, last, variant):
+    """
+    Describe the location of a variant.
+    """
+    if variant.start == variant.stop and variant.operation != 'ins':
+        return first
+    return '%s_%s' % (first, last)
+
+
+class Describer(object):
+    """
+    Describe records from VCF files for one assembly.
+
+    References in the local NC sequence store are looked up once per
+    chromosome and kept for the lifetime of the describer.
+    """
+    def __init__(self, assembly):
+        """
+        :arg Assembly assembly: The assembly the records are on.
+        """
+        self.assembly = assembly
+        self._converter = mapping.Converter(assembly, Output(__file__))
+        self._references = {}
+
+    def _get_chromosome(self, name):
+        """
+        Get a chromosome by its accession number or by its name, with or
+        without ``chr`` prefix.
+        """
+        if '_' in name and '.' in name:
+            return self._converter._get_chromosome(accession=name)
+
+        if not name.startswith('chr'):
+            name = 'chr' + name
+        if name == 'chrMT':
+            name = 'chrM'
+        return self._converter._get_chromosome(name=name)
+
+    def _get_fetch(self, accession):
+        """
+        Get a sequence reader for a chromosome, or None if the chromosome is
+        not in the local NC sequence store.
+        """
+        if accession not in self._references:
+            self._references[accession] = nc_db.get_reference(accession)
+        reference = self._references[accession]
+
+        if reference is None:
+            return None
+        return lambda start, stop: unicode(
+            nc_db.get_sequence(reference, start, stop))
+
+    def _describe_allele(self, chromosome, fetch, position, reference,
+                         alternate):
+        """
+        Describe one allele of a record.
+
+        :returns: Tuple of the chromosomal description and a sorted list of
+          the transcript descriptions.
+        :rtype: tuple(unicode, list(unicode))
+        """
+        forward = normalize(fetch, position, reference, alternate,
+                            shift='right')
+        reverse = normalize(fetch, position, reference, alternate,
+                            shift='left')
+
+        chromosomal = '%s:%s.%s%s' % (
+            chromosome.accession,
+            'm' if chromosome.organelle == 'mitochondrion' else 'g',
+            _location(forward.start, forward.stop, forward),
+            _change(forward))
+
+        start = min(forward.start, forward.stop, reverse.start, reverse.stop)
+        stop = max(forward.start, forward.stop, reverse.start, reverse.stop)
+        transcript_mappings = mapping.get_transcript_mappings(
+            chromosome, max(start - _FLANK, 1), stop + _FLANK)
+
+        descriptions = []
+        for transcript_mapping in transcript_mappings:
+            converter = self._converter
+            converter._reset()
+            converter.mapping = transcript_mapping
+            crossmap = converter.makeCrossmap()
+
+            if transcript_mapping.orientation == 'forward':
+                variant = forward
+                first = crossmap.tuple2string(crossmap.g2x(variant.start))
+                last = crossmap.tuple2string(crossmap.g2x(variant.stop))
+                change = _change(variant)
+            else:
+                variant = reverse
+                first = crossmap.tuple2string(crossmap.g2x(variant.stop))
+                last = crossmap.tuple2string(crossmap.g2x(variant.start))
+                change = _change(variant, reverse=True)
+
+            descriptions.append('%s:%s.%s%s' % (
+                transcript_mapping.reference, 'c' if crossmap.CDS else 'n',
+                _location(first, last, variant), change))
+
+        return chromosomal, sorted(descriptions)
+
+    def describe(self, record):
+        """
+        Describe a record.
+
+        :arg record: The record (or tuple of fields if it is not a valid
+          record, see `read_records`).
+        :type record: Record or tuple
+
+        :returns: Output rows, one per alternate allele, see `HEADER`.
+        :rtype: list(list(unicode))
+        """
+        if not isinstance(record, Record):
+            return [list(record) + [''] * (5 - len(record)) +
+                    ['(vcf): Not a valid VCF record.']]
+
+        fields = [record.chromosome, unicode(record.position),
+                  record.identifier, record.reference]
+
+        chromosome = self._get_chromosome(record.chromosome)
+        if chromosome is None:
+            return [fields + [','.join(record.alternates),
+                              '(vcf): Chromosome %s could not be found in '
+                              'our database.' % record.chromosome]]
+
+        fetch = self._get_fetch(chromosome.accession)
+        warning = None
+
+        if fetch is None:
+            warning = ('(vcf): Chromosome sequence %s is not available, '
+                       'variants are not normalized.' % chromosome.accession)
+        else:
+            sequence = fetch(record.position,
+                             record.position + len(record.reference) - 1)
+            if sequence != record.reference:
+                return [fields + [','.join(record.alternates),
+                                  '(vcf): Reference allele %s does not match '
+                                  'the chromosome sequence %s.'
+                                  % (record.reference, sequence)]]
+
+        rows = []
+        for alternate in record.alternates:
+            if alternate in ('.', '*') or not alternate.isalpha():
+                rows.append(fields + [alternate, '(vcf): Alternate allele %s '
+                                      'is not supported.' % alternate])
+                continue
+
+            try:
+                chromosomal, descriptions = self._describe_allele(
+                    chromosome, fetch, record.position, record.reference,
+                    alternate)
+            except VcfError as e:
+                rows.append(fields + [alternate, '(vcf): %s' % e.message])
+                continue
+
+            rows.append(fields + [alternate, warning or '', chromosomal] +
+                        descriptions)
+        return rows
+
+    def describe_many(self, records):
+        """
+        Describe a list of records.
+
+        :returns: Output rows for all records, see `describe`.
+        :rtype: list(list(unicode))
+        """
+        rows = []
+        for record in records:
+            rows.extend(self.describe(record))
+        return rows
+
+
+def _initialize_worker(assembly_id):
+    """
+    Initialize a worker process.
+
+    The database sessions and connection pools of the parent process are
+    copied on fork and share their connections with the parent, so we must
+    not use or close them here. Instead, we replace them with new ones and
+    keep the copies referenced for the lifetime of the worker, such that they
+    are never finalized (which would reset the shared connections).
+    """
+    global _worker_describer
+    for database in (db, dbgb):
+        if database.session.registry.has():
+            _worker_inherited.append(database.session.registry())
+            database.session.registry.clear()
+        engine = database.session_factory.kw.get('bind')
+        # An SQLite in-memory database lives in the process memory, so the
+        # worker can just keep using its copy.
+        if engine is not None and not isinstance(engine.pool, StaticPool):
+            _worker_inherited.append(engine.pool)
+            engine.pool = engine.pool.recreate()
+    _worker_describer = Describer(Assembly.query.get(assembly_id))
+
+
+def _describe_in_worker(records):
+    """
+    Describe a list of records in a worker process.
+    """
+    return _worker_describer.describe_many(records)
+
+
+def _write_rows(handle, rows):
+    for row in rows:
+        handle.write('\t'.join(row) + '\n')
+
+
+def _chunks(records, size):
+    """
+    Split an iterator of records into lists of at most `size` records.
+    """
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def convert(assembly, handle, output_handle, processes=None):
+    """
+    Describe all records in a VCF file and write the results as
+    tab-delimited rows, see `HEADER`.
+
+    :arg Assembly assembly: The assembly the records are on.
+    :arg handle: VCF file, as an iterator over unicode lines.
+    :arg output_handle: Writable unicode file-like object.
+    :arg int processes: Number of worker processes. If 1, records are
+      described in this process. If None, `settings.VCF_CONVERTER_PROCESSES`
+      is used (and if that is not set, the number of cores).
+    """
+    processes = processes or settings.VCF_CONVERTER_PROCESSES or \
+        multiprocessing.cpu_count()
+    assembly_id = assembly.id
+    chunks = _chunks(read_records(handle), settings.VCF_CONVERTER_CHUNK_SIZE)
+
+    output_handle.write('\t'.join(HEADER) + '\n')
+
+    if processes == 1:
+        describer = Describer(assembly)
+        for chunk in chunks:
+            _write_rows(output_handle, describer.describe_many(chunk))
+        return
+
+    # The workers open their own database connections, leaving the session
+    # of the caller untouched.
+    pool = multiprocessing.Pool(processes, _initialize_worker, (assembly_id,))
+
+    # Results are written in input order, with a bounded number of chunks in
+    # flight.
+    try:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_describe_in_worker, (chunk,)))
+            if len(pending) >= 2 * processes:
+                _write_rows(output_handle, pending.popleft().get())
+        while pending:
+            _write_rows(output_handle, pending.popleft().get())
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -2,7 +2,7 @@
 function changeBatch(sel) {
   var opt = $(sel).val();
 
-  if(opt == 'position-converter') {
+  if(opt == 'position-converter' || opt == 'vcf-converter') {
     $('#assembly_name_or_alias').show();
   }
   else {
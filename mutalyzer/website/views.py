@@ -917,7 +917,7 @@ def batch_jobs_submit():
     if not file:
         errors.append('Please select a local file for upload.')
 
-    if job_type == 'position-converter':
+    if job_type in ('position-converter', 'vcf-converter'):
         try:
             Assembly.by_name_or_alias(assembly_name_or_alias)
         except NoResultFound:
@@ -932,21 +932,33 @@ def batch_jobs_submit():
         stats.increment_counter('batch-job/website')
 
         scheduler = Scheduler.Scheduler()
-        file_instance = File.File(output)
-        job, columns = file_instance.parseBatchFile(batch_file)
 
-        if job is None:
-            errors.append('Could not parse input file, please check your '
-                          'file format.')
-        else:
-            result_id = scheduler.addJob(email, job, columns, job_type,
-                                         argument=argument)
+        if job_type == 'vcf-converter':
+            result_id = scheduler.addVcfJob(email, batch_file, argument)
 
-            # Todo: We now assume that the job was not scheduled if there are
-            #   messages, which is probably not correct.
-            if not output.getMessages():
+            if result_id is None:
+                errors.append('The uncompressed VCF file exceeds the maximum '
+                              'size of %d megabytes.'
+                              % (settings.VCF_CONVERTER_MAX_SIZE // 1048576))
+            else:
                 return redirect(url_for('.batch_job_progress',
                                         result_id=result_id))
+        else:
+            file_instance = File.File(output)
+            job, columns = file_instance.parseBatchFile(batch_file)
+
+            if job is None:
+                errors.append('Could not parse input file, please check your '
+                              'file format.')
+            else:
+                result_id = scheduler.addJob(email, job, columns, job_type,
+                                             argument=argument)
+
+                # Todo: We now assume that the job was not scheduled if there
+                #   are messages, which is probably not correct.
+                if not output.getMessages():
+                    return redirect(url_for('.batch_job_progress',
+                                            result_id=result_id))
 
     for error in errors:
         output.addMessage(__file__, 3, 'EBATCHJOB', error)
@@ -41,6 +41,28 @@ def settings(request, tmpdir):
     return _settings
 
 
+@pytest.fixture
+def override_settings(request, settings):
+    """
+    Function changing settings for the duration of the test. Previous values
+    are restored afterwards (settings that were not set are removed again).
+    """
+    def override(values):
+        previous = {name: settings[name] for name in values
+                    if name in settings}
+        missing = [name for name in values if name not in settings]
+
+        def restore():
+            settings.configure(previous)
+            for name in missing:
+                del settings[name]
+
+        request.addfinalizer(restore)
+        settings.configure(values)
+
+    return override
+
+
 @pytest.fixture
 def output(settings):
     return Output('test')
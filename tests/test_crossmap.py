@@ -5,6 +5,9 @@ Tests for the mutalyzer.Crossmap module.
 
 from __future__ import unicode_literals
 
+import numpy
+import pytest
+
 from mutalyzer.Crossmap import Crossmap
 
 
@@ -374,3 +377,47 @@ def test_cds_is_exon_reverse():
     cds = [58661, 58762]
     cm = Crossmap(rna, cds, -1)
     assert cm._Crossmap__crossmapping == [297, 103, 102, 1, -1, -88]
+
+
+@pytest.mark.parametrize('rna,cds,orientation', [
+    ([5002, 5125, 27745, 27939, 58661, 58762, 74680, 74767, 103409, 103528,
+      119465, 119537, 144687, 144810, 148418, 149215], [27925, 74736], 1),
+    ([2000, 2797, 6405, 6528, 31678, 31750, 47687, 47806, 76448, 76535,
+      92453, 92554, 123276, 123470, 146090, 146213], [76479, 123290], -1),
+    ([5002, 5125, 27745, 27939, 58661, 58762, 74680, 74767], [], 1),
+    ([2000, 2797, 6405, 6528, 31678, 31750, 47687, 47806], [], -1),
+    ([10, 10, 20, 21, 30, 35], [10, 33], 1),
+    ([10, 10, 20, 21, 30, 35], [20, 35], -1)])
+def test_g2x_many(rna, cds, orientation):
+    """
+    Vectorized g. to c. conversion is the same as scalar conversion.
+    """
+    cm = Crossmap(rna, cds, orientation)
+    positions = numpy.arange(rna[0] - 100, rna[-1] + 100)
+    main, offset = cm.g2x_many(positions)
+    assert zip(main, offset) == [cm.g2x(p) for p in positions]
+
+
+@pytest.mark.parametrize('rna,cds,orientation', [
+    ([5002, 5125, 27745, 27939, 58661, 58762, 74680, 74767, 103409, 103528,
+      119465, 119537, 144687, 144810, 148418, 149215], [27925, 74736], 1),
+    ([2000, 2797, 6405, 6528, 31678, 31750, 47687, 47806, 76448, 76535,
+      92453, 92554, 123276, 123470, 146090, 146213], [76479, 123290], -1),
+    ([5002, 5125, 27745, 27939, 58661, 58762, 74680, 74767], [], 1),
+    ([2000, 2797, 6405, 6528, 31678, 31750, 47687, 47806], [], -1),
+    ([10, 10, 20, 21, 30, 35], [10, 33], 1),
+    ([10, 10, 20, 21, 30, 35], [20, 35], -1)])
+def test_x2g_many(rna, cds, orientation):
+    """
+    Vectorized c. to g. conversion is the same as scalar conversion.
+    """
+    cm = Crossmap(rna, cds, orientation)
+    positions = numpy.arange(rna[0] - 100, rna[-1] + 100)
+    main, offset = cm.g2x_many(positions)
+    assert list(cm.x2g_many(main, offset)) == \
+        [cm.x2g(m, o) for m, o in zip(main, offset)]
+
+    main = numpy.arange(-1000, 1000)
+    offset = numpy.tile([-2, -1, 0, 1, 2], 400)
+    assert list(cm.x2g_many(main, offset)) == \
+        [cm.x2g(m, o) for m, o in zip(main, offset)]
@@ -0,0 +1,102 @@
+"""
+Tests for the mutalyzer.GenRecord module.
+"""
+
+
+from __future__ import unicode_literals
+
+from mutalyzer.GenRecord import PList, Locus, Gene, Record
+
+
+def _record(genes):
+    """
+    Create a record with genes, each given as a tuple of its name and a
+    list of transcript accession numbers and mRNA splice sites.
+    """
+    record = Record()
+    for name, transcripts in genes:
+        gene = Gene(name)
+        for accession, positions in transcripts:
+            transcript = Locus(gene.newLocusTag())
+            transcript.transcriptID = accession
+            transcript.exon = PList()
+            transcript.exon.positionList = positions
+            transcript.exon.location = [positions[0], positions[-1]]
+            gene.transcriptList.append(transcript)
+        record.geneList.append(gene)
+    return record
+
+
+def test_find_gene():
+    """
+    Genes are found by name, also after adding more genes.
+    """
+    record = _record([('A', []), ('B', [])])
+    assert record.findGene('B') is record.geneList[1]
+    assert record.findGene('C') is None
+
+    record.geneList.append(Gene('C'))
+    assert record.findGene('C') is record.geneList[2]
+
+    record.geneList = [Gene('D')]
+    assert record.findGene('B') is None
+    assert record.findGene('D') is record.geneList[0]
+
+
+def test_find_locus():
+    """
+    Transcripts are found by their variant number.
+    """
+    record = _record([('A', [('NM_1.1', [10, 20]), ('NM_2.1', [30, 40])])])
+    gene = record.geneList[0]
+    assert gene.findLocus('002') is gene.transcriptList[1]
+    assert gene.findLocus('2') is gene.transcriptList[1]
+    assert gene.findLocus('3') is None
+
+
+def test_transcript_selector():
+    """
+    Transcripts are found by accession number, before and after annotation.
+    """
+    record = _record([('A', [('NM_1.1', [10, 20])]),
+                      ('B', [('NM_2.1', [30, 40]), ('NM_3.1', [50, 60])])])
+    assert record.get_transcript_selector('NM_3.1') == ('B', '002')
+    record.annotate()
+    assert record.get_transcript_selector('NM_3.1') == ('B', '002')
+    assert record.get_transcript_selector('NM_4.1') is None
+
+
+def test_find_transcripts():
+    """
+    Transcripts are found by location.
+    """
+    record = _record([('A', [('NM_1.1', [100, 200, 300, 400]),
+                             ('NM_2.1', [150, 200])]),
+                      ('B', [('NM_3.1', [1000, 5000])]),
+                      ('C', [('NM_4.1', [350, 360])])])
+    assert record.countTranscripts() == 4
+    assert record.findTranscripts(1, 99) == []
+    assert record.findTranscripts(1, 100) == [(0, 0)]
+    assert record.findTranscripts(201, 299) == [(0, 0)]
+    assert record.findTranscripts(355, 2000) == [(0, 0), (1, 0), (2, 0)]
+    assert record.findTranscripts(190, 190) == [(0, 0), (0, 1)]
+    assert record.findTranscripts(5001, 6000) == []
+
+
+def test_overlay_lookups():
+    """
+    Lookups on an overlay return the overlay objects.
+    """
+    record = _record([('A', [('NM_1.1', [10, 20])]),
+                      ('B', [('NM_2.1', [30, 40]), ('NM_3.1', [50, 60])])])
+    overlay = record.overlay()
+
+    gene = overlay.findGene('B')
+    assert gene is overlay.geneList[1]
+    assert gene.findLocus('002') is gene.transcriptList[1]
+    assert gene.findLocus('002').annotation \
+        is record.geneList[1].transcriptList[1]
+    assert overlay.get_transcript_selector('NM_2.1') == ('B', '001')
+
+    gene.findLocus('002').current = True
+    assert not record.geneList[1].transcriptList[1].current
@@ -5,13 +5,21 @@ Tests for the mutalyzer.grammar module.
 
 from __future__ import unicode_literals
 
+import random
+import threading
+
+from pyparsing import ParseException, ParseResults, ParserElement
 import pytest
 
+from mutalyzer import descent
+from mutalyzer import grammar as grammar_module
 from mutalyzer.grammar import Grammar
+from mutalyzer.output import Output
 
 
-@pytest.fixture
-def grammar(output):
+@pytest.fixture(params=['pyparsing', 'descent'])
+def grammar(request, override_settings, output):
+    override_settings({'GRAMMAR_BACKEND': request.param})
     return Grammar(output)
 
 
@@ -24,9 +32,40 @@ def parser(output, grammar):
         if len(errors) > 0:
             pytest.fail('failed to parse `%s`: %s' % (
                 description, errors[0].description))
+        assert_same_parse_tree(description)
     return parse
 
 
+def parse_tree(parse_results):
+    """
+    Parse results as nested tuples, including all results names.
+    """
+    if not isinstance(parse_results, ParseResults):
+        return parse_results
+    return (parse_results.getName(),
+            [parse_tree(token) for token in parse_results],
+            sorted((name, parse_tree(value))
+                   for name, value in parse_results.items()))
+
+
+def assert_same_parse_tree(description):
+    """
+    If the recursive descent parser parses a description, it should do so
+    exactly like the pyparsing grammar.
+    """
+    __tracebackhide__ = True
+    parse_results = descent.parse(description)
+    if parse_results is None:
+        return
+    try:
+        expected = Grammar.Var.parseString(description, parseAll=True)
+    except ParseException:
+        pytest.fail('parsed invalid description `%s`' % description)
+    finally:
+        ParserElement.resetCache()
+    assert parse_tree(parse_results) == parse_tree(expected)
+
+
 @pytest.mark.parametrize('description', [
     'NM_002001.2:c.[12del]',
     'NM_002001.2:c.[(12del)]',
@@ -162,3 +201,161 @@ def test_parse_minus_in_gene_symbol(parser):
     Gene symbol is allowed to contain a minus character.
     """
     parser('UD_132464528477(KRTAP2-4_v001):c.100del')
+
+
+def test_parse_cached(output):
+    """
+    Parse results are shared between Grammar instances.
+    """
+    description = 'NM_002001.2:c.12del'
+    first = Grammar(output).parse(description)
+    assert first is not None
+    assert description in grammar_module._get_parse_results()
+    second = Grammar(output).parse(description)
+    assert second is not first
+    assert parse_tree(second) == parse_tree(first)
+
+
+def test_parse_cached_modified(grammar):
+    """
+    Modifying parse results does not affect later parses of the same
+    description.
+    """
+    description = 'NM_002001.2:c.[12del;15_16insA]'
+    expected = parse_tree(grammar._parse(description))
+
+    first = grammar.parse(description)
+    first['RefSeqAcc'] = 'NM_003002.2'
+    first.SingleAlleleVarSet[0].RawVar['MutationType'] = 'dup'
+    del first.SingleAlleleVarSet[1][0]
+    del first[0]
+
+    assert parse_tree(grammar.parse(description)) == expected
+
+
+def test_parse_error_cached():
+    """
+    Parse errors are reported for every Grammar instance.
+    """
+    description = 'NM_002001.2:c.12dek'
+    for _ in range(2):
+        output = Output('test')
+        assert Grammar(output).parse(description) is None
+        errors = output.getMessagesWithErrorCode('EPARSE')
+        assert len(errors) == 1
+        assert output.getOutput('parseError') == [description,
+                                                  ' ' * 17 + '^']
+
+
+def test_parse_cache_size(override_settings, output):
+    """
+    Parse results are discarded when the cache is full.
+    """
+    override_settings({'GRAMMAR_CACHE_SIZE': 1})
+    Grammar(output).parse('NM_002001.2:c.12del')
+    Grammar(output).parse('NM_002001.2:c.13del')
+    parse_results = grammar_module._get_parse_results()
+    assert 'NM_002001.2:c.12del' not in parse_results
+    assert 'NM_002001.2:c.13del' in parse_results
+    assert len(parse_results) == 1
+
+
+def test_parse_threads(output):
+    """
+    Parse descriptions from several threads at once.
+    """
+    descriptions = ['NM_002001.2:c.%ddel' % i for i in range(1000, 1200)]
+    results = {}
+
+    def parse(descriptions):
+        for description in descriptions:
+            results[description] = Grammar(Output('test')).parse(description)
+
+    threads = [threading.Thread(target=parse, args=(descriptions[i::4],))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for description in descriptions:
+        location = results[description].RawVar.StartLoc.PtLoc.Main
+        assert location == description.split('.')[-1][:-3]
+
+
+def test_descent_supported():
+    """
+    The recursive descent parser parses common descriptions.
+    """
+    for description in ['NM_002001.2:c.12del',
+                        'NM_002001.2:c.[12del;13A>G]',
+                        'NG_012337.1(SDHD_v001):c.274_276delinsACT',
+                        'LRG_1t1:c.-5+u3_*10-?dup',
+                        'UD_132464528477(KRTAP2-4_v001):c.100del']:
+        assert descent.parse(description) is not None
+        assert_same_parse_tree(description)
+
+
+def test_descent_unsupported():
+    """
+    The recursive descent parser leaves other descriptions to pyparsing.
+    """
+    for description in ['NM_002001.2:c.[(12del)]',
+                        'NM_000076.2(CDKN1C):p.Ala123del',
+                        'NM_002001.2:c.12dek',
+                        'NM_002001.2:c.12_13conNM_004006.1:c.12_13',
+                        'NM_002001.2:c.12AC[3]',
+                        'NM_002001.2: c.12del']:
+        assert descent.parse(description) is None
+
+
+def test_descent_fuzz():
+    """
+    The recursive descent parser agrees with the pyparsing grammar on random
+    (possibly invalid) descriptions.
+    """
+    generator = random.Random(40)
+    choice = generator.choice
+
+    def point():
+        return choice(['', '-', '*']) + unicode(generator.randint(1, 300)) + \
+            choice(['', '', '+1', '-2', '+u3', '-d?', '+d', '-', '?'])
+
+    def location():
+        return choice([point(), point(), point() + '_' + point(),
+                       point() + '_' + point(), 'IVS2+1', 'EX1'])
+
+    def sequence():
+        return choice(['A', 'GTCN', '12', location(), location() + 'inv',
+                       'NM_004006.1', 'ACGT12'])
+
+    def variant():
+        return location() + choice([
+            'A>G', 'del', 'delA', 'del12', 'dup', 'dupTC', 'inv', 'invT',
+            'ins' + sequence(), 'delins' + sequence(),
+            'ins[%s;%s]' % (sequence(), sequence()), 'conNM_004006.1',
+            'A[3]', '[3]', 'dup{12del}']) + choice(['', '', '?'])
+
+    def random_description():
+        variants = [choice([variant(), variant(), '=', '?'])
+                    for _ in range(generator.randint(1, 3))]
+        return choice(['NM_002001.2', 'NM_002001', 'LRG_1t1',
+                       'NG_012337.1(SDHD_v001)', 'NG_012337.1(NM_003002.2)',
+                       'GI123', 'UD_abc_1']) + \
+            choice([':c.', ':c.', ':g.', ':r.', ':p.', ':']) + \
+            choice([variants[0], '[%s]' % choice([';', ';', '^', '/']).join(
+                variants)])
+
+    def mutate(description):
+        position = generator.randint(0, len(description))
+        return description[:position] + choice('Ad1_+-?[];()>:=') + \
+            description[position + generator.randint(0, 1):]
+
+    supported = 0
+    for _ in range(500):
+        for description in (random_description(),
+                            mutate(random_description())):
+            if descent.parse(description) is not None:
+                supported += 1
+            assert_same_parse_tree(description)
+    assert supported > 50
@@ -5,11 +5,14 @@ Tests for the mutalyzer.mapping module.
 
 from __future__ import unicode_literals
 
+import binning
 import codecs
+import io
 import os
 
 import pytest
 
+from mutalyzer.db import session
 from mutalyzer.db.models import TranscriptMapping
 from mutalyzer import mapping
 
@@ -443,6 +446,186 @@ def test_lrg_348t1_chrom2c(converter, coding, chromosomal):
     assert 'LRG_348t1:c.%sdel' % coding in coding_descr
 
 
+def test_crossmap_cache(output, hg19, converter):
+    """
+    Crossmappers are shared between converters and rebuilt for updated
+    transcript mappings.
+    """
+    converter.c2chrom('NM_003002.2:c.274G>T')
+    crossmap = converter.crossmap
+
+    other = mapping.Converter(hg19, output)
+    assert other.c2chrom('NM_003002.2:c.274G>T') == \
+        'NC_000011.9:g.111959695G>T'
+    assert other.crossmap is crossmap
+
+    transcript_mapping = other.mapping
+    transcript_mapping.exon_starts = [transcript_mapping.exon_starts[0] - 10] + \
+        transcript_mapping.exon_starts[1:]
+    session.commit()
+
+    other = mapping.Converter(hg19, output)
+    assert other.c2chrom('NM_003002.2:c.274G>T') == \
+        'NC_000011.9:g.111959695G>T'
+    assert other.crossmap is not crossmap
+
+
+def test_chromosome_cache(output, hg19, converter):
+    """
+    Chromosome lookups are cached.
+    """
+    chromosome = converter._get_chromosome(accession='NC_000011.9')
+    assert chromosome.name == 'chr11'
+    assert (hg19.id, 'accession', 'NC_000011.9') in mapping._chromosome_ids
+    assert converter._get_chromosome(accession='NC_000011.9') is chromosome
+    assert converter._get_chromosome(name='chr11') is chromosome
+    assert converter._get_chromosome(name='chrX1') is None
+
+
+# Variant descriptions used to compare bulk conversion with conversion one
+# by one.
+CONVERT_MANY_VARIANTS = [
+    'NM_003002.2:c.274G>T',
+    'NM_003002.2:c.-1_274del',
+    'NM_003002.2:c.274_-1del',
+    'NM_003002.2:c.274delinsTAAA',
+    'NM_003002.2:c.274delGinsTAAA',
+    'NM_003002.2:c.169+5_169+6insTT',
+    'NM_003002.2:c.*5dup',
+    'NM_003002.2:c.[274G>T;275del]',
+    'NM_003002.2:c.274G>T ',
+    'NM_003002.3:c.274G>T',
+    'NM_003002:c.274G>T',
+    'NM_001162505.1:c.-1_40del',
+    'NM_001162505.1:c.40_-1del',
+    'NM_001162505.1:c.10_11insATG',
+    'NM_001162505.1:c.100A>G',
+    'NM_002001.2:c.1del',
+    'NM_004006.1:c.345del',
+    'NR_028383.1:n.-2173C>A',
+    'NC_012920.1(ND4_v001):c.1271del',
+    'NC_000011.9:g.111959695G>T',
+    'NC_000011.9:g.111959695_111957631del',
+    'NC_000011.9:g.111957631_111959695del',
+    'NC_000011.9:g.111959695delinsTAAA',
+    'NC_000011.9:g.111959695delGinsTAAA',
+    'NC_000020.10:g.48770135_48770175del',
+    'NC_000020.10:g.48770135_48770136insAC',
+    'NC_000001.10:g.159272155del',
+    'NC_000001.10:g.48278767inv',
+    'NC_000001.10:g.48278767_48278770inv',
+    'NC_012920.1:m.12030del',
+    'chrM:m.12030del',
+    'chr11:g.111959695G>T',
+    'chrX1:g.111959695G>T',
+    'NC_000099.9:g.100del',
+    'chr7:g.345T>C',
+    'NC_000023.10:g.32827640G>A',
+    'NC_000011.9:g.111959695G>T>A',
+    'NC_000011.9',
+    'foo']
+
+
+@pytest.mark.parametrize('gene', [None, 'SDHD', 'DMD'])
+def test_convert_many(converter, gene):
+    """
+    Bulk conversion gives the same results as conversion one by one.
+    """
+    results = converter.convert_many(CONVERT_MANY_VARIANTS, gene=gene)
+    assert len(results) == len(CONVERT_MANY_VARIANTS)
+
+    for variant, (descriptions, messages) in zip(CONVERT_MANY_VARIANTS,
+                                                 results):
+        expected_descriptions, expected_messages = converter._convert_one(
+            variant, gene=gene)
+        assert descriptions == expected_descriptions
+        assert [m.code for m in messages] == \
+            [m.code for m in expected_messages]
+
+    assert results[0] == (['NC_000011.9:g.111959695G>T'], [])
+    assert [m.code for m in results[2][1]] == ['ERANGE']
+    if gene == 'SDHD':
+        assert results[19] == (['NM_003002.2:c.274G>T'], [])
+
+
+def test_convert_many_positions(converter):
+    """
+    Bulk conversion of all positions around a transcript.
+    """
+    genomic = ['NC_000011.9:g.%ddel' % position
+               for position in range(111957000, 111967000, 53)]
+    results = converter.convert_many(genomic)
+
+    coding = []
+    for variant, (descriptions, messages) in zip(genomic, results):
+        assert not messages
+        assert descriptions == converter.chrom2c(variant, 'list')
+        coding.extend(d for d in descriptions if d.startswith('NM_003002.2'))
+    assert coding
+
+    results = converter.convert_many(coding)
+    for variant, (descriptions, messages) in zip(coding, results):
+        assert not messages
+        assert descriptions == [converter.c2chrom(variant)]
+
+
+@pytest.mark.parametrize('contained', [False, True])
+def test_transcript_mapping_index(override_settings, hg19, contained):
+    """
+    Transcript mappings from the resident index are the same as those from
+    the database.
+    """
+    chromosome = hg19.chromosomes.filter_by(name='chr11').one()
+    ranges = [(1, 250000000), (111955524, 111966518), (111959695, 111959695),
+              (111957000, 111959000), (1, 2)]
+
+    expected = [[m.id for m in mapping.get_transcript_mappings(
+        chromosome, start, stop, contained=contained)]
+                for start, stop in ranges]
+    assert any(expected)
+
+    override_settings({'TRANSCRIPT_MAPPING_INDEX': True})
+    assert [[m.id for m in mapping.get_transcript_mappings(
+        chromosome, start, stop, contained=contained)]
+            for start, stop in ranges] == expected
+
+
+def test_transcript_mapping_index_converter(override_settings, converter):
+    """
+    Conversion with the resident transcript mapping index.
+    """
+    override_settings({'TRANSCRIPT_MAPPING_INDEX': True})
+    coding = converter.chrom2c('NC_000011.9:g.111959695G>T', 'list')
+    assert 'NM_003002.2:c.274G>T' in coding
+    assert 'NR_028383.1:n.-2173C>A' in coding
+
+
+def test_transcript_mapping_index_refresh(override_settings, hg19):
+    """
+    The resident transcript mapping index is rebuilt after transcript
+    mappings changed in another process.
+    """
+    chromosome = hg19.chromosomes.filter_by(name='chr11').one()
+    override_settings({'TRANSCRIPT_MAPPING_INDEX': True})
+    assert mapping.get_transcript_mappings(chromosome, 1, 100) == []
+    index = mapping._transcript_mapping_indexes[hg19.id]
+
+    # Restore the index dropped by the change events, as if the mapping was
+    # added by another process.
+    session.add(TranscriptMapping(
+        chromosome, 'refseq', 'NM_999999', 'TEST', 'forward', 10, 90,
+        [10, 50], [20, 90], 'ncbi', version=1))
+    session.commit()
+    mapping._transcript_mapping_indexes[hg19.id] = index
+    assert mapping.get_transcript_mappings(chromosome, 1, 100) == []
+
+    mapping.transcript_mappings_changed(hg19)
+    after = mapping.get_transcript_mappings(chromosome, 1, 100)
+    assert [m.reference for m in after] == ['NM_999999.1']
+    assert list(after[0].exon_stops) == [20, 90]
+    assert mapping._transcript_mapping_indexes[hg19.id] is not index
+
+
 def test_import_mapview(hg19):
     original_count = TranscriptMapping.query.count()
 
@@ -494,6 +677,113 @@ def test_import_mapview(hg19):
     assert new.source == 'ncbi'
 
 
+def test_import_mapview_unsorted(hg19):
+    """
+    Import transcript mappings from an unsorted mapview file.
+    """
+    original_count = TranscriptMapping.query.count()
+
+    group_label = 'GRCh37.p13-Primary Assembly'
+
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data',
+                        'hg19.chr11.111771755-112247252.seq_gene.sorted.md')
+    lines = [line for line in codecs.open(path, encoding='utf-8')
+             if line.split('\t')[12] == group_label]
+
+    # Move the first entry of the first gene to the end.
+    mapview = io.StringIO(''.join(lines[1:] + lines[:1]))
+
+    with pytest.raises(mapping.MapviewSortError):
+        mapping.import_from_mapview_file(hg19, mapview, group_label,
+                                         chunk_size=1)
+
+    assert TranscriptMapping.query.count() == original_count
+
+
+def test_import_mapview_chunks(hg19):
+    """
+    Import transcript mappings from a mapview file in small chunks.
+    """
+    original_count = TranscriptMapping.query.count()
+
+    group_label = 'GRCh37.p13-Primary Assembly'
+
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data',
+                        'hg19.chr11.111771755-112247252.seq_gene.sorted.md')
+    mapview = codecs.open(path, encoding='utf-8')
+    mapview_count = sum(1 for line in mapview
+                        if line.split('\t')[12] == group_label
+                        and line.split('\t')[11] == 'RNA')
+    mapview.seek(0)
+
+    progress = []
+    count = mapping.import_from_mapview_file(hg19, mapview, group_label,
+                                             chunk_size=3,
+                                             progress=progress.append)
+
+    assert count == mapview_count
+    assert progress == range(3, count, 3) + [count]
+    assert TranscriptMapping.query.count() == original_count + mapview_count - 2
+
+    updated = TranscriptMapping.query.filter_by(accession='NR_028383').one()
+    assert updated.exon_starts == [111955524, 111956700, 111957364]
+    assert updated.exon_stops == [111956180, 111957034, 111957525]
+
+
+def test_import_mapview_replace(hg19):
+    """
+    Replace all NCBI transcript mappings by those from a mapview file.
+    """
+    chromosome = hg19.chromosomes.filter_by(name='chr11').one()
+    session.add(TranscriptMapping(
+        chromosome, 'refseq', 'NM_999999', 'TEST', 'forward', 10, 90,
+        [10, 50], [20, 90], 'ncbi', version=1))
+    session.add(TranscriptMapping(
+        chromosome, 'refseq', 'NM_999998', 'TEST', 'forward', 10, 90,
+        [10, 50], [20, 90], 'ucsc', version=1))
+    session.commit()
+
+    other_count = TranscriptMapping.query.filter(
+        TranscriptMapping.source != 'ncbi').count()
+
+    group_label = 'GRCh37.p13-Primary Assembly'
+
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data',
+                        'hg19.chr11.111771755-112247252.seq_gene.sorted.md')
+    mapview = codecs.open(path, encoding='utf-8')
+    mapview_count = sum(1 for line in mapview
+                        if line.split('\t')[12] == group_label
+                        and line.split('\t')[11] == 'RNA')
+    mapview.seek(0)
+
+    count = mapping.import_from_mapview_file(hg19, mapview, group_label,
+                                             replace=True, chunk_size=4)
+
+    assert count == mapview_count
+    assert TranscriptMapping.query.filter_by(
+        source='ncbi').count() == mapview_count
+    assert TranscriptMapping.query.count() == other_count + mapview_count
+
+    assert TranscriptMapping.query.filter_by(
+        accession='NM_999999').count() == 0
+    assert TranscriptMapping.query.filter_by(
+        accession='NM_999998').count() == 1
+
+    updated = TranscriptMapping.query.filter_by(accession='NR_028383').one()
+    assert updated.exon_starts == [111955524, 111956700, 111957364]
+    assert updated.exon_stops == [111956180, 111957034, 111957525]
+    assert updated.bin == binning.assign_bin(111955524 - 1, 111957525)
+
+    new = TranscriptMapping.query.filter_by(accession='NM_000317').one()
+    assert new.cds == (112097167, 112104278)
+    assert new.chromosome == chromosome
+    assert new.orientation == 'forward'
+    assert new.select_transcript is False
+
+    assert not [name for name in session.get_bind().table_names()
+                if name.startswith('transcript_mappings_staging')]
+
+
 def test_import_lrgmap(hg19):
     original_count = TranscriptMapping.query.count()
 
@@ -562,3 +852,78 @@ def test_import_lrgmap(hg19):
     assert new.orientation == 'reverse'
     assert new.reference_type == 'lrg'
     assert new.source == 'ebi'
+
+
+@pytest.mark.parametrize('filename', ['hg19.ncbiRefSeq.subset.txt',
+                                      'hg19.ncbiRefSeq.subset.gtf'])
+def test_import_ucsc_dump(hg19, filename):
+    """
+    Import transcript mappings from a UCSC table dump or GTF file.
+    """
+    original_count = TranscriptMapping.query.count()
+
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data',
+                        filename)
+    dump = codecs.open(path, encoding='utf-8')
+
+    count = mapping.import_from_ucsc_dump(hg19, dump)
+
+    # Two transcripts were already in (NM_003002.2 and NR_028383.1 or
+    # NM_012459.2), one is new (NM_000317.2), the others are skipped.
+    assert count == 3
+    assert TranscriptMapping.query.count() == original_count + 1
+
+    unchanged = TranscriptMapping.query.filter_by(accession='NM_003002').one()
+    assert unchanged.start == 111957571
+    assert unchanged.stop == 111966518
+    assert unchanged.exon_starts == [111957571, 111958581, 111959591,
+                                     111965529]
+    assert unchanged.exon_stops == [111957683, 111958697, 111959735,
+                                    111966518]
+    assert unchanged.cds == (111957632, 111965694)
+
+    if filename.endswith('.txt'):
+        updated = TranscriptMapping.query.filter_by(
+            accession='NR_028383').one()
+        assert updated.start == 111955524
+        assert updated.stop == 111957525
+        assert updated.exon_starts == [111955524, 111956700, 111957364]
+        assert updated.exon_stops == [111956180, 111957034, 111957525]
+        assert updated.cds is None
+        assert updated.source == 'ucsc'
+    else:
+        reverse = TranscriptMapping.query.filter_by(
+            accession='NM_012459').one()
+        assert reverse.start == 111955524
+        assert reverse.stop == 111957522
+        assert reverse.exon_starts == [111955524, 111957364]
+        assert reverse.exon_stops == [111956186, 111957522]
+        assert reverse.cds == (111956019, 111957492)
+        assert reverse.orientation == 'reverse'
+
+    new = TranscriptMapping.query.filter_by(accession='NM_000317').one()
+    assert new.version == 2
+    assert new.start == 112097088
+    assert new.stop == 112104696
+    assert new.exon_starts == [112097088, 112099317, 112100931, 112101349,
+                               112103886, 112104155]
+    assert new.exon_stops == [112097249, 112099396, 112100953, 112101405,
+                              112103956, 112104696]
+    assert new.cds == (112097167, 112104278)
+    assert new.gene == 'PTS'
+    assert new.orientation == 'forward'
+    assert new.reference_type == 'refseq'
+    assert new.source == 'ucsc'
+
+
+def test_import_ucsc_dump_gtf_not_grouped(hg19):
+    """
+    Import transcript mappings from a GTF file with the lines of a
+    transcript not grouped together.
+    """
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data',
+                        'hg19.ncbiRefSeq.subset.gtf')
+    lines = codecs.open(path, encoding='utf-8').readlines()
+
+    with pytest.raises(mapping.UcscDumpError):
+        mapping.import_from_ucsc_dump(hg19, lines + lines[2:3])
@@ -15,6 +15,7 @@ import sqlalchemy as sa
 from sqlalchemy import create_engine, sql
 
 from mutalyzer import db
+from mutalyzer.db.models import Positions
 
 
 def test_migrations(database_uri):
@@ -45,6 +46,14 @@ def test_migrations(database_uri):
         assert not alembic.autogenerate.compare_metadata(
             context, db.Base.metadata)
 
+        # Data for migration c4f1d2a7b893:
+        # Pack transcript mapping exon positions.
+        exon_starts, exon_stops = connection.execute(
+            'SELECT exon_starts, exon_stops FROM transcript_mappings '
+            'WHERE gene = \'ATP6\'').fetchone()
+        assert Positions.unpack(exon_starts).tolist() == [8528]
+        assert Positions.unpack(exon_stops).tolist() == [9208]
+
     engine.dispose()
 
 
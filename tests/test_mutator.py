@@ -9,7 +9,10 @@ import pytest
 import random
 from Bio.Seq import Seq
 
-from mutalyzer.mutator import Mutator
+from mutalyzer import mutator as mutator_module
+from mutalyzer.mutator import Mutator, RestrictionSiteIndex
+from mutalyzer.output import Output
+from mutalyzer import util
 
 
 @pytest.fixture
@@ -1294,3 +1297,62 @@ def test_adjecent_ins_inv_2(mutator):
     mutator.insertion(2, 'G')
     mutator.inversion(2, 2)
     assert unicode(mutator.mutated) == unicode(Seq('AAGCGATCG'))
+
+
+@pytest.mark.parametrize('length', [3000])
+def test_restriction_index(output, sequence):
+    """
+    Restriction site analysis with a restriction site index gives the same
+    results as without, also with a second variant nearby.
+    """
+    generator = random.Random(44)
+    index = RestrictionSiteIndex(unicode(sequence))
+
+    for _ in range(50):
+        expected_output = Output(__file__)
+        expected = Mutator(sequence, expected_output)
+
+        indexed_output = Output(__file__)
+        indexed = Mutator(sequence, indexed_output, restriction_index=index)
+
+        first = generator.randint(1, len(sequence) - 40)
+        for _ in range(generator.randint(1, 2)):
+            last = first + generator.randint(0, 8)
+            insert = ''.join(generator.choice('ACGT')
+                             for _ in range(generator.randint(0, 5)))
+            expected.delins(first, last, insert)
+            indexed.delins(first, last, insert)
+            first = last + generator.randint(1, 20)
+
+        assert (indexed_output.getOutput('restrictionSites') ==
+                expected_output.getOutput('restrictionSites'))
+        assert (indexed_output.getOutput('visualisation') ==
+                expected_output.getOutput('visualisation'))
+
+
+@pytest.mark.parametrize('length', [5000])
+def test_restriction_index_cache(override_settings, sequence):
+    """
+    At most RESTRICTION_INDEX_CACHE_SIZE blocks of the restriction site index
+    are kept.
+    """
+    override_settings({'RESTRICTION_INDEX_CACHE_SIZE': 2})
+
+    index = RestrictionSiteIndex(unicode(sequence))
+    data = util.sequence_bytes(sequence)
+
+    enzymes = index.enzymes(data, 0, len(sequence))
+    assert len(mutator_module._get_restriction_blocks()) == 2
+    assert index.enzymes(data, 0, len(sequence)) == enzymes
+    assert index.enzymes(data, 1000, 1100) <= enzymes
+
+
+@pytest.mark.parametrize('sequence', [Seq('ATCGATCGAATTCGATCG')])
+def test_no_restriction_sites(output, sequence):
+    """
+    The restriction site analysis can be skipped.
+    """
+    mutator = Mutator(sequence, output, restriction_sites=False)
+    mutator.substitution(10, 'C')
+    assert output.getOutput('visualisation')
+    assert not output.getOutput('restrictionSites')
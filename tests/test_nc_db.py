@@ -0,0 +1,165 @@
+"""
+Tests for the mutalyzer.nc_db module.
+"""
+
+
+from __future__ import unicode_literals
+
+import random
+
+import pytest
+
+from mutalyzer import dbgb
+from mutalyzer.dbgb.models import Reference, Transcript
+from mutalyzer import nc_db
+from mutalyzer.output import Output
+from mutalyzer.Retriever import GenBankRetriever
+from mutalyzer import util
+
+
+# Transcripts as (accession, gene, start, stop, exon starts, exon stops).
+TRANSCRIPTS = [
+    ('NM_000001', 'A', 1000, 9000, '1000,5000', '2000,9000'),
+    ('NM_000002', 'B', 3000, 60000, '3000,40000', '4000,60000'),
+    ('NM_000003', 'C', 20000, 21000, '20000', '21000'),
+    ('NM_000004', 'D', 80000, 90000, '80000,85000', '81000,90000'),
+    ('NM_000005', 'E', 150000, 160000, '150000', '160000')]
+
+
+@pytest.fixture
+def dbgb_reference(request, override_settings):
+    override_settings({'DATABASE_GB_URI': 'sqlite://',
+                       'NC_TRANSCRIPT_INDEX': False})
+    request.addfinalizer(dbgb.session.remove)
+
+    reference = Reference('NC_000099', '1', 'a' * 32, 'b' * 32, 'test',
+                          '01-JAN-2017', 200000, 'genomic DNA', '1')
+    dbgb.session.add(reference)
+    dbgb.session.flush()
+
+    for accession, gene, start, stop, exons_start, exons_stop in TRANSCRIPTS:
+        transcript = Transcript(accession, '1', 'NP_' + accession[3:], '1',
+                                gene, None, '+', start, stop, start, stop,
+                                None, None, exons_start, exons_stop, None,
+                                None, None, None, 'mRNA')
+        transcript.reference_id = reference.id
+        dbgb.session.add(transcript)
+
+    dbgb.session.commit()
+    return reference
+
+
+@pytest.fixture
+def dbgb_sequence(override_settings, tmpdir, dbgb_reference):
+    seq_path = tmpdir.mkdir('sequences')
+    override_settings({'SEQ_PATH': unicode(seq_path) + '/'})
+
+    generator = random.Random(26)
+    sequence = ''.join(generator.choice('ACGT')
+                       for _ in range(dbgb_reference.length))
+    seq_path.join(dbgb_reference.checksum_sequence + '.sequence').write(
+        sequence)
+    return sequence
+
+
+def _accessions(transcripts):
+    return sorted(t.transcript_accession for t in transcripts)
+
+
+@pytest.mark.parametrize('start,end', [
+    (1, 200000), (7000, 7000), (25000, 26000), (70000, 70000),
+    (100000, 100000), (199000, 200000)])
+def test_transcript_index(override_settings, dbgb_reference, start, end):
+    """
+    The resident transcript index finds the same transcripts as the database.
+    """
+    expected = _accessions(
+        nc_db._get_transcripts(dbgb_reference, start, end))
+
+    override_settings({'NC_TRANSCRIPT_INDEX': True})
+    assert _accessions(
+        nc_db._get_transcripts(dbgb_reference, start, end)) == expected
+
+
+def test_transcript_index_exons(override_settings, dbgb_reference):
+    """
+    The resident transcript index stores the exons decoded.
+    """
+    override_settings({'NC_TRANSCRIPT_INDEX': True})
+    transcripts = nc_db._get_transcripts(dbgb_reference, 85000, 85000)
+
+    assert _accessions(transcripts) == ['NM_000004']
+    assert list(transcripts[0].exons_start) == [80000, 85000]
+    assert list(transcripts[0].exons_stop) == [81000, 90000]
+
+
+def test_transcript_index_refresh(override_settings, dbgb_reference):
+    """
+    The resident transcript index is refreshed when a transcript is added.
+    """
+    override_settings({'NC_TRANSCRIPT_INDEX': True})
+    assert _accessions(
+        nc_db._get_transcripts(dbgb_reference, 120000, 120000)) == []
+
+    transcript = Transcript('NM_000006', '1', 'NP_000006', '1', 'F', None,
+                            '-', 110000, 130000, 110000, 130000, None, None,
+                            '110000', '130000', None, None, None, None,
+                            'mRNA')
+    transcript.reference_id = dbgb_reference.id
+    dbgb.session.add(transcript)
+    dbgb.session.commit()
+
+    assert _accessions(
+        nc_db._get_transcripts(dbgb_reference, 120000, 120000)) == [
+            'NM_000006']
+
+
+def test_transcript_index_reference_changed(override_settings, dbgb_reference):
+    """
+    The resident transcript index is rebuilt when the reference changed.
+    """
+    override_settings({'NC_TRANSCRIPT_INDEX': True})
+    index = nc_db._get_transcript_index(dbgb_reference)
+    assert nc_db._get_transcript_index(dbgb_reference) is index
+
+    dbgb_reference.checksum_reference = 'c' * 32
+    assert nc_db._get_transcript_index(dbgb_reference) is not index
+
+
+def test_gene_location(dbgb_sequence):
+    """
+    Get the location of a gene from the gbparser database.
+    """
+    assert nc_db.get_gene_location('B', 'Homo sapiens') == (
+        'NC_000099.1', 3000, 60000, 1)
+    assert nc_db.get_gene_location('B', 'Mus musculus') is None
+    assert nc_db.get_gene_location('X', 'human') is None
+
+
+@pytest.mark.usefixtures('db')
+@pytest.mark.parametrize('orientation,chrom_offset,positions', [
+    (1, 500, [501, 1501, 4501, 8501]),
+    (2, 95000, [86001, 90001, 93001, 94001])])
+def test_retrieveslice_local(dbgb_sequence, orientation, chrom_offset,
+                             positions):
+    """
+    A chromosome slice is created from the gbparser database and the local
+    sequence file.
+    """
+    output = Output(__file__)
+    retriever = GenBankRetriever(output)
+    ud = retriever.retrieveslice('NC_000099.1', 500, 95000, orientation)
+    record = retriever.loadrecord(ud)
+
+    sequence = dbgb_sequence[499:95000]
+    if orientation == 2:
+        sequence = util.reverse_complement(sequence)
+    assert unicode(record.seq) == sequence
+    assert record.chromOffset == chrom_offset
+
+    assert sorted(gene.name for gene in record.geneList) == [
+        'A', 'B', 'C', 'D']
+    transcript = record.findGene('A').transcriptList[0]
+    assert transcript.transcriptID == 'NM_000001.1'
+    assert transcript.proteinID == 'NP_000001.1'
+    assert list(transcript.mRNA.positionList) == positions
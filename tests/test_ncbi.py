@@ -411,3 +411,41 @@ def test_protein_to_transcript_cache(accession, version, match_version,
     reverse = [(redis.get(key) or None, key.split(':')[-1])
                for key in redis.keys('ncbi:protein-to-transcript:*')]
     assert sorted(reverse) == sorted(expected_reverse)
+
+
+def test_accession_version(monkeypatch):
+    """
+    Get the current version of an accession number and check that it is
+    cached.
+    """
+    calls = []
+
+    def mock_esummary(db=None, id=None):
+        calls.append(id)
+        return EsummaryResult([{'Caption': id,
+                                'AccessionVersion': '%s.3' % id}])
+
+    class EsummaryResult(list):
+        def close(self):
+            pass
+
+    monkeypatch.setattr(Bio.Entrez, 'esummary', mock_esummary)
+    monkeypatch.setattr(Bio.Entrez, 'read', lambda handle: handle)
+
+    assert ncbi.get_accession_version('NM_002001') == 'NM_002001.3'
+    assert ncbi.get_accession_version('NM_002001') == 'NM_002001.3'
+    assert calls == ['NM_002001']
+    assert redis.ttl('ncbi:accession-version:NM_002001') > 0
+
+
+def test_accession_version_unknown(monkeypatch):
+    """
+    Get the current version of an unknown accession number.
+    """
+    def mock_esummary(db=None, id=None):
+        raise IOError()
+
+    monkeypatch.setattr(Bio.Entrez, 'esummary', mock_esummary)
+
+    assert ncbi.get_accession_version('NM_002001') is None
+    assert redis.get('ncbi:accession-version:NM_002001') is None
@@ -0,0 +1,45 @@
+"""
+Tests for the mutalyzer.output module.
+"""
+
+
+from __future__ import unicode_literals
+
+
+def test_lazy_output(output):
+    """
+    Lazy output is only computed when it is retrieved.
+    """
+    calls = []
+
+    def compute():
+        calls.append(None)
+        return 'b'
+
+    output.addOutput('test', 'a')
+    output.addLazyOutput('test', compute)
+    output.addOutput('test', 'c')
+    assert not calls
+
+    assert output.getOutput('test') == ['a', 'b', 'c']
+    assert output.getOutput('test') == ['a', 'b', 'c']
+    assert len(calls) == 1
+
+
+def test_lazy_output_indexed(output):
+    """
+    Lazy output is computed when one of its elements is retrieved.
+    """
+    output.addLazyOutput('test', lambda: 'a')
+    assert output.getIndexedOutput('test', 0) == 'a'
+    assert output.getIndexedOutput('test', 1) is None
+
+
+def test_lazy_output_multiple(output):
+    """
+    Lazy output can compute a list of data.
+    """
+    output.addOutput('test', 'a')
+    output.addLazyOutput('test', lambda: ['b', 'c'], multiple=True)
+    output.addLazyOutput('test', lambda: [], multiple=True)
+    assert output.getOutput('test') == ['a', 'b', 'c']
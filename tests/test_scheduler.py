@@ -6,6 +6,7 @@ Tests for the mutalyzer.Scheduler module.
 from __future__ import unicode_literals
 
 import bz2
+import gzip
 import os
 import io
 
@@ -285,7 +286,9 @@ def test_name_checker_altered():
                             'NM_000059.3.gb.bz2')
         return bz2.BZ2File(path)
 
-    with patch.object(Entrez, 'efetch', mock_efetch):
+    # Don't resolve the current version with an esummary query.
+    with patch.object(Entrez, 'esummary', side_effect=IOError()), \
+            patch.object(Entrez, 'efetch', mock_efetch):
         _batch_job_plain_text(variants, expected, 'name-checker')
 
 
@@ -372,7 +375,9 @@ def test_name_checker_altered_long_entry():
                             'NM_000059.3.gb.bz2')
         return bz2.BZ2File(path)
 
-    with patch.object(Entrez, 'efetch', mock_efetch):
+    # Don't resolve the current version with an esummary query.
+    with patch.object(Entrez, 'esummary', side_effect=IOError()), \
+            patch.object(Entrez, 'efetch', mock_efetch):
         _batch_job_plain_text(variants, expected, 'name-checker')
 
 
@@ -433,6 +438,126 @@ def test_position_converter():
     _batch_job_plain_text(variants, expected, 'position-converter', 'hg19')
 
 
+@pytest.mark.usefixtures('hg19_transcript_mappings')
+def test_vcf_converter(override_settings, tmpdir):
+    """
+    Simple VCF converter batch job, without local NC sequence store.
+    """
+    override_settings({'SEQ_PATH': unicode(tmpdir.join('missing')),
+                       'VCF_CONVERTER_PROCESSES': 1})
+
+    records = ['##fileformat=VCFv4.1',
+               '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO',
+               '11\t111959695\trs1\tG\tT\t.\t.\t.',
+               'chrQ\t10\t.\tA\tT\t.\t.\t.']
+    vcf_file = io.BytesIO()
+    with gzip.GzipFile(fileobj=vcf_file, mode='wb') as f:
+        f.write(('\n'.join(records) + '\n').encode('utf-8'))
+    vcf_file.seek(0)
+
+    scheduler = Scheduler.Scheduler()
+    result_id = scheduler.addVcfJob('test@test.test', vcf_file, 'hg19')
+
+    batch_job = BatchJob.query.filter_by(result_id=result_id).one()
+    assert batch_job.batch_queue_items.count() == 1
+
+    scheduler.process()
+
+    assert not os.path.exists(os.path.join(
+        settings.CACHE_DIR, 'batch-input', 'batch-input-%s.vcf' % result_id))
+
+    filename = 'batch-job-%s.txt' % result_id
+    result = io.open(os.path.join(settings.CACHE_DIR, filename),
+                     encoding='utf-8')
+
+    next(result)  # Header.
+    assert [line.rstrip('\n').split('\t') for line in result] == [
+        ['11', '111959695', 'rs1', 'G', 'T',
+         '(vcf): Chromosome sequence NC_000011.9 is not available, variants '
+         'are not normalized.',
+         'NC_000011.9:g.111959695G>T',
+         'NM_003002.2:c.274G>T',
+         'NM_012459.2:c.-2203C>A',
+         'NR_028383.1:n.-2173C>A'],
+        ['chrQ', '10', '.', 'A', 'T',
+         '(vcf): Chromosome chrQ could not be found in our database.']]
+
+
+@pytest.mark.usefixtures('db')
+def test_vcf_converter_too_large(override_settings):
+    """
+    VCF converter batch job exceeding the maximum size after decompression.
+    """
+    override_settings({'VCF_CONVERTER_MAX_SIZE': 1000})
+
+    vcf_file = io.BytesIO()
+    with gzip.GzipFile(fileobj=vcf_file, mode='wb') as f:
+        f.write(b'#CHROM\tPOS\tID\tREF\tALT\n')
+        f.write(b'11\t111959695\trs1\tG\tT\n' * 100)
+    vcf_file.seek(0)
+
+    scheduler = Scheduler.Scheduler()
+    result_id = scheduler.addVcfJob('test@test.test', vcf_file, 'hg19')
+
+    assert result_id is None
+    assert BatchJob.query.count() == 0
+    assert os.listdir(os.path.join(settings.CACHE_DIR, 'batch-input')) == []
+
+
+@pytest.mark.usefixtures('hg19_transcript_mappings')
+def test_vcf_converter_processes(override_settings, tmpdir):
+    """
+    VCF converter batch job on worker processes, alongside another batch job.
+    """
+    override_settings({'SEQ_PATH': unicode(tmpdir.join('missing')),
+                       'VCF_CONVERTER_PROCESSES': 2,
+                       'VCF_CONVERTER_CHUNK_SIZE': 1})
+
+    records = ['##fileformat=VCFv4.1',
+               '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO',
+               '11\t111959695\trs1\tG\tT\t.\t.\t.',
+               'chrQ\t10\t.\tA\tT\t.\t.\t.']
+    vcf_file = io.BytesIO()
+    with gzip.GzipFile(fileobj=vcf_file, mode='wb') as f:
+        f.write(('\n'.join(records) + '\n').encode('utf-8'))
+    vcf_file.seek(0)
+
+    scheduler = Scheduler.Scheduler()
+    vcf_result_id = scheduler.addVcfJob('test@test.test', vcf_file, 'hg19')
+
+    file_instance = File.File(output.Output('test'))
+    batch_file = io.BytesIO(b'AB026906.1:c.274G>T\nAB026906.1:c.275G>T\n')
+    job, columns = file_instance.parseBatchFile(batch_file)
+    result_id = scheduler.addJob('other@test.test', job, columns,
+                                 'syntax-checker')
+
+    scheduler.process()
+
+    assert BatchJob.query.count() == 0
+
+    filename = 'batch-job-%s.txt' % vcf_result_id
+    result = io.open(os.path.join(settings.CACHE_DIR, filename),
+                     encoding='utf-8')
+
+    next(result)  # Header.
+    assert [line.rstrip('\n').split('\t')[:7] for line in result] == [
+        ['11', '111959695', 'rs1', 'G', 'T',
+         '(vcf): Chromosome sequence NC_000011.9 is not available, variants '
+         'are not normalized.',
+         'NC_000011.9:g.111959695G>T'],
+        ['chrQ', '10', '.', 'A', 'T',
+         '(vcf): Chromosome chrQ could not be found in our database.']]
+
+    filename = 'batch-job-%s.txt' % result_id
+    result = io.open(os.path.join(settings.CACHE_DIR, filename),
+                     encoding='utf-8')
+
+    next(result)  # Header.
+    assert [line.strip().split('\t') for line in result] == [
+        ['AB026906.1:c.274G>T', 'OK'],
+        ['AB026906.1:c.275G>T', 'OK']]
+
+
 def test_ods_file():
     """
     OpenDocument Spreadsheet input for batch job.
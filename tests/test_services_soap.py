@@ -168,6 +168,41 @@ def test_numberconversion_gtoc_required_gene(api):
     assert 'XM_001715131.2:c.*19483A>G' in r.string
 
 
+@pytest.mark.usefixtures('hg19_transcript_mappings')
+def test_numberconversionbatch(api):
+    """
+    Running numberConversionBatch with a list of variants should give the
+    conversions and messages for every variant in the order given.
+    """
+    r = api('numberConversionBatch', build='hg19',
+            variants=['NC_000001.10:g.159272155del',
+                      'NM_002001.2:c.1del',
+                      'NM_003002.2:c.274_-1del',
+                      'chr7:g.345T>C'])
+    r = r.NumberConversionOutput
+    assert len(r) == 4
+    assert r[0].variant == 'NC_000001.10:g.159272155del'
+    assert 'NM_002001.2:c.1del' in r[0].conversions.string
+    assert r[1].conversions.string == ['NC_000001.10:g.159272155del']
+    assert not r[2].conversions
+    assert r[2].messages.SoapMessage[0].errorcode == 'ERANGE'
+    assert not r[3].conversions
+    assert not r[3].messages
+
+
+@pytest.mark.usefixtures('hg19_transcript_mappings')
+def test_numberconversionbatch_too_many(override_settings, api):
+    """
+    Running numberConversionBatch with more variants than allowed should
+    raise an exception.
+    """
+    override_settings({'NUMBER_CONVERSION_BATCH_MAX_VARIANTS': 1})
+    with pytest.raises(Fault) as e:
+        api('numberConversionBatch', build='hg19',
+            variants=['NM_002001.2:c.1del', 'NM_002001.2:c.2del'])
+    assert e.value.faultcode == 'EMAXSIZE'
+
+
 @pytest.mark.usefixtures('hg19_transcript_mappings')
 def test_gettranscripts_lrg(api):
     """
@@ -503,7 +538,9 @@ def test_runmutalyzer_reference_info_nm(api):
                             'NM_003002.2.gb.bz2')
         return bz2.BZ2File(path)
 
-    with patch.object(Entrez, 'efetch', mock_efetch):
+    # Don't resolve the current version with an esummary query.
+    with patch.object(Entrez, 'esummary', side_effect=IOError()), \
+            patch.object(Entrez, 'efetch', mock_efetch):
         r = api('runMutalyzer', 'NM_003002:c.274G>T')
 
     assert r.errors == 0
@@ -555,7 +592,9 @@ def test_runmutalyzer_reference_info_ng(api):
                             'NG_012772.1.gb.bz2')
         return bz2.BZ2File(path)
 
-    with patch.object(Entrez, 'efetch', mock_efetch):
+    # Don't resolve the current version with an esummary query.
+    with patch.object(Entrez, 'esummary', side_effect=IOError()), \
+            patch.object(Entrez, 'efetch', mock_efetch):
         r = api('runMutalyzer', 'NG_012772:g.18964del')
 
     assert r.errors == 0
@@ -0,0 +1,90 @@
+"""
+Tests for the mutalyzer.twobit module.
+"""
+
+
+from __future__ import unicode_literals
+
+import io
+
+import pytest
+
+from mutalyzer import twobit
+
+
+SEQUENCE = (b'NNNNNACGTacgtTTGCAnnnNNRYACGTAACCGGTTaaccggttACGTN'
+            b'GATTACAgattacaNNNNNNNNNNCCCGGGTTTAAA')
+
+
+@pytest.fixture
+def packed_sequence(request, tmpdir):
+    path = unicode(tmpdir.join('sequence' + twobit.EXTENSION))
+    with io.open(path, 'wb') as f:
+        twobit.pack(SEQUENCE, f)
+    sequence = twobit.PackedSequence(path)
+    request.addfinalizer(sequence.close)
+    return sequence
+
+
+def test_read_entire(packed_sequence):
+    """
+    Read the entire packed sequence.
+    """
+    assert packed_sequence.length == len(SEQUENCE)
+    assert packed_sequence.read(0, len(SEQUENCE)) == SEQUENCE
+
+
+def test_read_windows(packed_sequence):
+    """
+    Read all windows of the packed sequence.
+    """
+    for start in range(len(SEQUENCE)):
+        for stop in range(start, len(SEQUENCE) + 1):
+            assert packed_sequence.read(start, stop) == SEQUENCE[start:stop]
+
+
+def test_read_outside(packed_sequence):
+    """
+    Read windows extending outside the packed sequence.
+    """
+    assert packed_sequence.read(-5, 3) == SEQUENCE[:3]
+    assert packed_sequence.read(80, 200) == SEQUENCE[80:]
+    assert packed_sequence.read(200, 300) == b''
+
+
+@pytest.mark.parametrize('sequence', [
+    b'', b'A', b'N', b'a', b'ACG', b'acgtn', b'NNNN', b'ACGTACGT'])
+def test_pack_short(tmpdir, sequence):
+    """
+    Pack and read short sequences.
+    """
+    path = unicode(tmpdir.join('sequence' + twobit.EXTENSION))
+    with io.open(path, 'wb') as f:
+        twobit.pack(sequence, f)
+    packed_sequence = twobit.PackedSequence(path)
+    assert packed_sequence.read(0, len(sequence)) == sequence
+    packed_sequence.close()
+
+
+def test_convert(tmpdir):
+    """
+    Convert a plain sequence file.
+    """
+    source = tmpdir.join('sequence.sequence')
+    source.write(SEQUENCE, mode='wb')
+    target = unicode(tmpdir.join('sequence' + twobit.EXTENSION))
+
+    twobit.convert(unicode(source), target)
+    packed_sequence = twobit.open_sequence(target)
+    assert packed_sequence.read(10, 60) == SEQUENCE[10:60]
+
+
+def test_invalid(tmpdir):
+    """
+    Open a file that is not a packed sequence file.
+    """
+    path = tmpdir.join('sequence' + twobit.EXTENSION)
+    path.write(SEQUENCE, mode='wb')
+
+    with pytest.raises(twobit.PackedSequenceError):
+        twobit.PackedSequence(unicode(path))
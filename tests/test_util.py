@@ -5,6 +5,9 @@ Tests for the mutalyzer.util module.
 
 from __future__ import unicode_literals
 
+from Bio.Alphabet import generic_dna
+from Bio.Data import CodonTable
+from Bio.Seq import Seq
 import pytest
 
 from mutalyzer import util
@@ -35,3 +38,121 @@ def test_out_of_frame_description(ref, var, descr, first, last_ref, last_var):
     """
     assert util.out_of_frame_description(ref, var) == (
         descr, first, last_ref, last_var)
+
+
+@pytest.mark.parametrize('s1,s2,prefix,suffix', [
+    ('', '', 0, 0),
+    ('abcdefg', 'abcabcdefg', 3, 7),
+    ('abcdefg', 'abcdefg', 7, 7),
+    ('abcdefg', 'xbcdefy', 0, 0),
+    ('A' * 1000 + 'B' + 'A' * 1000, 'A' * 2001, 1000, 1000),
+    ('A' * 100 + 'B' * 37, 'A' * 100 + 'C' * 37, 100, 0),
+    ('A' * 5000, 'A' * 3000, 3000, 3000)])
+def test_common_prefix_suffix_length(s1, s2, prefix, suffix):
+    """
+    Length of the longest common prefix and suffix of two strings.
+    """
+    assert util.common_prefix_length(s1, s2) == prefix
+    assert util.common_suffix_length(s1, s2) == suffix
+    assert util.common_prefix_length(s2, s1) == prefix
+    assert util.common_suffix_length(s2, s1) == suffix
+    assert util.longest_common_prefix(s1, s2) == s1[:prefix]
+    assert util.longest_common_suffix(s1, s2) == s1[len(s1) - suffix:]
+
+
+def test_common_suffix_length_limit():
+    """
+    Length of the longest common suffix can be limited.
+    """
+    assert util.common_suffix_length('A' * 100, 'A' * 50, limit=20) == 20
+    assert util.common_suffix_length('A' * 100, 'A' * 50, limit=0) == 0
+    assert util.common_suffix_length('BA', 'CA', limit=20) == 1
+
+
+def test_in_frame_description_large():
+    """
+    In-frame description of a deletion in a large protein.
+    """
+    protein = 'M' + 'ACDEFGHIKLNPQRSTVWY' * 2000 + '*'
+    assert util.in_frame_description(
+        protein, protein[:20001] + protein[20004:]) == (
+            'p.(Gln20002_Ser20004del)', 20001, 20004, 20001)
+
+
+def test_lru_cache():
+    """
+    Least recently used items are discarded from a full cache.
+    """
+    cache = util.LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    cache.clear()
+    assert 'a' not in cache
+
+
+def test_splice():
+    """
+    Splice a sequence, keeping its type.
+    """
+    sites = [2, 4, 7, 16, 20, 23]
+    assert util.splice('abcdefghijklmnopqrstuvwxyz', sites) == \
+        'bcdghijklmnoptuvw'
+    spliced = util.splice(Seq('ACGTACGTACGTACGTACGTACGTAC', generic_dna),
+                          sites)
+    assert isinstance(spliced, Seq)
+    assert spliced.alphabet == generic_dna
+    assert unicode(spliced) == 'CGTGTACGTACGTTACG'
+
+
+@pytest.mark.parametrize('sequence', [
+    b'ATGCNRYKMSWBDHVX', b'atgcnrykmswbdhvx', b'', b'AaCcGgTt'])
+def test_reverse_complement_bytes(sequence):
+    """
+    Reverse complement of a byte string.
+    """
+    assert util.reverse_complement_bytes(sequence) == \
+        str(Seq(sequence).reverse_complement())
+
+
+@pytest.mark.parametrize('sequence,table', [
+    (b'ATGGCCTAAGGC', 1),
+    (b'ATGGCCTAAGG', 1),
+    (b'atgNNNGCNtarAGA', 1),
+    (b'ATGAGATGA', 2),
+    (b'AT', 1)])
+def test_translate_bytes(sequence, table):
+    """
+    Translate a byte string.
+    """
+    assert util.translate_bytes(sequence, table=table) == \
+        str(Seq(sequence[:len(sequence) // 3 * 3]).translate(table=table))
+
+
+@pytest.mark.parametrize('sequence,table,protein', [
+    (b'ATGGCCTAA', 1, b'MA'),
+    (b'TTGGCCtag', 1, b'MA'),
+    (b'ATAGCCAGA', 2, b'MA'),
+    (b'ATGGCCTAA', 11, b'MA'),
+    (b'ATGGCCTA', 1, None),
+    (b'GTGGCCTAA', 1, None),
+    (b'ATGGCCTAC', 1, None),
+    (b'ATGTAAGCCTAA', 1, None)])
+def test_translate_bytes_cds(sequence, table, protein):
+    """
+    Translate a complete CDS represented as byte string.
+    """
+    if protein is None:
+        with pytest.raises(CodonTable.TranslationError):
+            util.translate_bytes(sequence, table=table, cds=True)
+        with pytest.raises(CodonTable.TranslationError):
+            Seq(sequence).translate(table=table, cds=True)
+    else:
+        assert util.translate_bytes(sequence, table=table, cds=True) == \
+            protein
+        assert str(Seq(sequence).translate(table=table, cds=True)) == protein
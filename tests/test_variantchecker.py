@@ -5,8 +5,13 @@ Tests for the mutalyzer.variantchecker module.
 
 from __future__ import unicode_literals
 
+import Bio.Entrez
 import pytest
 
+from mutalyzer.output import Output
+from mutalyzer.redisclient import client as redis
+from mutalyzer import util
+from mutalyzer import variantchecker
 from mutalyzer.variantchecker import check_variant
 
 from fixtures import with_references
@@ -167,6 +172,52 @@ def test_no_est_warning_nm_n(output, checker):
     assert len(west) == 0
 
 
+@with_references('NM_003002.2')
+def test_no_version_cached(output, checker):
+    """
+    Accession number without version resolves to the cached current version
+    without downloading the record.
+    """
+    redis.set('ncbi:accession-version:NM_003002', 'NM_003002.2')
+    checker('NM_003002:c.274del')
+    assert len(output.getMessagesWithErrorCode('WNOVER')) == 1
+    assert len(output.getMessagesWithErrorCode('ERETR')) == 0
+    assert output.getIndexedOutput('reference', 0) == 'NM_003002.2'
+    assert output.getIndexedOutput('genomicDescription', 0) == \
+        'NM_003002:n.335del'
+
+
+@pytest.mark.usefixtures('db')
+def test_retrieval_failure_cached(output, checker, monkeypatch):
+    """
+    A failed reference retrieval is not retried while the failure is cached.
+    """
+    calls = []
+
+    class EntrezResult(object):
+        def read(self):
+            return b''
+
+        def close(self):
+            pass
+
+    def mock_efetch(db=None, id=None, rettype=None, retmode=None):
+        calls.append(id)
+        return EntrezResult()
+
+    monkeypatch.setattr(Bio.Entrez, 'efetch', mock_efetch)
+
+    checker('NM_999999.1:c.1del')
+    checker('NM_999999.1:c.2del')
+    assert calls == ['NM_999999.1']
+    assert len(output.getMessagesWithErrorCode('ERETR')) == 2
+    assert redis.ttl('retriever:negative:NM_999999.1') > 0
+
+    redis.delete('retriever:negative:NM_999999.1')
+    checker('NM_999999.1:c.3del')
+    assert calls == ['NM_999999.1', 'NM_999999.1']
+
+
 @with_references('NG_012772.1')
 def test_est_warning_ng_est(output, checker):
     """
@@ -1580,6 +1631,24 @@ def test_legend_mrna_by_construction(output, checker):
     ]
 
 
+@with_references('NM_002001.2', 'AB026906.1')
+def test_legend_unchecked():
+    """
+    Protein isoforms and link methods from the annotation of the record are
+    not in the legend if the variant is rejected before the record is
+    checked.
+    """
+    output = Output(__file__)
+    check_variant('NM_002001.2:n.=', output)
+    assert output.getOutput('legends') == [
+        ['FCER1A_v001', 'NM_002001.2', None, None, 'exhaustion']]
+
+    output = Output(__file__)
+    check_variant('AB026906.1:n.=', output)
+    assert output.getOutput('legends') == [
+        ['SDHD_v001', None, None, None, None]]
+
+
 @with_references('NM_000143.3')
 def test_protein_ext_stop(output, checker):
     """
@@ -2422,3 +2491,139 @@ def test_ex_multiple_operations(output, checker):
     errorcount, warncount, summary = output.Summary()
     assert errorcount == 0
     assert output.getOutput('gDescription')[0] == u'g.[4823del;2954_4952del]'
+
+
+@with_references('AL449423.14')
+def test_affected_transcripts(override_settings, output, checker):
+    """
+    On large records, only transcripts near the variant are described, all
+    other transcripts are unaffected.
+    """
+    override_settings({'AFFECTED_TRANSCRIPTS_THRESHOLD': 0,
+                       'AFFECTED_TRANSCRIPTS_FLANK': 2000})
+
+    checker('AL449423.14(CDKN2A_v001):c.161_163del')
+    descriptions = output.getOutput('descriptions')
+    assert 'AL449423.14(CDKN2A_v001):c.161_163del' in descriptions
+    assert 'AL449423.14(CDKN2A_v008):n.11_13del' in descriptions
+    assert 'AL449423.14(CDKN2A_v007):n.=' in descriptions
+    assert 'AL449423.14(MTAP_v005):n.=' in descriptions
+    assert 'AL449423.14(CDKN2B_v001):c.=' in descriptions
+    prot_descriptions = output.getOutput('protDescriptions')
+    assert 'AL449423.14(CDKN2A_i001):p.(Met54_Gly55delinsSer)' \
+           in prot_descriptions
+    assert 'AL449423.14(CDKN2B_i001):p.(=)' in prot_descriptions
+    assert (output.getIndexedOutput('genomicDescription', 0) ==
+            'AL449423.14:g.61937_61939del')
+
+
+@with_references('AL449423.14')
+def test_affected_transcripts_later_variant(override_settings, output,
+                                            checker):
+    """
+    Transcripts affected by a raw variant are described for all raw
+    variants, earlier and later ones.
+    """
+    override_settings({'AFFECTED_TRANSCRIPTS_THRESHOLD': 0,
+                       'AFFECTED_TRANSCRIPTS_FLANK': 2000})
+
+    checker('AL449423.14(CDKN2A_v001):c.[161_163del;-30000del]')
+    descriptions = output.getOutput('descriptions')
+    assert 'AL449423.14(CDKN2A_v001):c.[161_163del;-30000del]' \
+           in descriptions
+    assert 'AL449423.14(CDKN2B_v001):c.[*34789_*34791del;*1160del]' \
+           in descriptions
+    assert 'AL449423.14(CDKN2A_v002):c.[327_329del;-10373del]' \
+           in descriptions
+    assert 'AL449423.14(C9orf53_v001):c.=' in descriptions
+
+
+@with_references('AL449423.14')
+def test_original_protein_cached(output, checker):
+    """
+    The original CDS and protein are cached per reference and transcript.
+    """
+    variantchecker._clear_original_proteins()
+    checker('AL449423.14(CDKN2A_v001):c.161_163del')
+    cached = len(variantchecker._get_original_proteins())
+    assert cached > 0
+
+    cached_output = Output(__file__)
+    check_variant('AL449423.14(CDKN2A_v001):c.161_163del', cached_output)
+    assert len(variantchecker._get_original_proteins()) == cached
+    assert (cached_output.getOutput('protDescriptions') ==
+            output.getOutput('protDescriptions'))
+    assert 'AL449423.14(CDKN2A_i001):p.(Met54_Gly55delinsSer)' \
+           in cached_output.getOutput('protDescriptions')
+
+
+@with_references('AL449423.14', 'NG_012337.1')
+def test_check_variants(monkeypatch):
+    """
+    Checking many variants loads every reference once and gives the same
+    results as checking them one by one.
+    """
+    descriptions = ['AL449423.14(CDKN2A_v001):c.161_163del',
+                    'AL449423.14(CDKN2A_v002):c.5_6delinsAT',
+                    'AL449423.14(CDKN2A_v001):c.xyz',
+                    'AL449423.14:g.65471_65472insACT',
+                    'NG_012337.1(SDHD_v001):c.274G>T',
+                    'NG_012337.1(TIMM8B_v001):c.12del']
+
+    expected = []
+    for description in descriptions:
+        output = Output(__file__)
+        check_variant(description, output)
+        expected.append(output)
+
+    loaded = []
+    loadrecord = variantchecker.Retriever.GenBankRetriever.loadrecord
+
+    def loadrecord_counted(self, identifier):
+        loaded.append(identifier)
+        return loadrecord(self, identifier)
+
+    monkeypatch.setattr(variantchecker.Retriever.GenBankRetriever,
+                        'loadrecord', loadrecord_counted)
+
+    results = list(variantchecker.check_variants(descriptions))
+    assert loaded == ['AL449423.14', 'NG_012337.1']
+    assert [description for description, _ in results] == descriptions
+
+    for (_, output), expected_output in zip(results, expected):
+        assert ([unicode(m) for m in output.getMessages()] ==
+                [unicode(m) for m in expected_output.getMessages()])
+        for name in ('genomicDescription', 'descriptions', 'protDescriptions',
+                     'legends', 'restrictionSites'):
+            assert output.getOutput(name) == expected_output.getOutput(name)
+
+
+@with_references('AL449423.14')
+def test_check_variant_shared_record():
+    """
+    Checking a variant does not alter a cached record.
+    """
+    record_cache = util.LRUCache(1)
+
+    output = Output(__file__)
+    check_variant('AL449423.14(CDKN2A_v001):c.161_163del', output,
+                  record_cache=record_cache)
+    assert 'AL449423.14(CDKN2A_v001):c.161_163del' \
+        in output.getOutput('descriptions')
+
+    record = record_cache.get(('GB', 'AL449423.14'))
+    assert record.annotated
+    assert not record.description
+    for gene in record.geneList:
+        for transcript in gene.transcriptList:
+            assert not transcript.current
+            assert transcript.description in ('', '?')
+            assert transcript.proteinDescription == '?'
+
+    output = Output(__file__)
+    check_variant('AL449423.14(CDKN2A_v002):c.5_6delinsAT', output,
+                  record_cache=record_cache)
+    assert 'AL449423.14(CDKN2A_v002):c.5_6delinsAT' \
+        in output.getOutput('descriptions')
+    assert 'AL449423.14(CDKN2A_v001):c.161_163del' \
+        not in output.getOutput('descriptions')
@@ -0,0 +1,185 @@
+"""
+Tests for the mutalyzer.vcf module.
+"""
+
+
+from __future__ import unicode_literals
+
+import io
+import random
+
+import pytest
+
+from mutalyzer import dbgb
+from mutalyzer.dbgb.models import Reference
+from mutalyzer import mapping
+from mutalyzer.output import Output
+from mutalyzer import vcf
+
+
+pytestmark = pytest.mark.usefixtures('hg19_transcript_mappings')
+
+
+# Part of the chromosome sequence we write to the local NC sequence store.
+SEQUENCE_START = 111959600
+SEQUENCE_STOP = 111959800
+
+
+@pytest.fixture
+def sequence(request, override_settings, tmpdir):
+    """
+    Local NC sequence store with a stretch of synthetic sequence around
+    NM_003002.2:c.274 on NC_000011.9.
+    """
+    seq_path = tmpdir.mkdir('sequences')
+    override_settings({'DATABASE_GB_URI': 'sqlite://',
+                       'SEQ_PATH': unicode(seq_path) + '/'})
+    request.addfinalizer(dbgb.session.remove)
+
+    reference = Reference('NC_000011', '9', 'a' * 32, 'c' * 32, 'test',
+                          '01-JAN-2017', 135006516, 'genomic DNA', '1')
+    dbgb.session.add(reference)
+    dbgb.session.commit()
+
+    generator = random.Random(35)
+    sequence = [generator.choice('ACGT')
+                for _ in range(SEQUENCE_STOP - SEQUENCE_START + 1)]
+
+    def put(position, bases):
+        offset = position - SEQUENCE_START
+        sequence[offset:offset + len(bases)] = bases
+
+    put(111959694, 'CGT')
+    put(111959699, 'CAAAAG')
+    put(111959720, 'TCACACAG')
+    sequence = ''.join(sequence)
+
+    with io.open(unicode(seq_path.join('c' * 32 + '.sequence')), 'wb') as f:
+        f.seek(SEQUENCE_START - 1)
+        f.write(sequence.encode('ascii'))
+        f.seek(reference.length - 1)
+        f.write(b'N')
+
+    return sequence
+
+
+def _fetch(sequence):
+    return lambda start, stop: sequence[max(start, 1) - 1:stop]
+
+
+@pytest.mark.parametrize('position,reference,alternate,shift,expected', [
+    (3, 'A', 'T', 'right', (3, 3, 'subst', 'A', 'T')),
+    (3, 'AC', 'A', 'right', (4, 4, 'del', 'C', '')),
+    (3, 'AC', 'A', 'left', (4, 4, 'del', 'C', '')),
+    (4, 'CA', 'C', 'right', (8, 8, 'del', 'A', '')),
+    (4, 'CA', 'C', 'left', (5, 5, 'del', 'A', '')),
+    (4, 'CA', 'CAA', 'right', (8, 8, 'dup', 'A', '')),
+    (4, 'CA', 'CAA', 'left', (5, 5, 'dup', 'A', '')),
+    (4, 'C', 'CT', 'right', (4, 5, 'ins', '', 'T')),
+    (4, 'C', 'CT', 'left', (4, 5, 'ins', '', 'T')),
+    (9, 'G', 'GTG', 'right', (10, 11, 'dup', 'TG', '')),
+    (9, 'G', 'GTG', 'left', (9, 10, 'dup', 'GT', '')),
+    (4, 'CAA', 'GTT', 'right', (4, 6, 'delins', 'CAA', 'GTT'))])
+def test_normalize(position, reference, alternate, shift, expected):
+    """
+    Normalize alleles.
+    """
+    #          1234567890123
+    sequence = 'GTACAAAAGTGCC'
+    assert vcf.normalize(_fetch(sequence), position, reference, alternate,
+                         shift=shift) == expected
+
+
+def test_normalize_no_sequence():
+    """
+    Without sequence, alleles are only trimmed.
+    """
+    assert vcf.normalize(None, 4, 'CA', 'C') == (5, 5, 'del', 'A', '')
+
+
+def test_normalize_equal():
+    """
+    Equal alleles cannot be normalized.
+    """
+    with pytest.raises(vcf.VcfError):
+        vcf.normalize(None, 4, 'CA', 'CA')
+
+
+def _convert(hg19, lines, processes=1):
+    handle = io.StringIO('\n'.join(lines) + '\n')
+    output_handle = io.StringIO()
+    vcf.convert(hg19, handle, output_handle, processes=processes)
+    rows = [line.split('\t')
+            for line in output_handle.getvalue().splitlines()]
+    assert rows[0] == vcf.HEADER
+    return rows[1:]
+
+
+def _chrom2c(hg19, description):
+    return mapping.Converter(hg19, Output(__file__)).chrom2c(
+        description, 'list')
+
+
+def test_convert(hg19, sequence):
+    """
+    Describe VCF records.
+    """
+    rows = _convert(hg19, [
+        '##fileformat=VCFv4.1',
+        '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO',
+        '11\t111959695\trs1\tG\tT\t.\t.\t.',
+        'chr11\t111959699\t.\tCA\tC,CAA\t.\t.\t.',
+        '',
+        'NC_000011.9\t111959720\t.\tTCA\tT\t.\t.\t.'])
+
+    assert rows[0][:7] == ['11', '111959695', 'rs1', 'G', 'T', '',
+                           'NC_000011.9:g.111959695G>T']
+    assert rows[0][7:] == sorted(
+        _chrom2c(hg19, 'NC_000011.9:g.111959695G>T'))
+    assert 'NM_003002.2:c.274G>T' in rows[0]
+
+    # Shifted to the end of the run on the forward strand, and to the start
+    # of the run on the reverse strand.
+    assert rows[1][:7] == ['chr11', '111959699', '.', 'CA', 'C', '',
+                           'NC_000011.9:g.111959703del']
+    assert 'NM_003002.2:c.282del' in rows[1]
+    for description in _chrom2c(hg19, 'NC_000011.9:g.111959700del'):
+        if not description.startswith('NM_003002.2'):
+            assert description in rows[1]
+
+    assert rows[2][:7] == ['chr11', '111959699', '.', 'CA', 'CAA', '',
+                           'NC_000011.9:g.111959703dup']
+    assert 'NM_003002.2:c.282dup' in rows[2]
+
+    assert rows[3][:7] == ['NC_000011.9', '111959720', '.', 'TCA', 'T', '',
+                           'NC_000011.9:g.111959725_111959726del']
+    assert 'NM_003002.2:c.304_305del' in rows[3]
+
+
+def test_convert_errors(hg19, sequence):
+    """
+    Errors in VCF records are reported per record.
+    """
+    rows = _convert(hg19, [
+        '11\t111959695\t.\tA\tT',
+        '11\t111959695\t.\tG\t<DEL>',
+        'chrQ\t10\t.\tA\tT',
+        '11\tabc\t.\tA\tT'])
+
+    assert [row[:5] for row in rows] == [
+        ['11', '111959695', '.', 'A', 'T'],
+        ['11', '111959695', '.', 'G', '<DEL>'],
+        ['chrQ', '10', '.', 'A', 'T'],
+        ['11', 'abc', '.', 'A', 'T']]
+    assert all(row[5] and len(row) == 6 for row in rows)
+
+
+def test_convert_no_sequence(override_settings, tmpdir, hg19):
+    """
+    Without local NC sequence store, records are described without
+    normalization.
+    """
+    override_settings({'SEQ_PATH': unicode(tmpdir.join('missing'))})
+    rows = _convert(hg19, ['11\t111959699\t.\tCA\tC'])
+    assert rows[0][5]
+    assert rows[0][6] == 'NC_000011.9:g.111959700del'
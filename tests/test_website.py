@@ -430,7 +430,7 @@ def _batch(website, job_type='name-checker', assembly_name_or_alias=None,
     Submit a batch form.
 
     @kwarg batch_type: Type of batch job to test. One of name-checker,
-                       syntax-checker, position-converter.
+                       syntax-checker, position-converter, vcf-converter.
     @kwarg argument: Optional extra argument for the batch job.
     @kwarg file: String with variants to use as input for the batch job.
     @kwarg size: Number of variants in input.
@@ -538,6 +538,24 @@ def test_batch_positionconverter(website):
            header='Input Variant')
 
 
+@pytest.mark.usefixtures('hg19_transcript_mappings')
+def test_batch_vcfconverter(override_settings, website):
+    """
+    Submit the batch VCF converter form.
+    """
+    override_settings({'VCF_CONVERTER_PROCESSES': 1})
+    records = ['#CHROM\tPOS\tID\tREF\tALT',
+               '11\t111959625\t.\tC\tT',
+               '11\t111959695\t.\tG\tT']
+    _batch(website,
+           'vcf-converter',
+           assembly_name_or_alias='hg19',
+           file='\n'.join(records),
+           size=1,
+           lines=len(records) - 1,
+           header='Chromosomal Variant')
+
+
 @pytest.mark.usefixtures('db')
 def test_batch_syntaxchecker_newlines_unix(website):
     """